@@ -0,0 +1,20 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared pool for fire-and-forget work that must stay off the request path
+# (archiving uploads to S3, debug sinks). Small on purpose: these tasks are I/O bound.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BACKGROUND_WORKERS", "2")),
+    thread_name_prefix="background",
+)
+
+
+def submit_background(fn, *args, **kwargs):
+    """Run `fn(*args, **kwargs)` on the background pool; failures are logged, never raised."""
+    def _run():
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            print(f"⚠️ Background task {getattr(fn, '__name__', fn)} failed: {e}")
+
+    return _executor.submit(_run)
@@ -0,0 +1,94 @@
+"""
+bench_import.py
+───────────────
+Import-time budget for the API: how long `import main` takes in a fresh
+interpreter, and whether any heavy dependency slipped back onto the import path
+(they belong to warm-up, see warmup.py).
+
+Each run is a new `python -X importtime -c "import main"` in a scratch
+directory (importing main creates songs/ and the SQLite files in the cwd).
+Reports the median wall time and the slowest top-level imports, then exits 1
+if the median is over budget or a heavy module was imported.
+
+Run from the repo root:
+    python benchmarks/bench_import.py [--budget-ms 1500] [--repeat 5] [--top 15]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Must not be imported by `import main`; warm-up loads them after startup
+HEAVY_MODULES = ["librosa", "scipy", "numba", "torch", "faster_whisper", "ctranslate2", "dtw",
+                 "fuzzywuzzy", "groq", "boto3", "botocore", "pymongo", "demucs", "yt_dlp", "lyricsgenius"]
+
+_CHILD = """
+import sys, time, json
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def _run_once(workdir: str) -> tuple:
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT), "PRODUCTION": "false", "WARMUP_ON_STARTUP": "false"}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD], cwd=workdir, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(f"❌ `import main` failed:\n{proc.stderr[-4000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # Top-level imports only (no indentation), cumulative microseconds
+    top_level = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match and len(match.group(3)) == 1:
+            top_level[match.group(4)] = int(match.group(2))
+    return result["seconds"], set(result["modules"]), top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the API module.")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Max median `import main` time (default 1500)")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to time (default 5)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list (default 15)")
+    args = parser.parse_args()
+
+    timings, modules, breakdown = [], set(), {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.repeat):
+            seconds, modules, breakdown = _run_once(workdir)
+            timings.append(seconds * 1000)
+
+    median = statistics.median(timings)
+    print(f"\n── import main: median {median:.0f} ms, min {min(timings):.0f} ms "
+          f"over {args.repeat} run(s) (budget {args.budget_ms:.0f} ms) " + "─" * 10)
+    print(f"{'module':<40}{'cumulative ms':>15}")
+    for name, micros in sorted(breakdown.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<40}{micros / 1000:>15.1f}")
+
+    heavy = [m for m in HEAVY_MODULES if m in modules]
+    failed = False
+    if heavy:
+        print(f"\n❌ Heavy modules imported by `import main`: {', '.join(heavy)} — import them on first use")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\n❌ Over budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\n✅ Within budget, no heavy imports")
+
+
+if __name__ == "__main__":
+    main()
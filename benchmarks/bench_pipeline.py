@@ -0,0 +1,234 @@
+"""
+bench_pipeline.py
+─────────────────
+Stage-level benchmarks for the user-audio analysis pipeline, fully offline.
+
+Songs and user takes are synthetic singing (benchmarks/synthetic.py), so every
+run measures the same audio. Groq, Mongo and S3 are stubbed (benchmarks/stubs.py).
+Each stage is timed on its own for every (song length, take length) pair:
+
+  whisper          transcribe_with_whisper(take)                   [--skip-whisper]
+  pitch_user       extract_pitch_contour(take)
+  pitch_ref        extract_pitch_contour(song vocals)
+  features         extract_comprehensive_features(take)
+  frames           extract_frame_level_features(take)
+  dtw              compare_with_dtw(take pitch, song pitch segment)
+  match_fuzzy      identify_sung_part (sliding-window matcher)
+  match_agent      identify_sung_part_agent (stubbed LLM + JSON handling)
+  analyze          analyze_audio_match_enhanced (end to end, pitch precomputed)
+
+Results go to benchmarks/results/<timestamp>.json. With --baseline, medians are
+compared against an earlier run and the script exits 1 on a regression.
+
+Run from the repo root:
+    python benchmarks/bench_pipeline.py [--songs 60,180] [--takes 5,10,20] [--repeat 3]
+    python benchmarks/bench_pipeline.py --save-baseline            # record benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from pathlib import Path
+
+# ── make repo root importable ──────────────────────────────────────────────────
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "benchmarks"))
+
+import stubs
+
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "idol_bench")
+DEFAULT_OUT = REPO_ROOT / "benchmarks" / "results"
+DEFAULT_BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+# Differences under this are timer noise, whatever the percentage
+MIN_REGRESSION_MS = 5.0
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _time(fn, repeat: int, warmup: int, quiet: bool):
+    """Run `fn` warmup + repeat times; return per-run milliseconds of the timed runs."""
+    runs = []
+    sink = open(os.devnull, "w") if quiet else None
+    try:
+        for i in range(warmup + repeat):
+            with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+                started = time.perf_counter()
+                fn()
+                elapsed = (time.perf_counter() - started) * 1000
+            if i >= warmup:
+                runs.append(elapsed)
+    finally:
+        if sink:
+            sink.close()
+    return runs
+
+
+def run_suite(song_lengths, take_lengths, repeat, warmup, skip_whisper, quiet):
+    # Repo modules are imported only after stubs.install() has set the environment
+    import synthetic
+    from scripts.agents import identify_sung_part_agent
+    from scripts_user.lyric_matcher import get_words_only, identify_sung_part
+    from scripts_user.compare_pitch_dtw import extract_pitch_contour, compare_with_dtw, segment_pitch_contour
+    from scripts_user.audio_analysis import ComprehensiveVocalAnalyzer, analyze_audio_match_enhanced
+
+    sr, hop_length = 16000, 512
+    analyzer = ComprehensiveVocalAnalyzer(sr=sr, hop_length=hop_length)
+    whisper_skipped = "disabled with --skip-whisper" if skip_whisper else None
+    results = {}
+
+    for song_s in song_lengths:
+        print(f"🎼 Preparing synthetic song ({song_s:.0f}s) …")
+        song = synthetic.write_song(os.getcwd(), song_s)
+        song_words = get_words_only(song["alignment"])
+        ref_pitch = extract_pitch_contour(song["vocals_path"], sr)
+
+        for take_s in take_lengths:
+            if take_s > song_s - 10:
+                print(f"   skipping {take_s:.0f}s take — longer than the song allows")
+                continue
+            take = synthetic.write_take(os.getcwd(), song, take_s)
+            match = take["match"]
+            y_user, _ = analyzer.load_audio_from_storage(take["path"], sr)
+            user_pitch = extract_pitch_contour(take["path"], sr)
+            ref_segment = segment_pitch_contour(ref_pitch, sr, match["start_time"], match["end_time"], hop_length)
+
+            stages = {
+                "pitch_user": lambda: extract_pitch_contour(take["path"], sr),
+                "pitch_ref": lambda: extract_pitch_contour(song["vocals_path"], sr),
+                "features": lambda: analyzer.extract_comprehensive_features(y_user),
+                "frames": lambda: analyzer.extract_frame_level_features(y_user),
+                "dtw": lambda: compare_with_dtw(user_pitch, ref_segment),
+                "match_fuzzy": lambda: identify_sung_part(song_words, take["words"], song["alignment"], True),
+                "match_agent": lambda: identify_sung_part_agent(song["alignment"], take["words"]),
+                "analyze": lambda: analyze_audio_match_enhanced(
+                    take["path"], song["vocals_path"], match, ref_pitch,
+                    sr=sr, hop_length=hop_length, user_pitch=user_pitch),
+            }
+            if not whisper_skipped:
+                from scripts_user.transcribe_with_whisper import transcribe_with_whisper
+                stages = {"whisper": lambda: transcribe_with_whisper(take["path"]), **stages}
+
+            for stage, fn in stages.items():
+                try:
+                    runs = _time(fn, repeat, warmup, quiet)
+                except Exception as e:
+                    if stage != "whisper":
+                        raise
+                    # No model weights offline, or faster-whisper missing
+                    whisper_skipped = f"{type(e).__name__}: {e}"
+                    print(f"⚠️  Skipping whisper: {whisper_skipped}")
+                    continue
+                results[f"{stage}|{song_s:g}|{take_s:g}"] = {
+                    "stage": stage,
+                    "song_seconds": song_s,
+                    "take_seconds": take_s,
+                    "median_ms": round(statistics.median(runs), 3),
+                    "min_ms": round(min(runs), 3),
+                    "runs_ms": [round(r, 3) for r in runs],
+                }
+                print(f"   {stage:<12} song {song_s:>4.0f}s  take {take_s:>3.0f}s  "
+                      f"median {statistics.median(runs):>9.1f} ms")
+
+    return results, whisper_skipped
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Print median deltas vs `baseline`; return the keys that regressed."""
+    base = baseline.get("results", {})
+    regressions = []
+    print(f"\n── vs baseline {baseline.get('meta', {}).get('git_commit', '?')} "
+          f"(regression = >{threshold:.0%} and >{MIN_REGRESSION_MS:g} ms slower) " + "─" * 10)
+    print(f"{'stage':<12}{'song s':>8}{'take s':>8}{'base ms':>11}{'now ms':>11}{'Δ':>9}")
+    for key, now in sorted(results.items(), key=lambda kv: (kv[1]["stage"], kv[1]["song_seconds"], kv[1]["take_seconds"])):
+        if key not in base:
+            continue
+        before, after = base[key]["median_ms"], now["median_ms"]
+        delta = (after - before) / before if before else 0.0
+        regressed = delta > threshold and after - before > MIN_REGRESSION_MS
+        if regressed:
+            regressions.append(key)
+        print(f"{now['stage']:<12}{now['song_seconds']:>8g}{now['take_seconds']:>8g}"
+              f"{before:>11.1f}{after:>11.1f}{delta:>+9.0%}" + ("  ❌" if regressed else ""))
+    missing = sorted(set(base) - set(results))
+    if missing:
+        print(f"Not measured this run: {', '.join(missing)}")
+    return regressions
+
+
+def _parse_seconds(value: str):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stage-level benchmarks for the analysis pipeline.")
+    parser.add_argument("--songs", type=_parse_seconds, default=[60.0, 180.0],
+                        help="Comma-separated song lengths in seconds (default 60,180)")
+    parser.add_argument("--takes", type=_parse_seconds, default=[5.0, 10.0, 20.0],
+                        help="Comma-separated user take lengths in seconds (default 5,10,20)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (default 3)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per stage (default 1)")
+    parser.add_argument("--skip-whisper", action="store_true", help="Don't time transcription")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR,
+                        help=f"Where synthetic audio is written and reused (default {DEFAULT_WORKDIR})")
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="Directory for result JSON")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the run to {DEFAULT_BASELINE}")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Relative slowdown that counts as a regression (default 0.25)")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output while timing")
+    args = parser.parse_args()
+
+    # Resolve before install() changes directory
+    out_dir = Path(args.out).resolve()
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+
+    stubs.install(args.workdir)
+    results, whisper_skipped = run_suite(args.songs, args.takes, args.repeat, args.warmup,
+                                         args.skip_whisper, quiet=not args.verbose)
+
+    report = {
+        "meta": {
+            "git_commit": _git_commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "whisper_skipped": whisper_skipped,
+        },
+        "results": results,
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"pipeline_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"\n✅ Results written to {out_path}")
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(report, indent=2))
+        print(f"✅ Baseline written to {DEFAULT_BASELINE}")
+
+    if baseline_path:
+        regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
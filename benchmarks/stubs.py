@@ -0,0 +1,76 @@
+"""
+Offline stand-ins for the services the analysis pipeline talks to.
+
+`install(workdir)` must run before any repo module is imported:
+  • storage → local mode, rooted at `workdir` (the pipeline uses relative paths)
+  • Mongo   → an unreachable URI; clients connect lazily and the timed stages never query
+  • Groq    → `scripts.agents._chat` answers deterministically; the real client refuses to run
+"""
+
+import os
+import re
+import json
+
+_ROW_RE = re.compile(r"^(\d+) \| (.+?) \| ([\d.]+) \| ([\d.]+)$", re.MULTILINE)
+_SUNG_RE = re.compile(r'The user sang \(Whisper transcription\):\n"(.*)"')
+
+
+def install(workdir: str):
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.update({
+        "PRODUCTION": "false",
+        "MONGODB_URI": "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=100",
+        "MONGODB_DB": "bench",
+        "GROQ_API_KEY": "offline-benchmark",
+        "SONG_CACHE_DB": os.path.join(workdir, "song_cache.db"),
+        "JOBS_DB": os.path.join(workdir, "jobs.db"),
+        "KV_CACHE_DB": os.path.join(workdir, "kv_cache.db"),
+        "STORAGE_CACHE_DIR": os.path.join(workdir, "storage_cache"),
+        "DEBUG_PERSIST_INTERMEDIATES": "false",
+    })
+    os.chdir(workdir)
+
+    import scripts.agents as agents
+
+    class _OfflineGroq:
+        def __getattr__(self, name):
+            raise RuntimeError("Groq is stubbed out in benchmarks — route calls through _chat")
+
+    agents._groq_client = _OfflineGroq()
+    agents._chat = fake_chat
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def fake_chat(system: str, user: str, max_tokens: int = 1024) -> str:
+    """
+    Deterministic `_chat`: answers the sung-segment prompt by locating the
+    user's words in the alignment table; anything else gets canned coaching.
+    """
+    sung = _SUNG_RE.search(user)
+    if "identify exactly which segment" not in system or not sung:
+        return "Nice work! Keep your pitch steady on the long notes and breathe before each phrase."
+
+    rows = [(int(i), _normalize(w), float(s), float(e)) for i, w, s, e in _ROW_RE.findall(user)]
+    target = [_normalize(w) for w in sung.group(1).split() if _normalize(w)]
+    words = [r[1] for r in rows]
+
+    # Best contiguous window by exact word agreement
+    n = max(1, len(target))
+    best, best_score = 0, -1
+    for k in range(max(1, len(rows) - n + 1)):
+        score = sum(a == b for a, b in zip(words[k:k + n], target))
+        if score > best_score:
+            best, best_score = k, score
+    window = rows[best:best + n] or rows[:1]
+
+    return json.dumps({
+        "start_idx": window[0][0],
+        "end_idx": window[-1][0],
+        "start_time": window[0][2],
+        "end_time": window[-1][3],
+        "matched_lyrics": " ".join(r[1] for r in window),
+        "confidence": round(best_score / n, 3),
+    })
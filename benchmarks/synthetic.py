@@ -0,0 +1,152 @@
+"""
+Deterministic synthetic singing for the benchmarks.
+
+A "song" is a seeded melody of sung notes, one pseudo-lyric word per note.
+Each note is a harmonic tone with vibrato whose harmonics (and a little
+breath noise) are shaped by the formants of a vowel. A "take" re-sings a
+stretch of the song the way a user would: slightly sharp, a bit slower, with
+different breath noise. The same seed always gives the same audio.
+"""
+
+import os
+import json
+import numpy as np
+import soundfile as sf
+
+SR = 16000
+
+# F1, F2, F3 (Hz) for /a/ /e/ /i/ /o/ /u/
+VOWEL_FORMANTS = [(730, 1090, 2440), (530, 1840, 2480), (270, 2290, 3010), (570, 840, 2410), (300, 870, 2240)]
+FORMANT_BANDWIDTHS = (90, 110, 160)
+MAX_HARMONICS = 20
+
+SYLLABLES = ["la", "ko", "mi", "sun", "ra", "ve", "do", "ni", "ta", "lo", "be", "shi", "mo", "fa", "ke", "ru"]
+# Two-syllable pseudo-words: enough variety that a few-word window is unique in the song
+WORDS = [a + b for a in SYLLABLES for b in SYLLABLES[::3]]
+
+SCALE = [0, 2, 4, 5, 7, 9, 11]           # major scale degrees
+NOTE_SECONDS = 0.45
+PHRASE_NOTES = 8
+PHRASE_REST = 0.9
+
+
+def _formant_gain(freqs: np.ndarray, formants) -> np.ndarray:
+    gain = np.zeros_like(freqs, dtype=np.float64)
+    for f, bw, level in zip(formants, FORMANT_BANDWIDTHS, (1.0, 0.6, 0.3)):
+        gain += level / (1.0 + ((freqs - f) / bw) ** 2)
+    return gain + 0.02
+
+
+def sing_note(midi: float, duration: float, vowel: int, rng: np.random.Generator,
+              cents_offset: float = 0.0, breath: float = 0.03, sr: int = SR) -> np.ndarray:
+    n = int(duration * sr)
+    t = np.arange(n) / sr
+    formants = VOWEL_FORMANTS[vowel % len(VOWEL_FORMANTS)]
+
+    # Vibrato fades in over the first 150 ms, like a trained singer
+    vibrato = 35 * np.sin(2 * np.pi * 5.5 * t + rng.uniform(0, 2 * np.pi)) * np.minimum(t / 0.15, 1.0)
+    f0 = 440.0 * 2 ** ((midi - 69 + (cents_offset + vibrato) / 100) / 12)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+
+    base = 440.0 * 2 ** ((midi - 69) / 12)
+    harmonics = np.arange(1, min(MAX_HARMONICS, int((sr / 2 - 200) // base)) + 1)
+    gains = _formant_gain(harmonics * base, formants) / harmonics
+    y = (gains[:, None] * np.sin(harmonics[:, None] * phase[None, :])).sum(axis=0)
+
+    # Breath: white noise shaped by the same formants
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    spectrum *= _formant_gain(np.fft.rfftfreq(n, 1 / sr), formants)
+    noise = np.fft.irfft(spectrum, n)
+    y = y / (np.abs(y).max() + 1e-9) + breath * noise / (np.abs(noise).max() + 1e-9)
+
+    envelope = np.minimum(1.0, np.minimum(t / 0.03, (duration - t) / 0.05))
+    return (0.5 * y * np.clip(envelope, 0, 1)).astype(np.float32)
+
+
+def make_song(song_seconds: float, seed: int = 0):
+    """Melody notes [(midi, start, duration, vowel)] and the matching word alignment."""
+    rng = np.random.default_rng(seed)
+    notes, alignment = [], []
+    t, degree, k = 1.0, 0, 0
+    while t + NOTE_SECONDS < song_seconds - 0.5:
+        degree = int(np.clip(degree + rng.integers(-2, 3), -3, 9))
+        midi = 60 + 12 * (degree // 7) + SCALE[degree % 7]
+        duration = NOTE_SECONDS * rng.choice([0.8, 1.0, 1.0, 1.5])
+        vowel = int(rng.integers(0, len(VOWEL_FORMANTS)))
+        notes.append((midi, t, duration, vowel))
+        alignment.append({"word": WORDS[int(rng.integers(0, len(WORDS)))], "start": round(t, 3),
+                          "end": round(t + duration * 0.9, 3)})
+        t += duration
+        k += 1
+        if k % PHRASE_NOTES == 0:
+            t += PHRASE_REST
+    return notes, alignment
+
+
+def render(notes, total_seconds: float, seed: int, cents_offset: float = 0.0,
+           tempo: float = 1.0, offset: float = 0.0, sr: int = SR) -> np.ndarray:
+    """Synthesize `notes`, shifted by -offset and stretched by `tempo`."""
+    rng = np.random.default_rng(seed)
+    y = np.zeros(int(total_seconds * sr) + 1, dtype=np.float32)
+    for midi, start, duration, vowel in notes:
+        note = sing_note(midi, duration * tempo, vowel, rng, cents_offset=cents_offset, sr=sr)
+        i = int((start - offset) * tempo * sr)
+        if 0 <= i < len(y):
+            y[i:i + len(note)] += note[:len(y) - i]
+    return y
+
+
+def write_song(workdir: str, song_seconds: float, seed: int = 0) -> dict:
+    """
+    Write a reference song the way song prep leaves it (vocals.wav, the 16 kHz
+    derivative, alignment.json) under <workdir>/songs/. Reuses earlier output.
+    """
+    from scripts.analysis_audio import write_analysis_derivative
+
+    rel_dir = f"songs/bench_{int(song_seconds)}s_seed{seed}"
+    out_dir = os.path.join(workdir, rel_dir)
+    vocals_path = os.path.join(rel_dir, "vocals.wav")
+    alignment_path = os.path.join(rel_dir, "alignment.json")
+    notes, alignment = make_song(song_seconds, seed)
+
+    if not os.path.exists(os.path.join(workdir, alignment_path)):
+        os.makedirs(out_dir, exist_ok=True)
+        y = render(notes, song_seconds, seed)
+        sf.write(os.path.join(workdir, vocals_path), y, SR)
+        write_analysis_derivative(y, SR, rel_dir)
+        with open(os.path.join(workdir, alignment_path), "w", encoding="utf-8") as f:
+            json.dump(alignment, f)
+    return {"notes": notes, "alignment": alignment, "vocals_path": vocals_path,
+            "alignment_path": alignment_path, "seconds": song_seconds}
+
+
+def write_take(workdir: str, song: dict, take_seconds: float, seed: int = 1) -> dict:
+    """A user take of `take_seconds` from the middle of `song`, slightly sharp and slower."""
+    alignment = song["alignment"]
+    mid = alignment[len(alignment) // 2]["start"]
+    first = next(i for i, w in enumerate(alignment) if w["start"] >= mid - take_seconds / 2)
+    last = first
+    while last + 1 < len(alignment) and alignment[last + 1]["end"] <= alignment[first]["start"] + take_seconds:
+        last += 1
+    start, end = alignment[first]["start"], alignment[last]["end"]
+    notes = [n for n in song["notes"] if start <= n[1] < end]
+
+    tempo = 1.04
+    path = f"user_vocals/bench_take_{int(song['seconds'])}s_{int(take_seconds)}s_seed{seed}.wav"
+    if not os.path.exists(os.path.join(workdir, path)):
+        os.makedirs(os.path.join(workdir, "user_vocals"), exist_ok=True)
+        y = render(notes, (end - start) * tempo + 0.5, seed, cents_offset=18, tempo=tempo, offset=start)
+        sf.write(os.path.join(workdir, path), y, SR)
+
+    words = [w["word"] for w in alignment[first:last + 1]]
+    match = {
+        "found_match": True,
+        "start_time": start,
+        "end_time": end,
+        "duration_seconds": end - start,
+        "song_words_snippet": " ".join(words),
+        "user_input": " ".join(words),
+        "confidence": 1.0,
+        "timing_data": alignment[first:last + 1],
+    }
+    return {"path": path, "words": words, "match": match, "seconds": take_seconds}
@@ -1,71 +1,131 @@
-from scripts.song_fetcher import fetch_song_by_name
+from scripts.song_fetcher import fetch_song_by_name, local_audio_source, ensure_audio_archived, release_local_audio
 from scripts.extract_from_audio import separate_vocals
 from scripts.align_gentle import gentle_aligner
 from s3_handler import storage # Import the storage handler
 from mongo import MongoHandler  # Import the MongoDB handler
-import json 
+from song_ledger import append_song
+from metrics import span
 import os
 
-def coaching(song_name):
-    if song_name == "":
-        song_name = input("enter song name : ")
-    
-    # Check if song already exists in MongoDB
-    with MongoHandler() as mongo_handler:
-        existing_song = mongo_handler.get_song_by_title(song_name)
-        if existing_song:
-            print(f"Song '{song_name}' already exists in database")
-            return existing_song
-    
-    # Process new song
-    song_details = fetch_song_by_name(song_name)
-    title = song_details['title']
-    downloaded_audio = song_details['audio_path']
-    vocals, accomp = separate_vocals(downloaded_audio, song_details['title'], f"songs/{song_details['title']}")
-    
+# Lyric aligner used at song prep: "gentle" (external container) or "whisper" (in-process)
+ALIGNER = os.getenv("ALIGNER", "gentle").lower()
+
+
+# ── Preparation stages ─────────────────────────────────────────────────────────
+# Each stage reads what it needs from `state` and returns the keys it adds.
+# `state` is JSON-serialisable so a job can checkpoint it after every stage and
+# resume from the last completed one (see jobs.py).
+
+def stage_fetch(state):
+    """YouTube search + download, lyrics lookup."""
+    song_details = fetch_song_by_name(state["song_name"])
+    if "error" in song_details:
+        raise Exception(song_details["error"])
+    return {"song_details": song_details}
+
+
+def stage_separate(state):
+    """Demucs vocal / accompaniment separation."""
+    song_details = state["song_details"]
+    # Straight from the fresh download when it is still on disk — no S3 round trip
+    vocals, accomp = separate_vocals(
+        local_audio_source(song_details), song_details['title'], f"songs/{song_details['title']}"
+    )
+    # The song record points at audio_path, so it must be in storage before the spool goes
+    ensure_audio_archived(song_details)
+    release_local_audio(song_details)
+    return {"vocals_path": vocals, "accompany_path": accomp}
+
+
+def stage_align(state):
+    """Lyric-to-vocals alignment (Gentle, or Whisper + DP with ALIGNER=whisper)."""
+    song_details = state["song_details"]
     # Read lyrics using storage handler
     lyrics = storage.read_file(song_details['lyrics'])
-    
-    json_path_aligned, _ = gentle_aligner(vocals, lyrics, f"songs/{song_details['title']}")
-    
+    if ALIGNER == "whisper":
+        from scripts.align_whisper import whisper_aligner
+        aligner = whisper_aligner
+    else:
+        aligner = gentle_aligner
+    json_path_aligned, _ = aligner(state["vocals_path"], lyrics, f"songs/{song_details['title']}")
+    return {"timestamp_lyrics": json_path_aligned}
+
+
+def stage_save(state):
+    """Insert the song into MongoDB and the ledger backup."""
+    song_details = state["song_details"]
+    title = song_details["title"]
     new_entry = {
         "title": song_details["title"],
-        "downloaded_audio": downloaded_audio,
-        "vocals_path": vocals,
-        "accompany_path": accomp,
+        "downloaded_audio": song_details['audio_path'],
+        "vocals_path": state["vocals_path"],
+        "accompany_path": state["accompany_path"],
         "lyrics": song_details['lyrics'],
-        "timestamp_lyrics": json_path_aligned,
+        "timestamp_lyrics": state["timestamp_lyrics"],
         "artist": song_details.get("artist", ""),
         "youtube_url": song_details.get("youtube_url", "")
     }
-    
+
     # Save to MongoDB instead of JSON file
     with MongoHandler() as mongo_handler:
-        success = mongo_handler.insert_song(new_entry)
-        if success:
+        if mongo_handler.song_exists(title):
+            print(f"Song '{title}' already in MongoDB — skipping insert")
+        elif mongo_handler.insert_song(dict(new_entry)):
             print(f"✅ Song '{title}' saved to MongoDB")
         else:
-            print(f"❌ Failed to save song '{title}' to MongoDB")
-    
-    # Also maintain JSON backup if needed
-    db_path = "songs/songs_db.json"
+            raise Exception(f"Failed to save song '{title}' to MongoDB")
+
+    # Also keep an append-only backup (see song_ledger.py)
     try:
-        # Read existing database using storage handler
-        if storage.file_exists(db_path):
-            data = json.loads(storage.read_file(db_path))
-        else:
-            data = []
-
-        # Check if song already exists in JSON
-        if not any(s["title"].lower() == title.lower() for s in data):
-            data.append(new_entry)
-            # Save updated database using storage handler
-            storage.write_file(db_path, json.dumps(data, indent=4))
-            print(f"✅ Song '{title}' also saved to JSON backup")
+        append_song(new_entry)
+        print(f"✅ Song '{title}' also saved to ledger backup")
     except Exception as e:
-        print(f"⚠️ Warning: Could not update JSON backup: {e}")
-            
-    return new_entry
+        print(f"⚠️ Warning: Could not append to ledger backup: {e}")
+
+    return {"song_data": new_entry}
+
+
+PREP_STAGES = [
+    ("fetch",    stage_fetch),
+    ("separate", stage_separate),
+    ("align",    stage_align),
+    ("save",     stage_save),
+]
+
+
+def run_stages(state, completed=(), on_stage_done=None, on_stage_start=None):
+    """
+    Run every stage not listed in `completed`, in order, updating `state`.
+    `on_stage_start(name)` / `on_stage_done(name, state)` let callers report
+    progress and checkpoint.
+    """
+    for name, fn in PREP_STAGES:
+        if name in completed:
+            continue
+        if on_stage_start:
+            on_stage_start(name)
+        print(f"▶️  Stage '{name}' for: {state['song_name']}")
+        with span(f"prep.{name}"):
+            state.update(fn(state))
+        if on_stage_done:
+            on_stage_done(name, state)
+    return state
+
+
+def coaching(song_name):
+    if song_name == "":
+        song_name = input("enter song name : ")
+
+    # Check if song already exists in MongoDB
+    with MongoHandler() as mongo_handler:
+        existing_song = mongo_handler.get_song_by_title(song_name)
+        if existing_song:
+            print(f"Song '{song_name}' already exists in database")
+            return existing_song
+
+    # Process new song
+    state = run_stages({"song_name": song_name})
+    return state["song_data"]
 
 if __name__ == "__main__":
-    coaching("")
\ No newline at end of file
+    coaching("")
@@ -5,13 +5,29 @@ export async function fetchSongs() {
   return res.json();
 }
 
-export async function prepareSong(songName) {
+const JOB_POLL_INTERVAL_MS = 3000;
+
+// Queues preparation and polls the job until it finishes.
+// onProgress receives the job status ({ stage, progress, ... }) on every poll.
+export async function prepareSong(songName, onProgress) {
   const res = await fetch(`${BASE_URL}/songs/prepare`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ song_name: songName }),
   });
-  return res.json();
+  let data = await res.json();
+  if (res.status !== 202) return data;
+
+  while (data.status === "queued" || data.status === "running") {
+    onProgress?.(data);
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const poll = await fetch(`${BASE_URL}/songs/jobs/${data.job_id}`);
+    data = await poll.json();
+  }
+  if (data.status === "failed") {
+    throw new Error(`Song preparation failed: ${data.error}`);
+  }
+  return { message: "Song prepared successfully", song_data: data.song_data };
 }
 
 export async function analyzeUserAudio(formData) {
@@ -45,12 +61,27 @@ export async function analyzeUserText(formData) {
   }
 }
 
+// Compressed playback formats this browser can decode, most preferred first
+function supportedAudioFormats() {
+  if (typeof Audio === "undefined") return [];
+  const probe = new Audio();
+  const formats = [];
+  if (probe.canPlayType('audio/ogg; codecs="opus"')) formats.push("opus");
+  if (probe.canPlayType('audio/mp4; codecs="mp4a.40.2"')) formats.push("aac");
+  return formats;
+}
+
 export async function getSongDetails(song){
 
   try {
+    const lowBandwidth = typeof navigator !== "undefined" && navigator.connection?.saveData === true;
     const res = await fetch(`${BASE_URL}/songs/get_song`, {
       method: "POST",
-      body: JSON.stringify({song_name : song}),
+      body: JSON.stringify({
+        song_name: song,
+        formats: supportedAudioFormats(),
+        low_bandwidth: lowBandwidth,
+      }),
       headers: { "Content-Type": "application/json" },
     });
     console.log(res)
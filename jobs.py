@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from mongo import MongoHandler
+from profiler import capture
+
+load_dotenv()
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+# Local SQLite stand-in for a jobs collection; shared by every worker process.
+JOBS_DB = os.getenv("JOBS_DB", "jobs.db")
+PREP_WORKERS = int(os.getenv("PREP_WORKERS", "1"))          # song prep is CPU heavy
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job whose heartbeat is older than this is assumed to have died with its worker.
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "1800"))
+HEARTBEAT_SECONDS = 30
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id               TEXT PRIMARY KEY,
+    song_key         TEXT NOT NULL,
+    song_name        TEXT NOT NULL,
+    status           TEXT NOT NULL,
+    stage            TEXT,
+    completed_stages TEXT NOT NULL DEFAULT '[]',
+    state            TEXT NOT NULL DEFAULT '{}',
+    error            TEXT,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    created_at       REAL NOT NULL,
+    updated_at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_song_key ON jobs(song_key);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status);
+"""
+
+
+class JobStore:
+    """
+    Persisted song-preparation jobs.
+
+    One job per normalized song name: submitting a song that already has a
+    queued/running job returns that job, a song whose last job succeeded (and
+    is still in MongoDB) returns that finished job, and resubmitting a failed
+    one resumes it from its last completed stage. Claims run in `BEGIN IMMEDIATE`
+    transactions so two workers never pick up the same job.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        job["completed_stages"] = json.loads(job["completed_stages"])
+        job["state"] = json.loads(job["state"])
+        return job
+
+    def submit(self, song_name: str) -> dict:
+        """Create a job for `song_name`, or return/resume the existing one for the same song."""
+        song_key = MongoHandler.normalize_text(song_name)
+        latest = self._latest(song_key)
+        # Checked outside the transaction so the write lock is never held across a Mongo round trip;
+        # a song deleted from MongoDB since its job succeeded is prepared again
+        prepared = bool(latest and latest["status"] == SUCCEEDED and self._song_in_db(song_name))
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE song_key = ? ORDER BY created_at DESC LIMIT 1",
+                (song_key,),
+            ).fetchone()
+            if row and row["status"] in (QUEUED, RUNNING):
+                return self._to_dict(row)
+            if row and row["status"] == SUCCEEDED and prepared:
+                # Finished after the caller's own "already prepared?" check — don't prepare twice
+                return self._to_dict(row)
+            if row and row["status"] == FAILED:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = NULL, attempts = 0, updated_at = ? WHERE id = ?",
+                    (QUEUED, now, row["id"]),
+                )
+                return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs(id, song_key, song_name, status, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, song_key, song_name, QUEUED, json.dumps({"song_name": song_name}), now, now),
+            )
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def _latest(self, song_key: str):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE song_key = ? ORDER BY created_at DESC LIMIT 1",
+                (song_key,),
+            ).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _song_in_db(song_name: str) -> bool:
+        with MongoHandler() as handler:
+            return handler.song_exists(song_name)
+
+    def get(self, job_id: str):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row else None
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running; False if someone else already has it."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED),
+            )
+            return cur.rowcount == 1
+
+    def update(self, job_id: str, **fields):
+        if "completed_stages" in fields:
+            fields["completed_stages"] = json.dumps(fields["completed_stages"])
+        if "state" in fields:
+            fields["state"] = json.dumps(fields["state"])
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._transaction() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """
+        Record a failed run. Requeues the job (resuming from its last completed
+        stage) and returns True while it has attempts left, else marks it failed.
+        """
+        job = self.get(job_id)
+        if job["attempts"] < JOB_MAX_ATTEMPTS:
+            self.update(job_id, status=QUEUED, error=error)
+            return True
+        self.update(job_id, status=FAILED, error=error)
+        return False
+
+    def release(self, job_ids: list):
+        """Put running jobs this process is abandoning (e.g. on Ctrl-C) back in the queue."""
+        with self._transaction() as conn:
+            for job_id in job_ids:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, stage = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                    (QUEUED, time.time(), job_id, RUNNING),
+                )
+
+    def requeue_stale(self) -> list:
+        """Requeue running jobs whose worker stopped heartbeating; returns their ids."""
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND updated_at < ?",
+                (RUNNING, time.time() - JOB_STALE_SECONDS),
+            ).fetchall()
+            ids = [r["id"] for r in rows]
+            for job_id in ids:
+                conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (QUEUED, job_id))
+            return ids
+
+    def queued_ids(self) -> list:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [r["id"] for r in rows]
+
+
+job_store = JobStore()
+_executor = ThreadPoolExecutor(max_workers=PREP_WORKERS, thread_name_prefix="prep")
+# Jobs whose next run should be profiled (see profiler.py); in-process only, one run each
+_profiled_jobs = set()
+
+
+def _heartbeat(job_id: str, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        job_store.update(job_id)
+
+
+def _run_job(job_id: str):
+    from coaching import run_stages
+
+    if not job_store.claim(job_id):
+        return
+    job = job_store.get(job_id)
+    completed = list(job["completed_stages"])
+    state = job["state"]
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True).start()
+
+    def on_start(name):
+        job_store.update(job_id, stage=name)
+
+    def on_done(name, new_state):
+        completed.append(name)
+        job_store.update(job_id, completed_stages=completed, state=new_state)
+
+    try:
+        with capture(job_id, job_id in _profiled_jobs, name=f"prepare {job['song_name']}"):
+            _profiled_jobs.discard(job_id)
+            run_stages(state, completed, on_stage_done=on_done, on_stage_start=on_start)
+        job_store.update(job_id, status=SUCCEEDED, stage=None, error=None)
+        print(f"✅ Job {job_id} finished: {job['song_name']}")
+    except Exception as e:
+        print(f"❌ Job {job_id} failed at stage '{job_store.get(job_id)['stage']}': {e}")
+        if job_store.fail(job_id, str(e)):
+            # Retry from the last completed stage
+            _executor.submit(_run_job, job_id)
+    finally:
+        stop.set()
+
+
+def enqueue_song(song_name: str, profile: bool = False) -> dict:
+    """
+    Submit (or join) a preparation job for `song_name` and make sure it is scheduled.
+    `profile=True` profiles the job's next run (if it hasn't started yet).
+    """
+    job = job_store.submit(song_name)
+    if profile and job["status"] == QUEUED:
+        _profiled_jobs.add(job["id"])
+    if job["status"] == QUEUED:
+        _executor.submit(_run_job, job["id"])
+    return job
+
+
+def resume_pending_jobs():
+    """Startup hook: requeue jobs orphaned by a dead worker and schedule everything queued."""
+    stale = job_store.requeue_stale()
+    if stale:
+        print(f"♻️  Requeued {len(stale)} stale preparation job(s)")
+    for job_id in job_store.queued_ids():
+        _executor.submit(_run_job, job_id)
+
+
+def job_status(job: dict) -> dict:
+    """Public view of a job for the status endpoint."""
+    from coaching import PREP_STAGES
+
+    stages = [name for name, _ in PREP_STAGES]
+    status = {
+        "job_id": job["id"],
+        "song_name": job["song_name"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "completed_stages": job["completed_stages"],
+        "progress": len(job["completed_stages"]) / len(stages),
+        "stages": stages,
+        "attempts": job["attempts"],
+        "error": job["error"],
+    }
+    if job["status"] == SUCCEEDED:
+        status["song_data"] = job["state"].get("song_data")
+    return status
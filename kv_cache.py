@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import sqlite3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+# Small persistent lookups (lyrics, title parses) shared by every worker process.
+KV_CACHE_DB = os.getenv("KV_CACHE_DB", "kv_cache.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT,
+    expires_at REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+class KVCache:
+    """
+    JSON values keyed by string, in one SQLite namespace, with optional expiry.
+
+    `lookup` tells a cached `None` (e.g. a remembered "not found") apart from
+    a miss, so negative results can be cached with a short TTL.
+    """
+
+    def __init__(self, namespace: str, db_path: str = KV_CACHE_DB):
+        self.namespace = namespace
+        self.db_path = db_path
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def lookup(self, key: str):
+        """Return (hit, value); expired entries count as misses."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return False, None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+                return False, None
+            return True, json.loads(value)
+        finally:
+            conn.close()
+
+    def set(self, key: str, value, ttl: float = None):
+        """Store `value` (JSON-serialisable, may be None); `ttl` in seconds, None = forever."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv(namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now + ttl if ttl else None, now),
+            )
+        finally:
+            conn.close()
+
+    def delete(self, key: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+        finally:
+            conn.close()
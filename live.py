@@ -0,0 +1,213 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from mongo import MongoHandler
+import metrics
+from serialization import dumps, loads
+
+router = APIRouter()
+
+# ── Real-time pitch feedback ───────────────────────────────────────────────────
+# WS /live/pitch — the browser streams microphone PCM while singing along and
+# gets per-frame pitch feedback against the song's reference vocals.
+#
+#   1. client → {"song_name": "...", "offset": 12.3, "sample_rate": 48000, "format": "f32le"}
+#      offset is the song position (seconds) of the first sample that follows;
+#      format is "f32le" (default) or "s16le", mono.
+#   2. server → {"type": "ready", "song": ..., "hop_seconds": ..., "duration": ...}
+#   3. client → binary PCM chunks (any size up to LIVE_MAX_CHUNK_SECONDS)
+#      server → {"type": "pitch", "frames": [{time, hz, note, target_hz, target_note,
+#                cents, octave, feedback}, ...], "processing_ms": ...}
+#      Send {"offset": ...} again after a seek to restart tracking at that position.
+#   Errors → {"type": "error", "detail": ...}
+#
+# Frames are 64 ms with a 32 ms hop, so feedback lags the voice by one frame
+# plus the client's chunk size; keep chunks ≤ 40 ms to stay under 100 ms.
+LIVE_REFERENCE_CACHE_SONGS = int(os.getenv("LIVE_REFERENCE_CACHE_SONGS", "16"))
+LIVE_MAX_CHUNK_SECONDS = float(os.getenv("LIVE_MAX_CHUNK_SECONDS", "1.0"))
+_SAMPLE_FORMATS = {"f32le": "<f4", "s16le": "<i2"}
+
+# Reference contours by vocals path, shared by every session in this worker
+_references = OrderedDict()
+_references_lock = threading.Lock()
+
+
+def _find_song(song_name: str):
+    with MongoHandler() as handler:
+        # Same lookup as /user/analyze: exact title first, then partial
+        return (handler.get_song_by_title(song_name, exact_match=True)
+                or handler.get_song_by_title(song_name, exact_match=False))
+
+
+@metrics.timed("live.reference_contour")
+def _reference_contour(vocals_path: str):
+    """Reference f0 per hop for a song's vocal stem, tracked once per worker (LRU)."""
+    with _references_lock:
+        if vocals_path in _references:
+            _references.move_to_end(vocals_path)
+            return _references[vocals_path]
+
+    from scripts.analysis_audio import load_analysis_audio
+    from scripts_user.live_pitch import reference_contour
+    y, sr = load_analysis_audio(vocals_path)
+    contour = reference_contour(y, sr)
+
+    with _references_lock:
+        _references[vocals_path] = contour
+        while len(_references) > LIVE_REFERENCE_CACHE_SONGS:
+            _references.popitem(last=False)
+    return contour
+
+
+class _Session:
+    """One singer's stream: the reference contour (held for the session) plus a tracker."""
+
+    def __init__(self, contour, sample_rate: int, sample_format: str, offset: float):
+        import numpy as np
+        from scripts_user.live_pitch import StreamingPitchTracker, HOP_SECONDS
+        from scripts_user.audio_analysis import hz_to_note_name, _cents_description
+        self._np = np
+        self._tracker_cls = StreamingPitchTracker
+        self._hz_to_note_name = hz_to_note_name
+        self._cents_description = _cents_description
+        self.hop_seconds = HOP_SECONDS
+        self.contour = contour
+        self.sample_rate = sample_rate
+        self.dtype = _SAMPLE_FORMATS[sample_format]
+        self.sample_bytes = np.dtype(self.dtype).itemsize
+        self.max_chunk_bytes = int(LIVE_MAX_CHUNK_SECONDS * sample_rate) * self.sample_bytes
+        self.seek(offset)
+
+    def seek(self, offset: float):
+        self.offset = max(0.0, float(offset))
+        self.tracker = self._tracker_cls(self.sample_rate)
+
+    def _target(self, song_time: float) -> float:
+        index = int(round(song_time / self.hop_seconds))
+        return float(self.contour[index]) if 0 <= index < len(self.contour) else 0.0
+
+    def push(self, data: bytes) -> list:
+        np = self._np
+        samples = np.frombuffer(data, dtype=self.dtype)
+        if self.dtype == "<i2":
+            samples = samples.astype(np.float32) / 32768.0
+
+        frames = []
+        for t, hz in self.tracker.push(samples):
+            song_time = self.offset + t
+            target = self._target(song_time)
+            frame = {
+                "time": round(song_time, 3),
+                "hz": round(hz, 2) if hz > 0 else None,
+                "note": self._hz_to_note_name(hz) if hz > 0 else None,
+                "target_hz": round(target, 2) if target > 0 else None,
+                "target_note": self._hz_to_note_name(target) if target > 0 else None,
+                "cents": None,
+                "octave": None,
+                "feedback": None,
+            }
+            if hz > 0 and target > 0:
+                # Singing the melody in another octave still counts as on pitch
+                cents = 1200 * np.log2(hz / target)
+                octave = int(round(cents / 1200))
+                cents -= 1200 * octave
+                frame.update(cents=round(float(cents), 1), octave=octave,
+                             feedback=self._cents_description(cents))
+            frames.append(frame)
+        return frames
+
+
+async def _send(websocket: WebSocket, message: dict):
+    await websocket.send_text(dumps(message).decode())
+
+
+async def _error(websocket: WebSocket, detail: str):
+    await _send(websocket, {"type": "error", "detail": detail})
+
+
+def _parse_start(message: dict):
+    """Validate the session start message; returns (song_name, offset, sample_rate, format)."""
+    song_name = str(message.get("song_name") or "").strip()
+    if not song_name:
+        raise ValueError("song_name is required")
+    offset = float(message.get("offset", 0))
+    sample_rate = int(message.get("sample_rate", 16000))
+    if not 8000 <= sample_rate <= 192000:
+        raise ValueError("sample_rate must be between 8000 and 192000")
+    sample_format = message.get("format", "f32le")
+    if sample_format not in _SAMPLE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(_SAMPLE_FORMATS)}")
+    return song_name, offset, sample_rate, sample_format
+
+
+@router.websocket("/pitch")
+async def live_pitch(websocket: WebSocket):
+    """Stream microphone PCM in, get per-frame cents deviation from the reference vocals back"""
+    await websocket.accept()
+    metrics.gauge_add("idol_live_sessions", 1, help="Open real-time pitch sessions")
+    try:
+        try:
+            song_name, offset, sample_rate, sample_format = _parse_start(loads(await websocket.receive_text()))
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            # KeyError is receive_text() getting a binary frame
+            detail = "expected a JSON text message" if isinstance(e, KeyError) else e
+            await _error(websocket, f"Invalid start message: {detail}")
+            await websocket.close(code=1003)
+            return
+
+        song = await run_in_threadpool(_find_song, song_name)
+        if not song or not song.get("vocals_path"):
+            await _error(websocket, f"Song '{song_name}' not found in database")
+            await websocket.close(code=1008)
+            return
+
+        try:
+            contour = await run_in_threadpool(_reference_contour, song["vocals_path"])
+            session = await run_in_threadpool(_Session, contour, sample_rate, sample_format, offset)
+        except Exception as e:
+            print(f"❌ Failed to load reference pitch for '{song_name}': {e}")
+            await _error(websocket, "Could not load the reference vocals for this song")
+            await websocket.close(code=1011)
+            return
+
+        await _send(websocket, {
+            "type": "ready",
+            "song": song.get("title", song_name),
+            "hop_seconds": session.hop_seconds,
+            "duration": round(len(contour) * session.hop_seconds, 3),
+        })
+
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is not None:
+                # Seek: restart tracking at a new song position
+                try:
+                    session.seek(loads(message["text"])["offset"])
+                except (ValueError, TypeError, KeyError):
+                    await _error(websocket, "Expected {\"offset\": <seconds>}")
+                continue
+
+            data = message.get("bytes") or b""
+            if len(data) > session.max_chunk_bytes or len(data) % session.sample_bytes:
+                await _error(websocket, f"Chunks must be whole {sample_format} samples, "
+                                        f"at most {LIVE_MAX_CHUNK_SECONDS:g}s long")
+                continue
+
+            started = time.perf_counter()
+            with metrics.span("live.chunk"):
+                frames = session.push(data)
+            if frames:
+                await _send(websocket, {
+                    "type": "pitch",
+                    "frames": frames,
+                    "processing_ms": round((time.perf_counter() - started) * 1000, 2),
+                })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.gauge_add("idol_live_sessions", -1)
@@ -1,15 +1,36 @@
 import os
-from fastapi import FastAPI
+import time
+import mimetypes
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from song import router as song_router
 from user import router as user_router
+from live import router as live_router
+from jobs import resume_pending_jobs
+import metrics
+from warmup import start_warmup, readiness
+from results_sink import results_sink
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up song preparation jobs interrupted by a restart or crash
+    resume_pending_jobs()
+    # Load models and heavy imports off the request path; see GET /ready
+    start_warmup()
+    yield
+    # Write analysis results still buffered in memory
+    results_sink.close()
+
+
 # uvicorn main:app --reload
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # ── CORS ───────────────────────────────────────────────────────────────────────
 # Add origins via FRONTEND_URL env var for production; localhost:3000 always allowed.
@@ -24,12 +45,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Metrics ────────────────────────────────────────────────────────────────────
+# Request latency per route template (not raw path, to keep label cardinality low).
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    metrics.gauge_add("idol_http_requests_in_flight", 1, help="HTTP requests being handled")
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        labels = {
+            "method": request.method,
+            "route": getattr(route, "path", "unmatched"),
+            "status": str(status),
+        }
+        metrics.gauge_add("idol_http_requests_in_flight", -1)
+        metrics.observe("idol_http_request_seconds", time.perf_counter() - started, labels,
+                        "HTTP request latency in seconds")
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# ── Readiness ──────────────────────────────────────────────────────────────────
+@app.get("/ready", include_in_schema=False)
+def ready():
+    """200 once warm-up has finished (route traffic here), 503 while warming or if it failed."""
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
 # ── API routes ─────────────────────────────────────────────────────────────────
 app.include_router(song_router, prefix="/songs", tags=["Songs"])
 app.include_router(user_router, prefix="/user", tags=["User"])
+app.include_router(live_router, prefix="/live", tags=["Live"])
 
 # ── Static audio files ─────────────────────────────────────────────────────────
 # Served at /audio/<song_name>/vocals.wav  etc.
 # Using /audio instead of /songs to avoid prefix collision with the songs router.
+# Compressed renditions live under /audio/<song_name>/renditions/.
+mimetypes.add_type("audio/ogg", ".opus")
+mimetypes.add_type("audio/mp4", ".m4a")
 os.makedirs("songs", exist_ok=True)
 app.mount("/audio", StaticFiles(directory="songs"), name="audio")
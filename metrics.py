@@ -0,0 +1,191 @@
+import re
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+import psutil
+
+# ── In-process metrics ─────────────────────────────────────────────────────────
+# Spans time a block of work (a pipeline stage, a storage/Mongo/LLM call) into a
+# latency histogram, an error counter and an in-flight gauge, exported in the
+# Prometheus text format on GET /metrics. Spans inside `request_timings()` are
+# also collected per request for the Server-Timing response header.
+#
+# Metrics are per process: with several uvicorn/gunicorn workers each one
+# exports its own, and Prometheus sums them across scrapes.
+
+# Seconds. The pipeline spans 1 ms storage hits to 30 s+ transcriptions.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+_lock = threading.Lock()
+_histograms = {}     # (name, labels) -> [bucket counts..., sum, count]
+_counters = {}       # (name, labels) -> float
+_gauges = {}         # (name, labels) -> float
+_help = {}           # name -> (type, help text)
+
+# Per-request span durations: list of (span name, seconds), or None outside a request
+_request_spans: ContextVar = ContextVar("request_spans", default=None)
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def _describe(name: str, kind: str, text: str):
+    _help.setdefault(name, (kind, text))
+
+
+def observe(name: str, seconds: float, labels: dict = None, help: str = ""):
+    """Record one latency observation into histogram `name`."""
+    _describe(name, "histogram", help)
+    key = _key(name, labels)
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                row[i] += 1
+        row[-2] += seconds
+        row[-1] += 1
+
+
+def inc(name: str, value: float = 1, labels: dict = None, help: str = ""):
+    """Add `value` to counter `name`."""
+    _describe(name, "counter", help)
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def gauge_add(name: str, value: float, labels: dict = None, help: str = ""):
+    """Move gauge `name` up or down by `value`."""
+    _describe(name, "gauge", help)
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+
+def gauge_set(name: str, value: float, labels: dict = None, help: str = ""):
+    _describe(name, "gauge", help)
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time the enclosed block as span `name` (e.g. "pipeline.transcribe", "storage.read_file").
+
+    Records latency, errors and in-flight count; never swallows exceptions.
+    """
+    labels = {"span": name}
+    gauge_add("idol_span_in_flight", 1, labels, "Spans currently running")
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        inc("idol_span_errors_total", 1, labels, "Spans that raised")
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        gauge_add("idol_span_in_flight", -1, labels)
+        observe("idol_span_seconds", elapsed, labels, "Span latency in seconds")
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def timed(name: str):
+    """Decorator form of `span`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def request_timings():
+    """
+    Collect the spans run in this context (same thread / task) for one request.
+
+    Yields a list of (span name, seconds); pass it to `server_timing_header`.
+    Work handed to other threads (background pool) is not included.
+    """
+    spans = []
+    token = _request_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _request_spans.reset(token)
+
+
+def server_timing_header(spans, total: float = None) -> str:
+    """
+    Format collected spans as a Server-Timing header value.
+
+    Repeated spans (e.g. several storage reads) are summed, in first-seen order.
+    """
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    if total is not None:
+        totals["total"] = total
+    # Metric names must be HTTP tokens
+    return ", ".join(f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={seconds * 1000:.1f}"
+                     for name, seconds in totals.items())
+
+
+# ── Export ─────────────────────────────────────────────────────────────────────
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _update_process_gauges():
+    process = psutil.Process()
+    with process.oneshot():
+        memory = process.memory_info()
+        cpu = process.cpu_times()
+        gauge_set("idol_process_resident_memory_bytes", memory.rss, help="Resident memory")
+        gauge_set("idol_process_cpu_seconds", cpu.user + cpu.system, help="User + system CPU time")
+        gauge_set("idol_process_threads", process.num_threads(), help="OS threads")
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    _update_process_gauges()
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    for store, kind in ((histograms, "histogram"), (counters, "counter"), (gauges, "gauge")):
+        for name in sorted({name for name, _ in store}):
+            _, text = _help.get(name, (kind, ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(store.items()):
+                if metric != name:
+                    continue
+                if kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                    continue
+                for bound, count in zip(LATENCY_BUCKETS, value):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value[-2]:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
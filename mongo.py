@@ -3,10 +3,8 @@ import json
 import unicodedata
 import re
 from typing import List, Dict, Optional, Any
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.database import Database
 from dotenv import load_dotenv
+from metrics import timed
 
 load_dotenv()
 
@@ -20,12 +18,14 @@ class MongoHandler:
     def _connect(self):
         """Establish connection to MongoDB"""
         try:
+            from pymongo import MongoClient   # imported on first use; pymongo is slow to import
             self.client = MongoClient(os.getenv("MONGODB_URI"))
             self.db = self.client[os.getenv("MONGODB_DB")]
             self.songs_collection = self.db["songs_db"]
         except Exception as e:
             raise Exception(f"Failed to connect to MongoDB: {e}")
     
+    @timed("mongo.get_all_songs")
     def get_all_songs(self) -> List[Dict[str, Any]]:
         """Get all songs from the database"""
         try:
@@ -34,6 +34,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error fetching all songs: {e}")
     
+    @timed("mongo.get_song_by_title")
     def get_song_by_title(self, title: str, exact_match: bool = False) -> Optional[Dict[str, Any]]:
         """
         Get a song by title
@@ -58,6 +59,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error fetching song by title '{title}': {e}")
     
+    @timed("mongo.get_song_by_normalized_title")
     def get_song_by_normalized_title(self, normalized_title: str) -> Optional[Dict[str, Any]]:
         """Get a song by its normalized title"""
         try:
@@ -70,6 +72,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error fetching song by normalized title '{normalized_title}': {e}")
     
+    @timed("mongo.insert_song")
     def insert_song(self, song_data: Dict[str, Any]) -> bool:
         """
         Insert a single song into the database
@@ -90,6 +93,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error inserting song: {e}")
     
+    @timed("mongo.insert_multiple_songs")
     def insert_multiple_songs(self, songs_data: List[Dict[str, Any]]) -> bool:
         """
         Insert multiple songs into the database
@@ -111,6 +115,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error inserting multiple songs: {e}")
     
+    @timed("mongo.update_song")
     def update_song(self, title: str, update_data: Dict[str, Any]) -> bool:
         """
         Update a song by title
@@ -132,6 +137,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error updating song '{title}': {e}")
     
+    @timed("mongo.delete_song")
     def delete_song(self, title: str) -> bool:
         """
         Delete a song by title
@@ -149,6 +155,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error deleting song '{title}': {e}")
     
+    @timed("mongo.song_exists")
     def song_exists(self, title: str) -> bool:
         """
         Check if a song exists in the database
@@ -166,6 +173,7 @@ class MongoHandler:
         except Exception as e:
             raise Exception(f"Error checking if song exists '{title}': {e}")
     
+    @timed("mongo.search_songs")
     def search_songs(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Search songs by title or artist
@@ -194,33 +202,48 @@ class MongoHandler:
     
     def load_songs_from_json(self, json_file_path: str) -> bool:
         """
-        Load songs from a JSON file into the database
+        Load songs from a JSON array file or a JSON-lines (.jsonl) ledger into the database
         
         Args:
-            json_file_path (str): Path to the JSON file
+            json_file_path (str): Path to the JSON / JSONL file
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
             with open(json_file_path, 'r', encoding='utf-8') as f:
-                songs_data = json.load(f)
-            
-            # Add normalized titles and insert only if not already present
-            inserted_count = 0
-            for song in songs_data:
-                if "normalized_title" not in song and "title" in song:
-                    song["normalized_title"] = self.normalize_text(song["title"])
-                
-                # Check if song already exists
-                if not self.song_exists(song["title"]):
-                    self.songs_collection.insert_one(song)
-                    inserted_count += 1
-            
-            print(f"Successfully inserted {inserted_count} new songs from {json_file_path}")
-            return True
+                if json_file_path.endswith('.jsonl'):
+                    songs_data = [json.loads(line) for line in f if line.strip()]
+                else:
+                    songs_data = json.load(f)
+            return self.load_songs(songs_data, json_file_path)
         except Exception as e:
             raise Exception(f"Error loading songs from JSON file '{json_file_path}': {e}")
+
+    def load_songs(self, songs_data, source: str = "iterable") -> bool:
+        """
+        Insert songs from any iterable of song dicts, skipping titles already present
+        
+        Args:
+            songs_data: Iterable of song dictionaries (may be a generator)
+            source (str): Label used in the log line
+            
+        Returns:
+            bool: True if successful
+        """
+        # Add normalized titles and insert only if not already present
+        inserted_count = 0
+        for song in songs_data:
+            if "normalized_title" not in song and "title" in song:
+                song["normalized_title"] = self.normalize_text(song["title"])
+            
+            # Check if song already exists
+            if not self.song_exists(song["title"]):
+                self.songs_collection.insert_one(song)
+                inserted_count += 1
+        
+        print(f"Successfully inserted {inserted_count} new songs from {source}")
+        return True
     
     @staticmethod
     def normalize_text(text: str) -> str:
@@ -293,7 +316,7 @@ if __name__ == "__main__":
         handler = MongoHandler()
         
         # Load songs from JSON file (optional)
-        # handler.load_songs_from_json('songs/songs_db.json')
+        # handler.load_songs_from_json('songs/ledger/songs_db.jsonl')
         
         # Test getting all songs
         all_songs = handler.get_all_songs()
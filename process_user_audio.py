@@ -1,48 +1,20 @@
 import json
 import os
-import time
-import numpy as np
 
 from scripts_user.lyric_matcher import get_words_only, identify_sung_part
 from scripts_user.transcribe_with_whisper import transcribe_with_whisper
-from scripts_user.compare_pitch_dtw import extract_pitch_contour
+from scripts_user.compare_pitch_dtw import extract_pitch_contour, save_pitch_analysis
 from scripts_user.audio_analysis import analyze_audio_match_enhanced
 from scripts.agents import coach_agent, identify_sung_part_agent
 from s3_handler import storage
+from background import submit_background
+from metrics import span
+from results_sink import record_result
+from serialization import dumps, Fragment
 
-
-def convert_to_serializable(obj):
-    """Recursively convert numpy types to plain Python for JSON serialisation."""
-    if isinstance(obj, dict):
-        return {k: convert_to_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_serializable(i) for i in obj]
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    return obj
-
-
-def cleanup_temp_files(user_audio_path, user_transcription_path):
-    """Remove temporary per-request files from storage."""
-    for path in (user_audio_path, user_transcription_path):
-        if not path:
-            continue
-        try:
-            if storage.file_exists(path):
-                if storage.is_production:
-                    storage.s3_client.delete_object(
-                        Bucket=storage.bucket_name, Key=path
-                    )
-                    print(f"✅ Deleted from S3: {path}")
-                else:
-                    os.remove(path)
-                    print(f"✅ Deleted locally: {path}")
-        except Exception as e:
-            print(f"⚠️ Could not delete {path}: {e}")
+# Opt-in debug sink: persist per-request transcriptions and pitch contours to
+# storage (in the background). The pipeline itself never reads them back.
+DEBUG_PERSIST_INTERMEDIATES = os.getenv("DEBUG_PERSIST_INTERMEDIATES", "false").lower() == "true"
 
 
 def _fuzzy_fallback(song_alignment, user_words):
@@ -59,58 +31,68 @@ def process_user_audio(user_audio_path, gentle_json_path, reference_audio_path,
       3. Identify which segment of the song the user sang  ← now uses LLM
       4. Run pitch / DTW / audio analysis on that segment
       5. Generate coaching feedback with Groq
-    """
-    user_transcription_path = None
 
-    try:
-        # ── 1. Load song alignment ─────────────────────────────────────────────
-        # Prefer local disk (covers songs processed before S3 migration, and
-        # songs already in the local cache downloaded by song.py).
-        # Fall back to S3 only when the file isn't present locally.
+    Intermediates (transcription, pitch contours) are passed between stages in
+    memory; set DEBUG_PERSIST_INTERMEDIATES=true to also write them to storage.
+    Each stage runs in a `pipeline.*` metrics span (see metrics.py).
+    """
+    # ── 1. Load song alignment ─────────────────────────────────────────────────
+    # Prefer local disk (covers songs processed before S3 migration, and
+    # songs already in the local cache downloaded by song.py).
+    # Fall back to storage (read-through cached) when the file isn't present locally.
+    with span("pipeline.load_alignment"):
         if os.path.exists(gentle_json_path):
             with open(gentle_json_path, "r", encoding="utf-8") as f:
                 gentle_alignment = json.load(f)
             print(f"📂 Loaded alignment from local: {gentle_json_path}")
         else:
-            print(f"☁️  Alignment not local — downloading from S3: {gentle_json_path}")
+            print(f"☁️  Alignment not local — reading from storage: {gentle_json_path}")
             raw = storage.read_file(gentle_json_path)
             gentle_alignment = json.loads(raw) if isinstance(raw, str) else raw
-        song_words = get_words_only(gentle_alignment)
-
-        # ── 2. Transcribe user audio ───────────────────────────────────────────
-        print("Transcribing user audio …")
-        user_transcription_path = f"user_transcriptions/{file_id}_transcription.json"
-        transcribe_with_whisper(user_audio_path, user_transcription_path)
-
-        raw_trans = storage.read_file(user_transcription_path)
-        user_alignment = json.loads(raw_trans) if isinstance(raw_trans, str) else raw_trans
-        user_words = get_words_only(user_alignment["alignment"])
-        print(f"User words: {user_words}")
+    song_words = get_words_only(gentle_alignment)
+
+    # ── 2. Transcribe user audio ───────────────────────────────────────────────
+    print("Transcribing user audio …")
+    with span("pipeline.transcribe"):
+        user_alignment = transcribe_with_whisper(
+            user_audio_path,
+            f"user_transcriptions/{file_id}_transcription.json" if DEBUG_PERSIST_INTERMEDIATES else None,
+        )
+    user_words = get_words_only(user_alignment["alignment"])
+    print(f"User words: {user_words}")
 
-        # ── 3. Extract pitch contours ──────────────────────────────────────────
-        print("Extracting pitch contours …")
+    # ── 3. Extract pitch contours ──────────────────────────────────────────────
+    print("Extracting pitch contours …")
+    with span("pipeline.pitch"):
         user_pitch = extract_pitch_contour(user_audio_path)
         ref_pitch  = extract_pitch_contour(reference_audio_path)
-        sr         = 16000
-        hop_length = 512
+    sr         = 16000
+    hop_length = 512
+
+    if DEBUG_PERSIST_INTERMEDIATES:
+        submit_background(
+            save_pitch_analysis,
+            {"pitch_contour": user_pitch, "reference_audio_path": reference_audio_path},
+            f"pitch_analysis/{file_id}_pitch.json",
+        )
 
-        # ── 4. Identify sung segment (LLM-first, fuzzy fallback) ──────────────
-        print("Identifying sung segment via LLM …")
-        t0 = time.perf_counter()
+    # ── 4. Identify sung segment (LLM-first, fuzzy fallback) ──────────────────
+    print("Identifying sung segment via LLM …")
+    with span("pipeline.match"):
         match = identify_sung_part_agent(
             song_alignment=gentle_alignment,
             user_words=user_words,
             fallback_fn=_fuzzy_fallback,
         )
-        print(f"Segment identified in {time.perf_counter() - t0:.2f}s")
 
-        if not match:
-            return {"error": "Could not locate the sung segment in the song."}
+    if not match:
+        return {"error": "Could not locate the sung segment in the song."}
 
-        print(f"🎯 Matched segment: {match['start_time']:.2f}s – {match['end_time']:.2f}s")
-        print(f"   Lyrics: {match['song_words_snippet']}")
+    print(f"🎯 Matched segment: {match['start_time']:.2f}s – {match['end_time']:.2f}s")
+    print(f"   Lyrics: {match['song_words_snippet']}")
 
-        # ── 5. Audio analysis + coaching feedback ─────────────────────────────
+    # ── 5. Audio analysis + coaching feedback ─────────────────────────────────
+    with span("pipeline.analyze"):
         analysis = analyze_audio_match_enhanced(
             user_audio_path=user_audio_path,
             reference_audio_path=reference_audio_path,
@@ -118,21 +100,22 @@ def process_user_audio(user_audio_path, gentle_json_path, reference_audio_path,
             ref_pitch=ref_pitch,
             sr=sr,
             hop_length=hop_length,
+            user_pitch=user_pitch,
         )
 
+    with span("pipeline.coach"):
         feedback = coach_agent(analysis)
 
-        # Persist analysis for debugging / history
-        analysis_serializable = convert_to_serializable(analysis)
-        storage.write_file(
-            f"analysis_results_{int(time.time())}.json",
-            json.dumps(analysis_serializable, indent=2),
-        )
-
-        return {"output": feedback, "voice_analysis": json.dumps(analysis_serializable, indent=2)}
+    # The analysis dict (numpy values included) is encoded once; the bytes are
+    # stored for offline tuning (batched, off the request path) and returned as
+    # voice_analysis. That stays a string because the frontend saves it verbatim
+    # with the chat, so the response encoder escapes it once more as a string.
+    # It is compact JSON (it used to be indented); agents.py parses either.
+    with span("pipeline.persist"):
+        analysis_json = dumps(analysis)
+        record_result(file_id, Fragment(analysis_json), reference_audio_path=reference_audio_path)
 
-    finally:
-        cleanup_temp_files(None, user_transcription_path)
+    return {"output": feedback, "voice_analysis": analysis_json.decode("utf-8")}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import os
+import sys
+import hmac
+import json
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from s3_handler import storage
+from background import submit_background
+
+load_dotenv()
+
+# ── Opt-in per-request profiling ───────────────────────────────────────────────
+# An operator adds `X-Profile: 1` (or `?profile=1`) plus the admin token in
+# `X-Profile-Token` (or `?profile_token=`) to one request. That request's
+# thread is sampled with sys._current_frames() and the result is written to
+# storage as a speedscope profile (https://www.speedscope.app):
+#     profiles/<request id>.speedscope.json
+# Without the flag nothing is started, so unprofiled requests pay nothing.
+# Profiling is disabled entirely while PROFILER_ADMIN_TOKEN is unset.
+PROFILER_ADMIN_TOKEN = os.getenv("PROFILER_ADMIN_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))   # sampling stops after this
+PROFILE_PREFIX = "profiles"
+
+_TRUTHY = {"1", "true", "yes", "on"}
+
+
+def profile_requested(request) -> bool:
+    """True when `request` (a FastAPI/Starlette Request) asks for a profile with a valid admin token."""
+    if not PROFILER_ADMIN_TOKEN:
+        return False
+    flag = request.headers.get("x-profile") or request.query_params.get("profile") or ""
+    if flag.lower() not in _TRUTHY:
+        return False
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile_token") or ""
+    return hmac.compare_digest(token.encode(), PROFILER_ADMIN_TOKEN.encode())
+
+
+def profile_path(request_id: str) -> str:
+    return f"{PROFILE_PREFIX}/{request_id}.speedscope.json"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a daemon thread.
+
+    Only the target thread is sampled: time it spends waiting on other pools
+    or processes shows up as the frame that is waiting (e.g. `Future.result`).
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL_MS / 1000,
+                 max_seconds: float = PROFILE_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.frames = []          # speedscope shared frames
+        self._frame_index = {}    # (name, file, line) -> index in self.frames
+        self.samples = []         # stacks of frame indices, root first
+        self.weights = []         # ms covered by each sample
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.elapsed = 0.0
+
+    def _index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": getattr(code, "co_qualname", code.co_name),
+                                "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - self.started_at > self.max_seconds:
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append((now - last) * 1000)
+            last = now
+            del frame
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def to_speedscope(self, name: str) -> dict:
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "idol-coach profiler",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": self.elapsed * 1000,
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+        }
+
+
+@contextmanager
+def capture(request_id: str, enabled: bool, name: str = None):
+    """
+    Profile the enclosed block on the current thread when `enabled`.
+
+    Yields the storage path the profile will be written to (None when disabled).
+    The profile is written in the background once the block exits, even if it raised.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = SamplingProfiler(threading.get_ident()).start()
+    path = profile_path(request_id)
+    print(f"🔬 Profiling {name or request_id} → {path}")
+    try:
+        yield path
+    finally:
+        profiler.stop()
+        profile = profiler.to_speedscope(name or request_id)
+        submit_background(storage.write_file, path, json.dumps(profile))
+        print(f"🔬 Profiled {len(profiler.samples)} samples over {profiler.elapsed:.1f}s → {path}")
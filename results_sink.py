@@ -0,0 +1,170 @@
+"""
+results_sink.py
+───────────────
+Write-behind store for per-request analysis results, replacing the
+synchronous analysis_results_<unix seconds>.json written to the storage root
+on every request (which collided within a second and piled up unpartitioned).
+
+  • `record()` only appends to an in-memory buffer; the request never waits on storage.
+  • A background thread flushes the buffer every RESULTS_FLUSH_SECONDS or once
+    RESULTS_BATCH_SIZE records are waiting, as one gzipped JSON-lines object:
+        analysis_results/date=<YYYY-MM-DD>/<time>-<pid>-<rand>.jsonl.gz
+  • Each line is {"request_id", "recorded_at", "reference_audio_path", "analysis"},
+    keyed by the request's UUID, so nothing is ever overwritten.
+
+Read results back for offline tuning:
+    python results_sink.py [--since 2026-01-01] [--until 2026-01-31] [--limit 10] > results.jsonl
+"""
+
+import os
+import sys
+import gzip
+import time
+import uuid
+import atexit
+import argparse
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from s3_handler import storage
+from metrics import inc
+from serialization import dumps, loads
+
+load_dotenv()
+
+RESULTS_PREFIX = "analysis_results"
+RESULTS_FLUSH_SECONDS = float(os.getenv("RESULTS_FLUSH_SECONDS", "30"))
+RESULTS_BATCH_SIZE = int(os.getenv("RESULTS_BATCH_SIZE", "50"))
+# Records kept while storage is failing; the oldest are dropped beyond this
+RESULTS_MAX_BUFFER = int(os.getenv("RESULTS_MAX_BUFFER", "2000"))
+
+
+def _encode(record: dict) -> bytes:
+    return dumps(record) + b"\n"
+
+
+class ResultsSink:
+    """Buffers analysis records in memory and writes them in batches from a daemon thread."""
+
+    def __init__(self, flush_seconds: float = RESULTS_FLUSH_SECONDS, batch_size: int = RESULTS_BATCH_SIZE):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()     # one batch write at a time
+        self._thread = None
+        self._closed = False
+
+    def record(self, request_id: str, analysis, **fields):
+        """
+        Queue one analysis for the next batch. Never blocks on storage.
+        `analysis` is a dict or an already-encoded `serialization.Fragment`.
+        """
+        record = {
+            "request_id": request_id,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            **fields,
+            "analysis": analysis,
+        }
+        with self._cond:
+            self._buffer.append(record)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="results-sink", daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._buffer) >= self.batch_size,
+                                    timeout=self.flush_seconds)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered as one batch; returns the number of records written."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            now = datetime.now(timezone.utc)
+            key = (f"{RESULTS_PREFIX}/date={now:%Y-%m-%d}/"
+                   f"{now:%H%M%S%f}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl.gz")
+            body = gzip.compress(b"".join(_encode(r) for r in batch))
+            try:
+                storage.write_file(key, body, mode="wb")
+            except Exception as e:
+                print(f"❌ Failed to write {len(batch)} analysis result(s): {e}")
+                with self._cond:
+                    self._buffer[:0] = batch
+                    overflow = len(self._buffer) - RESULTS_MAX_BUFFER
+                    if overflow > 0:
+                        del self._buffer[:overflow]
+                        inc("idol_results_dropped_total", overflow, help="Analysis results dropped after write failures")
+                        print(f"⚠️  Dropped {overflow} oldest analysis result(s)")
+                return 0
+            inc("idol_results_written_total", len(batch), help="Analysis results written to storage")
+            return len(batch)
+
+    def close(self):
+        """Stop the flusher and write what is left (shutdown hook)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+results_sink = ResultsSink()
+atexit.register(results_sink.close)
+
+
+def record_result(request_id: str, analysis: dict, **fields):
+    results_sink.record(request_id, analysis, **fields)
+
+
+# ── Reader ─────────────────────────────────────────────────────────────────────
+
+def _partition_date(path: str):
+    for part in path.split("/"):
+        if part.startswith("date="):
+            return part[len("date="):]
+    return None
+
+
+def iter_results(since: str = None, until: str = None):
+    """
+    Stream stored analysis records, oldest batch first.
+
+    `since` / `until` are inclusive YYYY-MM-DD bounds on the partition date (UTC).
+    """
+    for path in storage.list_files(f"{RESULTS_PREFIX}/"):
+        date = _partition_date(path)
+        if not path.endswith(".jsonl.gz") or date is None:
+            continue
+        if (since and date < since) or (until and date > until):
+            continue
+        for line in gzip.decompress(storage.read_file(path, mode="rb")).splitlines():
+            if line.strip():
+                yield loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dump stored analysis results as JSON lines.")
+    parser.add_argument("--since", help="First partition date, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--until", help="Last partition date, YYYY-MM-DD (inclusive)")
+    parser.add_argument("--limit", type=int, help="Stop after this many records")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = 0
+    for count, result in enumerate(iter_results(args.since, args.until), 1):
+        sys.stdout.buffer.write(_encode(result))
+        if args.limit and count >= args.limit:
+            break
+    print(f"✅ {count} result(s) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
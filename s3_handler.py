@@ -1,27 +1,266 @@
 import os
-import boto3
-from botocore.exceptions import ClientError
+import re
+import io
+import mmap
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
 import json
-from botocore.config import Config
 from dotenv import load_dotenv
+from metrics import timed, inc
 
 load_dotenv()
+
+# ── Local read-through cache config ────────────────────────────────────────────
+STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR", "storage_cache")
+STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# Seconds before a cached object is revalidated against S3 with a conditional GET.
+# Song assets are write-once, so the default is long; 0 disables revalidation.
+STORAGE_CACHE_REVALIDATE_SECONDS = int(os.getenv("STORAGE_CACHE_REVALIDATE_SECONDS", "86400"))
+# A path handed out this recently may still be open in another worker, so it is
+# never evicted or swept, even when the cache is over budget.
+STORAGE_CACHE_IN_USE_SECONDS = int(os.getenv("STORAGE_CACHE_IN_USE_SECONDS", "300"))
+# Written once and not read back by the app (results batches, ledger shards,
+# profiles, archived takes): uploads under these skip the write-through copy.
+_WRITE_ONLY_PREFIXES = ("analysis_results/", "songs/ledger/", "profiles/", "user_vocals/")
+_CHUNK_SIZE = 1024 * 1024
+# Misses on keys that hash to the same stripe share a lock (bounded, unlike a lock per key)
+_KEY_LOCK_STRIPES = 64
+_INDEX_DB = "index.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key           TEXT PRIMARY KEY,
+    etag          TEXT NOT NULL,
+    name          TEXT NOT NULL,
+    size_bytes    INTEGER NOT NULL,
+    validated_at  REAL NOT NULL,
+    last_accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_lru ON objects(last_accessed);
+"""
+
+
+def _client_error():
+    """botocore's ClientError, imported on first use like boto3 itself (see `s3_client`)."""
+    from botocore.exceptions import ClientError
+    return ClientError
+
+
+class LocalObjectCache:
+    """
+    Content-addressed, byte-budgeted LRU cache of S3 objects on local disk.
+
+    Each entry is stored as `<sha1(key)>.<etag>` so a new version of a key never
+    overwrites a copy another reader may still have open. Every worker process
+    shares the directory, so the index lives in SQLite inside it (WAL mode, as
+    in song_cache.py): the byte budget is global, and each mutation runs in a
+    `BEGIN IMMEDIATE` transaction, which serialises eviction across processes.
+    Entries used in the last `in_use_seconds` are never evicted.
+    """
+
+    def __init__(self, cache_dir, max_bytes, revalidate_after,
+                 in_use_seconds=STORAGE_CACHE_IN_USE_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.in_use_seconds = in_use_seconds
+        self.db_path = os.path.join(cache_dir, _INDEX_DB)
+        self._key_locks = [threading.Lock() for _ in range(_KEY_LOCK_STRIPES)]
+        os.makedirs(cache_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        with self._transaction() as conn:
+            self._sweep(conn)
+            self._evict_to_budget(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _name_for(self, key, etag):
+        return f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.{etag}"
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _sweep(self, conn):
+        """Drop rows whose file is gone, and files no row points at once they are out of use."""
+        indexed = set()
+        for key, name in conn.execute("SELECT key, name FROM objects").fetchall():
+            if os.path.exists(self._path(name)):
+                indexed.add(name)
+            else:
+                conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+        # Recent unindexed files are downloads in flight (.tmp) or about to be indexed
+        in_use_after = time.time() - self.in_use_seconds
+        for name in os.listdir(self.cache_dir):
+            if name in indexed or name.startswith(_INDEX_DB):
+                continue
+            try:
+                if os.stat(self._path(name)).st_mtime < in_use_after:
+                    os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def key_lock(self, key):
+        """Striped lock so concurrent misses on one key in this process trigger a single download."""
+        digest = hashlib.sha1(key.encode("utf-8")).digest()
+        return self._key_locks[int.from_bytes(digest[:4], "big") % _KEY_LOCK_STRIPES]
+
+    def lookup(self, key):
+        """Return the cache entry for `key` (marking it most-recently-used) or None."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT etag, name, size_bytes, validated_at FROM objects WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            etag, name, size, validated_at = row
+            if not os.path.exists(self._path(name)):
+                conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE objects SET last_accessed = ? WHERE key = ?", (time.time(), key))
+        return {"etag": etag, "path": self._path(name), "size": size, "validated_at": validated_at}
+
+    def is_stale(self, entry):
+        if self.revalidate_after <= 0:
+            return entry["validated_at"] == 0
+        return time.time() - entry["validated_at"] > self.revalidate_after
+
+    def mark_validated(self, key):
+        with self._transaction() as conn:
+            conn.execute("UPDATE objects SET validated_at = ? WHERE key = ?", (time.time(), key))
+
+    def store(self, key, etag, body):
+        """Stream `body` (anything with .read(n)) into the cache and return its local path."""
+        etag = re.sub(r"[^A-Za-z0-9-]", "", etag or "") or "noetag"
+        name = self._name_for(key, etag)
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        size = 0
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = body.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._transaction() as conn:
+            old = conn.execute("SELECT name FROM objects WHERE key = ?", (key,)).fetchone()
+            if old is not None and old[0] != name:
+                self._remove(self._path(old[0]))
+            conn.execute(
+                "INSERT INTO objects(key, etag, name, size_bytes, validated_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET etag = excluded.etag, name = excluded.name, "
+                "size_bytes = excluded.size_bytes, validated_at = excluded.validated_at, "
+                "last_accessed = excluded.last_accessed",
+                (key, etag, name, size, now, now),
+            )
+            self._evict_to_budget(conn, keep=key)
+        return path
+
+    def invalidate(self, key):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT name FROM objects WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+                self._remove(self._path(row[0]))
+
+    def _evict_to_budget(self, conn, keep=None):
+        """Evict least-recently-used entries that are out of use until under budget."""
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        candidates = conn.execute(
+            "SELECT key, name, size_bytes FROM objects "
+            "WHERE key IS NOT ? AND last_accessed < ? ORDER BY last_accessed ASC",
+            (keep, time.time() - self.in_use_seconds),
+        ).fetchall()
+        for key, name, size in candidates:
+            if total <= self.max_bytes:
+                break
+            self._remove(self._path(name))
+            conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+            total -= size
+            print(f"🗑️  Storage cache full — evicted: {key}")
+        if total > self.max_bytes:
+            print(f"⚠️  Storage cache still over budget ({total} bytes) — remaining entries are in use")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
 class StorageHandler:
     def __init__(self):
         self.is_production = os.getenv('PRODUCTION', 'false').lower() == 'true'
         print(os.getenv('PRODUCTION', 'false').lower(),os.getenv('PRODUCTION', 'false').lower()=="true")
         self.bucket_name = os.getenv('S3_BUCKET_NAME', 'your-bucket-name')
         
+        self._s3_client = None
+        self._client_lock = threading.Lock()
+
         if self.is_production:
-            self.s3_client = boto3.client('s3',config=Config(signature_version='s3v4'),region_name=os.getenv("AWS_REGION"))
+            self.cache = LocalObjectCache(
+                STORAGE_CACHE_DIR,
+                STORAGE_CACHE_MAX_BYTES,
+                STORAGE_CACHE_REVALIDATE_SECONDS,
+            )
         else:
-            self.s3_client = None
+            self.cache = None
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, built on first use (importing boto3 is slow); None locally"""
+        if not self.is_production or self._s3_client is not None:
+            return self._s3_client
+        with self._client_lock:
+            if self._s3_client is None:
+                import boto3
+                from botocore.config import Config
+                self._s3_client = boto3.client('s3', config=Config(signature_version='s3v4'), region_name=os.getenv("AWS_REGION"))
+            return self._s3_client
     
+    def _write_through(self, file_path, etag, body):
+        """Copy a fresh upload into the read-through cache, unless nothing reads it back."""
+        if not file_path.startswith(_WRITE_ONLY_PREFIXES):
+            self.cache.store(file_path, etag, body)
+
     def ensure_directory_exists(self, path):
         """Create directory if using local storage"""
         if not self.is_production:
             os.makedirs(path, exist_ok=True)
     
+    @timed("storage.write_file")
     def write_file(self, file_path, content, mode='w'):
         """Write file to local storage or S3"""
         if self.is_production:
@@ -29,7 +268,7 @@ class StorageHandler:
             try:
                 if mode == 'wb':
                     # Binary content
-                    self.s3_client.put_object(
+                    response = self.s3_client.put_object(
                         Bucket=self.bucket_name,
                         Key=file_path,
                         Body=content
@@ -38,13 +277,15 @@ class StorageHandler:
                     # Text content
                     if isinstance(content, str):
                         content = content.encode('utf-8')
-                    self.s3_client.put_object(
+                    response = self.s3_client.put_object(
                         Bucket=self.bucket_name,
                         Key=file_path,
                         Body=content
                     )
+                # Write-through so an immediate read-back never hits S3
+                self._write_through(file_path, response.get('ETag'), io.BytesIO(content))
                 print(f"✅ Uploaded to S3: s3://{self.bucket_name}/{file_path}")
-            except ClientError as e:
+            except _client_error() as e:
                 print(f"❌ S3 upload failed: {e}")
                 raise
         else:
@@ -57,33 +298,128 @@ class StorageHandler:
                 f.write(content)
             print(f"✅ Saved locally: {file_path}")
     
-    def read_file(self, file_path, mode='r'):
-        """Read file from local storage or S3"""
+    @timed("storage.store_local_file")
+    def store_local_file(self, local_path, file_path, content_type=None):
+        """Move a finished local file into storage (streamed to S3 in production, renamed locally)"""
         if self.is_production:
-            # S3 storage
+            extra = {'ContentType': content_type} if content_type else {}
             try:
-                response = self.s3_client.get_object(
-                    Bucket=self.bucket_name,
-                    Key=file_path
-                )
-                content = response['Body'].read()
-                
-                if mode == 'rb':
-                    return content
-                else:
-                    return content.decode('utf-8')
-            except ClientError as e:
-                print(f"❌ S3 read failed: {e}")
+                with open(local_path, 'rb') as f:
+                    response = self.s3_client.put_object(
+                        Bucket=self.bucket_name, Key=file_path, Body=f, **extra
+                    )
+                with open(local_path, 'rb') as f:
+                    self._write_through(file_path, response.get('ETag'), f)
+                print(f"✅ Uploaded to S3: s3://{self.bucket_name}/{file_path}")
+            except _client_error() as e:
+                print(f"❌ S3 upload failed: {e}")
                 raise
+            finally:
+                os.remove(local_path)
         else:
-            # Local storage
-            if 'b' in mode:
-                with open(file_path, mode) as f:
-                    return f.read()  # returns bytes
+            directory = os.path.dirname(file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            shutil.move(local_path, file_path)
+            print(f"✅ Saved locally: {file_path}")
+
+    @timed("storage.read_file")
+    def read_file(self, file_path, mode='r'):
+        """Read file from local storage or S3 (through the local read-through cache)"""
+        local_path = self.get_local_path(file_path)
+        if 'b' in mode:
+            with open(local_path, 'rb') as f:
+                return f.read()  # returns bytes
+        else:
+            with open(local_path, 'r', encoding='utf-8') as f:
+                return f.read()  # returns str
+
+    @timed("storage.get_local_path")
+    def get_local_path(self, file_path):
+        """
+        Return a local filesystem path holding the contents of `file_path`.
+
+        Locally this is `file_path` itself, as is any absolute path that already
+        exists on disk. In production other objects are served from the
+        read-through cache; S3 is only contacted on a miss, or with a
+        conditional GET once the cached copy is due for revalidation. If the key
+        is not in S3 but exists on local disk (e.g. the song cache), that path
+        is returned instead.
+        """
+        if not self.is_production:
+            return file_path
+        if os.path.isabs(file_path) and os.path.exists(file_path):
+            # Already on local disk (e.g. a spooled upload) — storage keys are never absolute
+            return file_path
+
+        with self.cache.key_lock(file_path):
+            entry = self.cache.lookup(file_path)
+            if entry is not None and not self.cache.is_stale(entry):
+                inc("idol_storage_cache_requests_total", labels={"result": "hit"}, help="Read-through cache lookups")
+                return entry["path"]
+
+            params = {"Bucket": self.bucket_name, "Key": file_path}
+            if entry is not None:
+                params["IfNoneMatch"] = f'"{entry["etag"]}"'
+            try:
+                response = self.s3_client.get_object(**params)
+            except _client_error() as e:
+                code = e.response.get("Error", {}).get("Code")
+                if entry is not None and code in ("304", "NotModified"):
+                    inc("idol_storage_cache_requests_total", labels={"result": "revalidated"})
+                    self.cache.mark_validated(file_path)
+                    return entry["path"]
+                if code in ("404", "NoSuchKey") and os.path.exists(file_path):
+                    return file_path
+                print(f"❌ S3 read failed: {e}")
+                raise
+
+            inc("idol_storage_cache_requests_total", labels={"result": "miss"})
+            print(f"⬇️  Cached from S3: s3://{self.bucket_name}/{file_path}")
+            return self.cache.store(file_path, response.get("ETag"), response["Body"])
+
+    @timed("storage.download_file")
+    def download_file(self, file_path, local_path):
+        """
+        Stream a file from storage to `local_path` without buffering it in memory.
+
+        Data is written to `<local_path>.part` and atomically renamed into place,
+        so `local_path` either does not exist or is complete.
+        """
+        directory = os.path.dirname(local_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        part_path = f"{local_path}.part"
+        try:
+            if self.is_production:
+                self.s3_client.download_file(self.bucket_name, file_path, part_path)
             else:
-                with open(file_path, mode, encoding='utf-8') as f:
-                    return f.read()  # returns str
+                shutil.copyfile(file_path, part_path)
+            os.replace(part_path, local_path)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+    def read_view(self, file_path):
+        """Return a read-only memoryview over the file contents (memory-mapped, no copy)."""
+        with open(self.get_local_path(file_path), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @timed("storage.delete_file")
+    def delete_file(self, file_path):
+        """Delete file from local storage or S3, dropping any cached copy"""
+        if self.is_production:
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_path)
+            self.cache.invalidate(file_path)
+            print(f"✅ Deleted from S3: {file_path}")
+        elif os.path.exists(file_path):
+            os.remove(file_path)
+            print(f"✅ Deleted locally: {file_path}")
     
+    @timed("storage.file_exists")
     def file_exists(self, file_path):
         """Check if file exists in local storage or S3"""
         if self.is_production:
@@ -91,12 +427,27 @@ class StorageHandler:
             try:
                 self.s3_client.head_object(Bucket=self.bucket_name, Key=file_path)
                 return True
-            except ClientError:
+            except _client_error():
                 return False
         else:
             # Local storage
             return os.path.exists(file_path)
     
+    @timed("storage.list_files")
+    def list_files(self, prefix):
+        """List file paths under `prefix` (S3 keys in production), sorted"""
+        if self.is_production:
+            keys = []
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                keys.extend(obj['Key'] for obj in page.get('Contents', []))
+            return sorted(keys)
+        else:
+            paths = []
+            for root, _, files in os.walk(prefix):
+                paths.extend(os.path.join(root, f) for f in files)
+            return sorted(paths)
+
     def get_presigned_url(self, file_path, expiration=3600):
     # """Generate a presigned URL to share an S3 object"""
         if not self.is_production:
@@ -110,7 +461,7 @@ class StorageHandler:
                 ExpiresIn=expiration
             )
             return url
-        except ClientError as e:
+        except _client_error() as e:
             print(f"❌ Failed to generate presigned URL: {e}")
             return None
 
@@ -132,12 +483,14 @@ class StorageHandler:
             sf.write(buffer, audio_data, sample_rate, format='WAV')
             buffer.seek(0)
             
-            self.s3_client.put_object(
+            response = self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=file_path,
                 Body=buffer.getvalue(),
                 ContentType='audio/wav'
             )
+            buffer.seek(0)
+            self._write_through(file_path, response.get('ETag'), buffer)
             print(f"✅ Uploaded audio to S3: s3://{self.bucket_name}/{file_path}")
         else:
             # Local storage
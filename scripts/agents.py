@@ -2,21 +2,36 @@ import os
 from dotenv import load_dotenv
 import re
 import json
+import threading
 from typing import List, Dict, Optional
-from groq import Groq
-from pymongo import MongoClient
-from bson import ObjectId
+from kv_cache import KVCache
+from scripts.title_parser import parse_youtube_title
+from serialization import loads
+from metrics import timed, span
 
 load_dotenv()
 
 # ── Groq client ────────────────────────────────────────────────────────────────
-_groq = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Clients are built on first use so importing this module never touches the
+# network or fails on a bad config; warmup.py builds them at startup.
 MODEL = "llama-3.3-70b-versatile"
+_clients_lock = threading.Lock()
+_groq_client = None
 
 
+def _groq():
+    global _groq_client
+    with _clients_lock:
+        if _groq_client is None:
+            from groq import Groq
+            _groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        return _groq_client
+
+
+@timed("llm.chat")
 def _chat(system: str, user: str, max_tokens: int = 1024) -> str:
     """Single helper — calls Groq and returns the text response."""
-    response = _groq.chat.completions.create(
+    response = _groq().chat.completions.create(
         model=MODEL,
         messages=[
             {"role": "system", "content": system},
@@ -30,7 +45,47 @@ def _chat(system: str, user: str, max_tokens: int = 1024) -> str:
 
 # ── Agent functions ────────────────────────────────────────────────────────────
 
-def extract_title_artist(youtube_title: str):
+# LLM answers only: local parses are cheap to redo, and caching them forever would
+# turn a parser bug into a permanent wrong answer. (The old "title_artist"
+# namespace also held local parses, so it is no longer read.)
+_title_cache = KVCache("title_artist_llm")
+
+
+def _parse_llm_title_artist(text: str):
+    """Pull title/artist out of the LLM reply, tolerating JSON, quotes or plain "title: X" lines."""
+    json_match = re.search(r"\{.*\}", text, re.DOTALL)
+    if json_match:
+        try:
+            data = json.loads(json_match.group())
+            if data.get("title"):
+                return str(data["title"]).strip(), str(data.get("artist") or "").strip()
+        except (ValueError, AttributeError):
+            pass
+    fields = {}
+    for key in ("title", "artist"):
+        m = (re.search(rf'"{key}"\s*:\s*"([^"]+)"', text, re.IGNORECASE)
+             or re.search(rf'^\W*{key}\W*\s*[:=]\s*(.+?)[\s",]*$', text, re.IGNORECASE | re.MULTILINE))
+        if m:
+            fields[key] = m.group(1).strip().strip('"')
+    if fields.get("title"):
+        return fields["title"], fields.get("artist", "")
+    return None
+
+
+def extract_title_artist(youtube_title: str, channel: str = None):
+    """
+    (title, artist) for a YouTube video title. Common shapes are parsed locally
+    (`channel`, the uploader, helps order lyric-video titles); the LLM is only
+    asked when the local parser is unsure, and its answers are cached.
+    """
+    title, artist, confident = parse_youtube_title(youtube_title, channel)
+    if confident:
+        return title, artist
+
+    hit, cached = _title_cache.lookup(youtube_title)
+    if hit:
+        return tuple(cached)
+
     system = (
         "You extract song titles and artist names from YouTube video titles. "
         "Respond only with the requested fields, no extra text."
@@ -42,10 +97,20 @@ Respond in this exact format:
   "title": "Song Name",
   "artist": "Artist Name"
 """
-    text = _chat(system, user, max_tokens=100)
-    print(text)
-    title  = re.search(r'"title":\s*"([^"]+)"', text).group(1)
-    artist = re.search(r'"artist":\s*"([^"]+)"', text).group(1)
+    try:
+        text = _chat(system, user, max_tokens=100)
+        print(text)
+        parsed = _parse_llm_title_artist(text)
+        if not parsed:
+            print(f"⚠️ Could not parse title/artist reply — using local guess for: {youtube_title}")
+            return title, artist
+        title, artist = parsed
+    except Exception as e:
+        # Ingestion should not fail on LLM quota/latency; the local guess is usable
+        print(f"⚠️ Title/artist LLM call failed ({e}) — using local guess for: {youtube_title}")
+        return title, artist
+
+    _title_cache.set(youtube_title, [title, artist])
     return title, artist
 
 
@@ -145,16 +210,26 @@ Plain text only, 2–3 paragraphs.\
 
 
 # ── MongoDB (for chatbot agent) ────────────────────────────────────────────────
-_mongo_client    = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
-_db              = _mongo_client[os.getenv("MONGODB_DB")]
-chats_collection = _db.chats
+_chats_collection = None
+
 
+def chats_collection():
+    global _chats_collection
+    with _clients_lock:
+        if _chats_collection is None:
+            from pymongo import MongoClient
+            client = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+            _chats_collection = client[os.getenv("MONGODB_DB")].chats
+        return _chats_collection
 
+
+@timed("mongo.chat_history")
 def get_chat_history_tool(chat_id: str, limit: int = 10) -> str:
     try:
         if not chat_id:
             return "No chat ID provided"
-        chat = chats_collection.find_one({"_id": ObjectId(chat_id)})
+        from bson import ObjectId
+        chat = chats_collection().find_one({"_id": ObjectId(chat_id)})
         if not chat:
             return "Chat not found"
         messages = chat.get("messages", [])
@@ -171,11 +246,13 @@ def get_chat_history_tool(chat_id: str, limit: int = 10) -> str:
         return f"Error accessing chat history: {e}"
 
 
+@timed("mongo.user_singing_data")
 def get_user_singing_data_tool(chat_id: str) -> str:
     try:
         if not chat_id:
             return "No chat ID provided"
-        chat = chats_collection.find_one({"_id": ObjectId(chat_id)})
+        from bson import ObjectId
+        chat = chats_collection().find_one({"_id": ObjectId(chat_id)})
         if not chat:
             return "No singing data found"
         messages = chat.get("messages", [])
@@ -192,7 +269,7 @@ def get_user_singing_data_tool(chat_id: str) -> str:
                 raw_analysis = msg.get("voice_analysis") or {}
                 if isinstance(raw_analysis, str):
                     try:
-                        raw_analysis = json.loads(raw_analysis)
+                        raw_analysis = loads(raw_analysis)
                     except Exception:
                         raw_analysis = {}
 
@@ -327,11 +404,12 @@ Plain conversational text, 2–3 short paragraphs, no markdown, no numbers.\
 
     except Exception as e:
         print(f"[chatbot_agent] error: {e}")
-        fallback = _groq.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=400,
-        )
+        with span("llm.chat"):
+            fallback = _groq().chat.completions.create(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=400,
+            )
         return fallback.choices[0].message.content
 
 
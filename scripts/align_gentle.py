@@ -1,33 +1,161 @@
+import io
+import os
+import math
+import re
+import json
 import requests
-import json 
+import numpy as np
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from s3_handler import storage  # Import the storage handler
+from scripts.analysis_audio import ANALYSIS_SR, load_analysis_audio
 
 #docker run -p 8765:8765 lowerquality/gentle
-def align_with_gentle(audio_path: str, transcript: str, gentle_url="http://localhost:8765/transcriptions?async=false"):
-    # Read audio file using storage handler
-    if storage.is_production:
-        audio_data = storage.read_file(audio_path, 'rb')
+# One or more Gentle instances; sections are spread across them round-robin.
+GENTLE_URLS = [u.strip().rstrip("/") for u in os.getenv("GENTLE_URLS", "http://localhost:8765").split(",") if u.strip()]
+GENTLE_TIMEOUT = float(os.getenv("GENTLE_TIMEOUT", "600"))                   # seconds per request
+GENTLE_REQUESTS_PER_INSTANCE = int(os.getenv("GENTLE_REQUESTS_PER_INSTANCE", "1"))
+# Songs longer than this are split into lyric sections of roughly this length (0 = never split)
+GENTLE_SECTION_SECONDS = float(os.getenv("GENTLE_SECTION_SECONDS", "60"))
+GENTLE_SECTION_PAD = float(os.getenv("GENTLE_SECTION_PAD", "10"))            # seconds added each side
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=len(GENTLE_URLS),
+                       pool_maxsize=max(4, len(GENTLE_URLS) * GENTLE_REQUESTS_PER_INSTANCE))
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+
+def _encode_upload(y) -> bytes:
+    """16 kHz mono FLAC — Gentle resamples to 8 kHz itself, so nothing is lost (~10x smaller than the stem)."""
+    buffer = io.BytesIO()
+    sf.write(buffer, np.asarray(y, dtype=np.float32), ANALYSIS_SR, format="FLAC", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def _post_to_gentle(audio_bytes: bytes, transcript: str, urls: list, first_instance: int = 0) -> dict:
+    """POST one clip, falling back to the other instances if one is unreachable."""
+    last_error = None
+    for i in range(len(urls)):
+        base = urls[(first_instance + i) % len(urls)]
         files = {
-            'audio': ('audio.wav', audio_data, 'audio/wav'),
+            'audio': ('audio.flac', audio_bytes, 'audio/flac'),
             'transcript': (None, transcript)
         }
-    else:
-        with open(audio_path, "rb") as audio_file:
-            audio_data = audio_file.read()
-            files = {
-                'audio': ('audio.wav', audio_data, 'audio/wav'),
-                'transcript': (None, transcript)
-            }
-    
-    print("Sending request to Gentle")
-    response = requests.post(gentle_url, files=files)
-    if response.status_code == 200:
-        print("Yes")
-        return response.json()
-    else:
-        print(f"{response.status_code} {response.text}")
-        return Exception(f"Gentle alignment failed: {response.status_code} {response.text}")
-        
+        try:
+            response = _session.post(f"{base}/transcriptions?async=false", files=files, timeout=GENTLE_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"⚠️  Gentle at {base} unreachable: {e}")
+            last_error = e
+            continue
+        if response.status_code == 200:
+            return response.json()
+        raise Exception(f"Gentle alignment failed: {response.status_code} {response.text}")
+    raise Exception(f"Gentle alignment failed: no instance reachable ({last_error})")
+
+
+def split_lyric_sections(transcript: str, n_sections: int) -> list:
+    """Group the lyric stanzas (blank-line separated) into about `n_sections` word-balanced chunks."""
+    stanzas = [s.strip() for s in re.split(r"\n\s*\n", transcript) if s.strip()]
+    total = sum(len(s.split()) for s in stanzas)
+    if n_sections <= 1 or len(stanzas) <= 1 or total == 0:
+        return [transcript]
+    target = total / n_sections
+    sections, current, count = [], [], 0
+    for stanza in stanzas:
+        current.append(stanza)
+        count += len(stanza.split())
+        if count >= target and len(sections) < n_sections - 1:
+            sections.append("\n\n".join(current))
+            current, count = [], 0
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def _section_windows(y, sections: list, pad: float) -> list:
+    """
+    Audio window (start, end) in seconds for each lyric section.
+
+    Boundaries split the *voiced* time in proportion to each section's word
+    count, so long instrumental intros/bridges don't skew the estimate. Each
+    window is padded so words near a boundary still fall inside it.
+    """
+    hop = ANALYSIS_SR // 10                                   # 100 ms frames
+    n_frames = max(1, len(y) // hop)
+    frames = np.asarray(y[:n_frames * hop], dtype=np.float32).reshape(n_frames, -1)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    voiced = rms > max(rms.max() * 0.05, 1e-4)
+    if not voiced.any():
+        voiced[:] = True
+    cum_voiced = np.cumsum(voiced)
+
+    counts = np.array([len(s.split()) for s in sections], dtype=np.float64)
+    fractions = np.concatenate([[0.0], np.cumsum(counts) / counts.sum()])
+    duration = len(y) / ANALYSIS_SR
+    bounds = [np.searchsorted(cum_voiced, f * cum_voiced[-1]) * hop / ANALYSIS_SR for f in fractions]
+    bounds[0], bounds[-1] = 0.0, duration
+    return [(max(0.0, bounds[i] - pad), min(duration, bounds[i + 1] + pad)) for i in range(len(sections))]
+
+
+def _stitch(section_results: list) -> dict:
+    """Merge per-section Gentle output (already offset) into one monotonic word list."""
+    words, last_end, dropped = [], 0.0, 0
+    for result in section_results:
+        for w in result.get('words', []):
+            if w.get('case') == 'success':
+                # Overlapping padding can let a section re-align audio the previous one owns
+                if w['start'] < last_end - 0.05:
+                    dropped += 1
+                    w = {**w, 'case': 'not-found-in-audio'}
+                else:
+                    last_end = w['end']
+            words.append(w)
+    if dropped:
+        print(f"⚠️  Dropped {dropped} out-of-order word(s) at section boundaries")
+    return {'words': words}
+
+
+def align_with_gentle(audio_path: str, transcript: str, gentle_urls=None):
+    """
+    Align `transcript` against `audio_path` and return Gentle-shaped JSON ({'words': [...]}).
+
+    Uploads the 16 kHz mono analysis copy instead of the full stem, over a pooled
+    session. Long songs are split into lyric sections aligned concurrently across
+    `GENTLE_URLS` and stitched back together with absolute timestamps.
+    """
+    urls = [u.rstrip("/") for u in (gentle_urls or GENTLE_URLS)]
+    y, _ = load_analysis_audio(audio_path, ANALYSIS_SR)
+    duration = len(y) / ANALYSIS_SR
+
+    n_sections = 1
+    if GENTLE_SECTION_SECONDS > 0 and duration > GENTLE_SECTION_SECONDS * 1.5:
+        n_sections = math.ceil(duration / GENTLE_SECTION_SECONDS)
+    sections = split_lyric_sections(transcript, n_sections)
+
+    if len(sections) == 1:
+        print(f"Sending request to Gentle ({duration:.0f}s audio)")
+        return _post_to_gentle(_encode_upload(y), transcript, urls)
+
+    windows = _section_windows(y, sections, GENTLE_SECTION_PAD)
+    print(f"Sending {len(sections)} sections to {len(urls)} Gentle instance(s)")
+
+    def align_section(i):
+        start, end = windows[i]
+        clip = y[int(start * ANALYSIS_SR):int(end * ANALYSIS_SR)]
+        result = _post_to_gentle(_encode_upload(clip), sections[i], urls, first_instance=i)
+        for w in result.get('words', []):
+            if w.get('case') == 'success':
+                w['start'] += start
+                w['end'] += start
+        return result
+
+    workers = min(len(sections), len(urls) * GENTLE_REQUESTS_PER_INSTANCE)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gentle") as pool:
+        results = list(pool.map(align_section, range(len(sections))))
+    return _stitch(results)
+
 def parse_gentle_output(gentle_json):
     aligned_words = []
     for word_info in gentle_json.get('words', []):
@@ -78,4 +206,5 @@ def gentle_aligner(audio_path, transcript, file_name):
     return j, s
 
 if __name__=="__main__":
+    # Point GENTLE_URLS at scripts/fake_gentle.py to try this without Gentle
     align_with_gentle("songs/My Heart Will Go On -Titanic (lyrics video)/vocals.wav","songs/My Heart Will Go On -Titanic (lyrics video)/My Heart Will Go On -Titanic (lyrics video).txt")
@@ -0,0 +1,163 @@
+"""
+align_whisper.py
+────────────────
+In-process alternative to the Gentle aligner (align_gentle.py): transcribes the
+separated vocals with faster-whisper word timestamps, then aligns the Genius
+lyrics to the transcript with a Needleman-Wunsch DP over word tokens.
+
+Lyric words matched to a transcribed word take its timing; short runs of
+unmatched lyric words between two matches are spread across the gap. Output is
+the same [{word, start, end}] alignment.json / .srt that Gentle produces.
+
+Select it for song prep with ALIGNER=whisper.
+"""
+
+import os
+import re
+import threading
+import numpy as np
+from difflib import SequenceMatcher
+from scripts.analysis_audio import ANALYSIS_SR, load_analysis_audio
+from scripts.align_gentle import save_json, save_srt
+
+WHISPER_ALIGN_MODEL = os.getenv("WHISPER_ALIGN_MODEL", "base")
+WHISPER_ALIGN_COMPUTE_TYPE = os.getenv("WHISPER_ALIGN_COMPUTE_TYPE", "int8")
+
+MATCH_THRESHOLD = 0.6      # token similarity needed to count as the same word
+GAP_PENALTY = -0.4         # skipping a lyric word or a transcribed word
+MAX_INTERPOLATE_GAP = 4.0  # seconds; longer unmatched stretches stay untimed
+
+_TOKEN_RE = re.compile(r"[\w']+")
+_SECTION_HEADER_RE = re.compile(r"\[[^\]]*\]")   # Genius "[Chorus]" etc.
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from faster_whisper import WhisperModel
+            _model = WhisperModel(WHISPER_ALIGN_MODEL, device="cpu", compute_type=WHISPER_ALIGN_COMPUTE_TYPE)
+        return _model
+
+
+def normalize_token(token: str) -> str:
+    return token.lower().replace("'", "")
+
+
+def lyric_tokens(transcript: str) -> list:
+    """Words of the lyrics as Gentle would see them, without Genius section headers."""
+    return _TOKEN_RE.findall(_SECTION_HEADER_RE.sub(" ", transcript))
+
+
+def transcribe_words(audio_path: str, transcript: str = "") -> list:
+    """Whisper word timings [{word, start, end}], one entry per token."""
+    y, _ = load_analysis_audio(audio_path, ANALYSIS_SR)
+    # A slice of the lyrics as prompt biases Whisper toward the right vocabulary
+    prompt = " ".join(lyric_tokens(transcript)[:60]) or None
+    segments, _ = _get_model().transcribe(
+        np.asarray(y, dtype=np.float32), word_timestamps=True, vad_filter=True,
+        initial_prompt=prompt, condition_on_previous_text=False,
+    )
+
+    words = []
+    for segment in segments:
+        for w in segment.words or []:
+            tokens = _TOKEN_RE.findall(w.word)
+            if not tokens:
+                continue
+            # "gonna-be" style multi-token words: split the span evenly
+            step = (w.end - w.start) / len(tokens)
+            for k, token in enumerate(tokens):
+                words.append({"word": token, "start": w.start + k * step, "end": w.start + (k + 1) * step})
+    return words
+
+
+def _similarity_matrix(lyrics: list, heard: list) -> np.ndarray:
+    """Pairwise token similarity in [0, 1]; computed once per distinct pair (lyrics repeat a lot)."""
+    lyric_vocab = sorted({normalize_token(t) for t in lyrics})
+    heard_vocab = sorted({normalize_token(t) for t in heard})
+    li = {t: i for i, t in enumerate(lyric_vocab)}
+    hi = {t: i for i, t in enumerate(heard_vocab)}
+    vocab_sim = np.array([[SequenceMatcher(None, a, b).ratio() for b in heard_vocab] for a in lyric_vocab])
+    return vocab_sim[np.ix_([li[normalize_token(t)] for t in lyrics], [hi[normalize_token(t)] for t in heard])]
+
+
+def dp_align(lyrics: list, heard: list) -> list:
+    """
+    Needleman-Wunsch over tokens with free end gaps. Returns (lyric_index, heard_index)
+    pairs for every aligned (diagonal) step with similarity >= MATCH_THRESHOLD.
+    """
+    n, m = len(lyrics), len(heard)
+    if n == 0 or m == 0:
+        return []
+    sim = _similarity_matrix(lyrics, heard)
+    score = np.where(sim >= MATCH_THRESHOLD, 2.0 * sim, -1.0)
+
+    # H[i, j]: best score aligning lyrics[:i] with heard[:j]; row/column 0 free (semi-global)
+    H = np.zeros((n + 1, m + 1))
+    cols = np.arange(m + 1) * GAP_PENALTY
+    for i in range(1, n + 1):
+        best = np.empty(m + 1)
+        best[0] = 0.0
+        best[1:] = np.maximum(H[i - 1, :-1] + score[i - 1], H[i - 1, 1:] + GAP_PENALTY)
+        # Horizontal gaps: H[i, j] = max_k best[k] + GAP*(j - k), as a running max
+        H[i] = np.maximum.accumulate(best - cols) + cols
+
+    # Free trailing gaps: start the traceback from the best cell on the last row/column
+    i_row, j_row = n, int(np.argmax(H[n]))
+    i_col, j_col = int(np.argmax(H[:, m])), m
+    i, j = (i_row, j_row) if H[i_row, j_row] >= H[i_col, j_col] else (i_col, j_col)
+
+    pairs = []
+    while i > 0 and j > 0:
+        if np.isclose(H[i, j], H[i - 1, j - 1] + score[i - 1, j - 1]):
+            if sim[i - 1, j - 1] >= MATCH_THRESHOLD:
+                pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif np.isclose(H[i, j], H[i - 1, j] + GAP_PENALTY):
+            i -= 1
+        elif np.isclose(H[i, j], H[i, j - 1] + GAP_PENALTY):
+            j -= 1
+        else:
+            break   # reached a free leading gap
+    pairs.reverse()
+    return pairs
+
+
+def align_lyrics_to_words(lyrics: list, heard: list) -> list:
+    """Timed lyric words [{word, start, end}] from a transcript; unmatched words are interpolated or dropped."""
+    pairs = dp_align(lyrics, [w["word"] for w in heard])
+    timing = {li: (heard[hi]["start"], heard[hi]["end"]) for li, hi in pairs}
+
+    anchors = [li for li, _ in pairs]
+    for a, b in zip(anchors, anchors[1:]):
+        gap_start, gap_end = timing[a][1], timing[b][0]
+        missing = b - a - 1
+        if missing and 0 <= gap_end - gap_start <= MAX_INTERPOLATE_GAP:
+            step = (gap_end - gap_start) / missing
+            for k in range(missing):
+                timing[a + 1 + k] = (gap_start + k * step, gap_start + (k + 1) * step)
+
+    return [
+        {"word": lyrics[i], "start": round(float(timing[i][0]), 3), "end": round(float(timing[i][1]), 3)}
+        for i in sorted(timing)
+    ]
+
+
+def align_with_whisper(audio_path: str, transcript: str) -> list:
+    lyrics = lyric_tokens(transcript)
+    heard = transcribe_words(audio_path, transcript)
+    aligned = align_lyrics_to_words(lyrics, heard)
+    print(f"Whisper aligner: {len(heard)} words heard, {len(aligned)}/{len(lyrics)} lyric words timed")
+    return aligned
+
+
+def whisper_aligner(audio_path, transcript, file_name):
+    """Drop-in for `gentle_aligner`: writes alignment.json / .srt and returns their paths."""
+    aligned_words = align_with_whisper(audio_path, transcript)
+    j = save_json(aligned_words, f"{file_name}/alignment.json")
+    s = save_srt(aligned_words, f"{file_name}/alignment.srt")
+    return j, s
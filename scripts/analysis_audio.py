@@ -0,0 +1,80 @@
+import io
+import os
+import time
+import numpy as np
+import librosa
+from s3_handler import storage
+
+# The analysis pipeline (pitch tracking, features, DTW) always works at 16 kHz mono.
+# Song prep writes the vocal stem once at this rate so requests never resample it.
+ANALYSIS_SR = 16000
+DERIVATIVE_NAME = "vocals_16k.npy"
+
+# Derivatives found missing (songs prepared before they existed) -> when we looked.
+# Re-checked after a while, since backfill_derivatives.py may write them meanwhile.
+DERIVATIVE_MISSING_TTL_SECONDS = float(os.getenv("DERIVATIVE_MISSING_TTL_SECONDS", "300"))
+_missing_derivatives = {}
+
+
+def _is_not_found(e: Exception) -> bool:
+    """True for a genuinely absent file (local or S3), False for transient failures."""
+    if isinstance(e, FileNotFoundError):
+        return True
+    response = getattr(e, "response", None)    # botocore ClientError
+    return isinstance(response, dict) and response.get("Error", {}).get("Code") in ("404", "NoSuchKey")
+
+
+def _known_missing(path: str) -> bool:
+    checked_at = _missing_derivatives.get(path)
+    if checked_at is None:
+        return False
+    if time.monotonic() - checked_at > DERIVATIVE_MISSING_TTL_SECONDS:
+        _missing_derivatives.pop(path, None)
+        return False
+    return True
+
+
+def analysis_derivative_path(audio_path: str):
+    """Path of the 16 kHz derivative for a `vocals.wav` stem, or None for other files."""
+    if os.path.basename(audio_path) != "vocals.wav":
+        return None
+    return os.path.join(os.path.dirname(audio_path), DERIVATIVE_NAME)
+
+
+def write_analysis_derivative(audio, sr: int, out_dir: str) -> str:
+    """
+    Downmix + resample a stem to 16 kHz mono float32 and save it as .npy.
+
+    `audio` is (samples,) or (samples, channels), as written by soundfile.
+    Uses the same downmix and soxr_hq resampler as `librosa.load(..., sr=16000)`.
+    """
+    y = np.asarray(audio, dtype=np.float32)
+    if y.ndim == 2:
+        y = librosa.to_mono(y.T)
+    y = librosa.resample(y, orig_sr=sr, target_sr=ANALYSIS_SR).astype(np.float32)
+
+    buffer = io.BytesIO()
+    np.save(buffer, y)
+    path = os.path.join(out_dir, DERIVATIVE_NAME)
+    storage.write_file(path, buffer.getvalue(), mode="wb")
+    _missing_derivatives.pop(path, None)
+    return path
+
+
+def load_analysis_audio(audio_path: str, sr: int = ANALYSIS_SR):
+    """
+    Load audio for analysis, returning (y, sr) like `librosa.load`.
+
+    For song vocal stems at 16 kHz the precomputed derivative is memory-mapped
+    (no decode, no resample); everything else falls back to `librosa.load`.
+    """
+    derivative = analysis_derivative_path(audio_path)
+    if sr == ANALYSIS_SR and derivative and not _known_missing(derivative):
+        try:
+            y = np.load(storage.get_local_path(derivative), mmap_mode="r")
+            return np.asarray(y), ANALYSIS_SR
+        except Exception as e:
+            print(f"⚠️  No 16 kHz derivative for {audio_path} — resampling instead ({e})")
+            if _is_not_found(e):
+                _missing_derivatives[derivative] = time.monotonic()
+    return librosa.load(storage.get_local_path(audio_path), sr=sr)
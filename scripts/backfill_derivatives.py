@@ -0,0 +1,97 @@
+"""
+backfill_derivatives.py
+───────────────────────
+Generates derived assets for songs that were prepared before song prep started
+producing them:
+
+  • vocals_16k.npy — 16 kHz mono analysis copy of the vocal stem
+  • renditions/    — Opus/AAC playback copies of both stems
+
+Works against local storage or S3 depending on PRODUCTION, and skips songs
+whose derivatives already exist (safe to re-run).
+
+Run from the repo root:
+    python scripts/backfill_derivatives.py [--force]
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# ── make repo root importable ──────────────────────────────────────────────────
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import soundfile as sf
+from mongo import MongoHandler
+from s3_handler import storage
+from scripts.analysis_audio import analysis_derivative_path, write_analysis_derivative
+from scripts.renditions import encode_renditions, rendition_name
+
+
+def backfill_analysis_audio(vocals_path: str, force: bool = False) -> bool:
+    derivative = analysis_derivative_path(vocals_path)
+    if derivative is None:
+        print(f"  ⚠️  Not a vocals.wav stem — skipping: {vocals_path}")
+        return False
+    if not force and storage.file_exists(derivative):
+        print(f"  ⏭️  already exists → {derivative}")
+        return False
+
+    audio, sr = sf.read(storage.get_local_path(vocals_path), dtype="float32", always_2d=True)
+    write_analysis_derivative(audio, sr, str(Path(vocals_path).parent))
+    print(f"  ✅ wrote → {derivative}")
+    return True
+
+
+def backfill_renditions(stem_path: str, force: bool = False) -> bool:
+    out_dir = str(Path(stem_path).parent)
+    stem = Path(stem_path).stem
+    probe = f"{out_dir}/{rendition_name(stem, 'opus', 'high')}"
+    if not force and storage.file_exists(probe):
+        print(f"  ⏭️  renditions already exist → {stem}")
+        return False
+    for path in encode_renditions(stem_path, out_dir):
+        print(f"  ✅ wrote → {path}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill derived song assets.")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if present")
+    args = parser.parse_args()
+
+    with MongoHandler() as mongo:
+        songs = mongo.get_all_songs()
+
+    print(f"Found {len(songs)} song(s) in MongoDB.\n")
+    created = 0
+    for song in songs:
+        title = song.get("title", "?")
+        vocals_path = song.get("vocals_path")
+        print(f"── {title}")
+        if not vocals_path:
+            print("  ⚠️  No vocals_path — skipping.")
+            continue
+        try:
+            created += backfill_analysis_audio(vocals_path, args.force)
+        except Exception as e:
+            print(f"  ❌ failed: {e}")
+
+        accomp_path = (
+            song.get("accompaniment_path") or song.get("accompany_path")
+            or str(Path(vocals_path).parent / "accompaniment.wav")
+        )
+        for stem_path in (vocals_path, accomp_path):
+            try:
+                created += backfill_renditions(stem_path, args.force)
+            except Exception as e:
+                print(f"  ❌ renditions failed for {stem_path}: {e}")
+
+    print(f"\n✅ Backfill complete — {created} asset group(s) written.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+bench_aligners.py
+─────────────────
+Compares the in-process Whisper + DP aligner (align_whisper.py) with the Gentle
+alignment already stored for prepared songs.
+
+Per song it reports:
+  • coverage   — share of lyric words that received a timestamp, per aligner
+  • start error — |Δstart| between the two aligners on words both timed
+                  (Gentle is the reference), median / p90 / share within 0.3 s
+  • wall time  — of the Whisper aligner (and of Gentle with --run-gentle)
+
+Run from the repo root:
+    python scripts/bench_aligners.py [--limit 5] [--title "..."] [--run-gentle]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from difflib import SequenceMatcher
+
+# ── make repo root importable ──────────────────────────────────────────────────
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+from mongo import MongoHandler
+from s3_handler import storage
+from scripts.align_gentle import align_with_gentle, parse_gentle_output
+from scripts.align_whisper import align_with_whisper, lyric_tokens, normalize_token
+
+
+def _paired_start_errors(reference: list, candidate: list) -> list:
+    """|Δstart| for words matched between two alignments (sequence-matched on normalized text)."""
+    ref_words = [normalize_token(w["word"]) for w in reference]
+    cand_words = [normalize_token(w["word"]) for w in candidate]
+    errors = []
+    matcher = SequenceMatcher(None, ref_words, cand_words, autojunk=False)
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            errors.append(abs(reference[block.a + k]["start"] - candidate[block.b + k]["start"]))
+    return errors
+
+
+def bench_song(song: dict, run_gentle: bool) -> dict:
+    lyrics = storage.read_file(song["lyrics"])
+    n_lyrics = len(lyric_tokens(lyrics))
+
+    if run_gentle:
+        t0 = time.perf_counter()
+        gentle = parse_gentle_output(align_with_gentle(song["vocals_path"], lyrics))
+        gentle_seconds = time.perf_counter() - t0
+    else:
+        gentle = json.loads(storage.read_file(song["timestamp_lyrics"]))
+        gentle_seconds = None
+
+    t0 = time.perf_counter()
+    whisper = align_with_whisper(song["vocals_path"], lyrics)
+    whisper_seconds = time.perf_counter() - t0
+
+    errors = np.array(_paired_start_errors(gentle, whisper)) if gentle and whisper else np.array([])
+    return {
+        "title": song["title"],
+        "lyric_words": n_lyrics,
+        "gentle_coverage": len(gentle) / n_lyrics if n_lyrics else 0.0,
+        "whisper_coverage": len(whisper) / n_lyrics if n_lyrics else 0.0,
+        "paired_words": int(errors.size),
+        "median_start_error": float(np.median(errors)) if errors.size else None,
+        "p90_start_error": float(np.percentile(errors, 90)) if errors.size else None,
+        "within_300ms": float(np.mean(errors <= 0.3)) if errors.size else None,
+        "whisper_seconds": whisper_seconds,
+        "gentle_seconds": gentle_seconds,
+    }
+
+
+def _fmt(value, spec):
+    return "—" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Whisper aligner against Gentle.")
+    parser.add_argument("--limit", type=int, default=5, help="Number of songs (default 5)")
+    parser.add_argument("--title", help="Benchmark a single song by title")
+    parser.add_argument("--run-gentle", action="store_true",
+                        help="Re-run Gentle for timing instead of using the stored alignment.json")
+    parser.add_argument("--json", help="Also write the per-song results to this file")
+    args = parser.parse_args()
+
+    with MongoHandler() as mongo:
+        if args.title:
+            songs = [s for s in [mongo.get_song_by_title(args.title)] if s]
+        else:
+            songs = [s for s in mongo.get_all_songs() if s.get("timestamp_lyrics")][:args.limit]
+
+    results = []
+    for song in songs:
+        print(f"── {song['title']}")
+        try:
+            results.append(bench_song(song, args.run_gentle))
+        except Exception as e:
+            print(f"  ❌ failed: {e}")
+
+    print(f"\n{'song':<40}{'words':>6}{'cov G':>7}{'cov W':>7}{'med Δs':>8}{'p90 Δs':>8}"
+          f"{'≤0.3s':>7}{'W s':>7}{'G s':>7}")
+    for r in results:
+        print(f"{r['title'][:39]:<40}{r['lyric_words']:>6}{r['gentle_coverage']:>7.0%}{r['whisper_coverage']:>7.0%}"
+              f"{_fmt(r['median_start_error'], '.2f'):>8}{_fmt(r['p90_start_error'], '.2f'):>8}"
+              f"{_fmt(r['within_300ms'], '.0%'):>7}{r['whisper_seconds']:>7.1f}{_fmt(r['gentle_seconds'], '.1f'):>7}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
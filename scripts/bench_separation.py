@@ -0,0 +1,93 @@
+"""
+bench_separation.py
+───────────────────
+Measures how streaming Demucs separation (extract_from_audio.py) scales with
+worker processes, and checks every worker count writes the same stems as the
+single-process run.
+
+For each worker count it reports wall time, speedup and parallel efficiency
+against 1 worker, peak RSS, and the largest sample difference from the
+1-worker stems (in 16-bit LSBs; 0 = identical).
+
+Run from the repo root:
+    python scripts/bench_separation.py path/to/song.mp3 [--workers 1,2,4] [--chunk-seconds 30]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+# ── make repo root importable ──────────────────────────────────────────────────
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+import soundfile as sf
+import scripts.extract_from_audio as separation
+
+
+def _warm_up(workers: int):
+    """Load the model everywhere first so timings measure separation, not startup."""
+    silence = np.zeros((separation.SR, separation.CHANNELS), dtype=np.float32)
+    if workers <= 1:
+        separation.separate_chunk(separation._get_model(), silence)
+    else:
+        pool = separation._get_pool(workers)
+        for future in [pool.submit(separation._separate_in_worker, silence) for _ in range(workers * 2)]:
+            future.result()
+
+
+def _max_lsb_diff(path_a: str, path_b: str) -> int:
+    worst = 0
+    blocks_b = sf.blocks(path_b, blocksize=separation.SR * 30, dtype="int16", always_2d=True)
+    for block_a in sf.blocks(path_a, blocksize=separation.SR * 30, dtype="int16", always_2d=True):
+        block_b = next(blocks_b)
+        worst = max(worst, int(np.abs(block_a.astype(np.int32) - block_b.astype(np.int32)).max()))
+    return worst
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    parser = argparse.ArgumentParser(description="Benchmark chunk-parallel Demucs separation.")
+    parser.add_argument("audio", help="Local audio file to separate")
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)),
+                        help=f"Comma-separated worker counts (default {default_workers})")
+    parser.add_argument("--chunk-seconds", type=float, default=30,
+                        help="Chunk length; shorter chunks parallelise better (default 30)")
+    args = parser.parse_args()
+
+    separation.SEPARATION_CHUNK_SECONDS = args.chunk_seconds
+    worker_counts = sorted({int(w) for w in args.workers.split(",")} | {1})
+    duration = sf.info(args.audio).duration if args.audio.lower().endswith((".wav", ".flac")) else None
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in worker_counts:
+            vocals = os.path.join(tmp, f"vocals_{workers}.wav")
+            accompaniment = os.path.join(tmp, f"accompaniment_{workers}.wav")
+            _warm_up(workers)
+            started = time.perf_counter()
+            peak = separation.separate_to_files(args.audio, vocals, accompaniment, workers=workers)
+            seconds = time.perf_counter() - started
+            results.append((workers, seconds, peak, vocals, accompaniment))
+
+        base_seconds, base_vocals, base_accompaniment = results[0][1], results[0][3], results[0][4]
+        print(f"\n── Separation scaling on {cpus} core(s), {args.chunk_seconds:.0f}s chunks "
+              + (f"({duration:.0f}s audio) " if duration else "") + "─" * 20)
+        print(f"{'workers':>8}{'threads':>9}{'wall s':>9}{'speedup':>9}{'effic.':>8}{'peak MB':>9}{'Δ LSB':>7}")
+        for workers, seconds, peak, vocals, accompaniment in results:
+            diff = max(_max_lsb_diff(base_vocals, vocals), _max_lsb_diff(base_accompaniment, accompaniment))
+            speedup = base_seconds / seconds
+            print(f"{workers:>8}{max(1, cpus // workers):>9}{seconds:>9.1f}{speedup:>9.2f}"
+                  f"{speedup / workers:>8.0%}{peak:>9.0f}{diff:>7}")
+        print("Peak MB is this process during that run only; each worker holds its own model on top.")
+
+
+if __name__ == "__main__":
+    main()
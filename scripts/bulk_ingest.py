@@ -0,0 +1,251 @@
+"""
+bulk_ingest.py
+──────────────
+Prepares a whole catalog of songs, pipelining the prep stages from coaching.py
+across songs instead of running `coaching()` one title at a time:
+
+  • fetch / align / save  (YouTube, Genius, Gentle, S3, Mongo — I/O bound)
+        → thread pool, --io-workers at once
+  • separate              (Demucs — CPU bound; also align with ALIGNER=whisper)
+        → process pool, --cpu-workers processes sharing the cores
+
+Every song is a job in the shared job store (jobs.py), checkpointed after each
+stage, so an interrupted run picks up where it stopped when re-run with the
+same list (Ctrl-C puts the songs in flight back in the queue). A failed stage
+is retried up to JOB_MAX_ATTEMPTS times, like jobs in the API. Songs already
+in MongoDB are skipped. A per-stage throughput report is printed at the end.
+
+Run from the repo root:
+    python scripts/bulk_ingest.py songs.txt [--io-workers 8] [--cpu-workers 2]
+
+`songs.txt` holds one song name per line (blank lines and # comments ignored).
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# ── make repo root importable ──────────────────────────────────────────────────
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from mongo import MongoHandler
+from coaching import PREP_STAGES, ALIGNER
+from jobs import job_store, HEARTBEAT_SECONDS, QUEUED, SUCCEEDED
+
+# The in-process Whisper aligner is CPU work too; Gentle alignment is just an HTTP call
+CPU_STAGES = {"separate", "align"} if ALIGNER == "whisper" else {"separate"}
+
+
+def _init_cpu_worker(threads: int):
+    """Give each Demucs process its share of the cores instead of all of them."""
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _timed(fn, state):
+    """Run one stage; returns (updates, started_at, finished_at). Runs in pool workers."""
+    started = time.time()
+    updates = fn(state)
+    return updates, started, time.time()
+
+
+def read_song_list(path: str) -> list:
+    names, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            name = line.strip()
+            key = MongoHandler.normalize_text(name)
+            if name and not name.startswith("#") and key not in seen:
+                seen.add(key)
+                names.append(name)
+    return names
+
+
+class BulkIngest:
+    def __init__(self, io_workers: int, cpu_workers: int):
+        threads = max(1, (os.cpu_count() or 1) // cpu_workers)
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="ingest-io")
+        # spawn, not fork: torch does not survive forking a process that already has threads
+        self.cpu_pool = ProcessPoolExecutor(
+            max_workers=cpu_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_cpu_worker,
+            initargs=(threads,),
+        )
+        self.stages = dict(PREP_STAGES)
+        self.timings = defaultdict(list)        # stage -> [(started, finished)]
+        self.failures = {}                      # song -> error
+        self.succeeded = []
+        self.in_flight = {}                     # job_id -> song name
+        self.stopping = False                   # set on interrupt; no new stages start
+        self.lock = threading.Lock()
+        self.all_done = threading.Condition(self.lock)
+        # Bound admissions so later stages of early songs aren't starved behind
+        # hundreds of queued fetches (and downloads don't pile up on disk)
+        self.admission = threading.BoundedSemaphore(io_workers + 2 * cpu_workers)
+
+    # ── scheduling ─────────────────────────────────────────────────────────────
+    def _next_stage(self, completed):
+        return next((name for name, _ in PREP_STAGES if name not in completed), None)
+
+    def _advance(self, job_id, song, completed, state):
+        name = self._next_stage(completed)
+        if name is None:
+            job_store.update(job_id, status=SUCCEEDED, stage=None, error=None)
+            print(f"✅ {song}")
+            self._finish(job_id, song)
+            return
+        if self.stopping:
+            return
+        job_store.update(job_id, stage=name)
+        pool = self.cpu_pool if name in CPU_STAGES else self.io_pool
+        future = pool.submit(_timed, self.stages[name], state)
+        future.add_done_callback(lambda f: self._stage_finished(job_id, song, name, completed, state, f))
+
+    def _stage_finished(self, job_id, song, name, completed, state, future):
+        if self.stopping:
+            return                              # job already put back in the queue
+        self.io_pool.submit(self._on_stage_done, job_id, song, name, completed, state, future)
+
+    def _on_stage_done(self, job_id, song, name, completed, state, future):
+        try:
+            updates, started, finished = future.result()
+            state.update(updates)
+            completed = completed + [name]
+            job_store.update(job_id, completed_stages=completed, state=state)
+            with self.lock:
+                self.timings[name].append((started, finished))
+            print(f"   {name:<9} {finished - started:6.1f}s  {song}")
+            self._advance(job_id, song, completed, state)
+        except Exception as e:
+            if self.stopping:
+                return
+            print(f"❌ {song} failed at stage '{name}': {e}")
+            if job_store.fail(job_id, str(e)) and job_store.claim(job_id):
+                # Same retry policy as jobs._run_job: resume from the last completed stage
+                print(f"🔁 Retrying {song} from stage '{name}'")
+                self._advance(job_id, song, completed, state)
+                return
+            with self.lock:
+                self.failures[song] = f"{name}: {e}"
+            self._finish(job_id, song)
+
+    def _finish(self, job_id, song):
+        with self.lock:
+            self.in_flight.pop(job_id, None)
+            if song not in self.failures:
+                self.succeeded.append(song)
+            self.all_done.notify_all()
+        self.admission.release()
+
+    def _heartbeat(self, stop: threading.Event):
+        # Keeps queued-behind-Demucs jobs from looking abandoned to jobs.requeue_stale()
+        while not stop.wait(HEARTBEAT_SECONDS):
+            with self.lock:
+                job_ids = list(self.in_flight)
+            for job_id in job_ids:
+                job_store.update(job_id)
+
+    # ── entry point ────────────────────────────────────────────────────────────
+    def run(self, song_names: list):
+        with MongoHandler() as mongo:
+            todo = [s for s in song_names if not mongo.song_exists(s)]
+        print(f"{len(song_names)} song(s) listed, {len(song_names) - len(todo)} already in MongoDB.")
+
+        stale = job_store.requeue_stale()
+        if stale:
+            print(f"♻️  Requeued {len(stale)} stale job(s)")
+
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(stop,), daemon=True).start()
+        started = time.time()
+
+        try:
+            for song in todo:
+                self.admission.acquire()
+                job = job_store.submit(song)
+                if job["status"] == SUCCEEDED:
+                    print(f"⏭️  {song} was just prepared")
+                    self.admission.release()
+                    continue
+                if job["status"] != QUEUED or not job_store.claim(job["id"]):
+                    print(f"⏭️  {song} is already being prepared by another worker")
+                    self.admission.release()
+                    continue
+                if job["completed_stages"]:
+                    print(f"↪️  Resuming {song} after '{job['completed_stages'][-1]}'")
+                with self.lock:
+                    self.in_flight[job["id"]] = song
+                self._advance(job["id"], song, list(job["completed_stages"]), job["state"])
+
+            with self.lock:
+                while self.in_flight:
+                    self.all_done.wait()
+        except BaseException:
+            # Ctrl-C (or a crash): hand the songs in flight back to the queue so a
+            # re-run resumes them now instead of after JOB_STALE_SECONDS
+            self._interrupt()
+            raise
+        finally:
+            stop.set()
+
+        self.io_pool.shutdown()
+        self.cpu_pool.shutdown()
+        self.report(time.time() - started)
+
+    def _interrupt(self):
+        with self.lock:
+            self.stopping = True
+            job_ids = list(self.in_flight)
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+        self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+        job_store.release(job_ids)
+        print(f"\n⏸️  Interrupted — {len(job_ids)} song(s) in flight requeued; re-run to resume them")
+
+    def report(self, wall: float):
+        print(f"\n── Bulk ingest report ({wall:.1f}s wall) " + "─" * 30)
+        print(f"{'stage':<10}{'songs':>6}{'mean s':>9}{'max s':>9}{'busy s':>10}{'songs/min':>11}")
+        for name, _ in PREP_STAGES:
+            spans = self.timings.get(name, [])
+            if not spans:
+                print(f"{name:<10}{0:>6}")
+                continue
+            durations = [end - start for start, end in spans]
+            # Throughput over the window the stage was actually active
+            window = max(end for _, end in spans) - min(start for start, _ in spans)
+            per_min = len(spans) / window * 60 if window > 0 else float("inf")
+            print(f"{name:<10}{len(spans):>6}{sum(durations) / len(spans):>9.1f}"
+                  f"{max(durations):>9.1f}{sum(durations):>10.1f}{per_min:>11.2f}")
+        print(f"\n✅ {len(self.succeeded)} prepared, ❌ {len(self.failures)} failed"
+              + (f", {len(self.succeeded) / wall * 3600:.1f} songs/hour overall" if wall > 0 else ""))
+        for song, error in self.failures.items():
+            print(f"   ❌ {song} — {error}")
+        if self.failures:
+            print("Re-run the same command to resume failed songs from their last completed stage.")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Prepare a catalog of songs in parallel.")
+    parser.add_argument("song_list", help="Text file with one song name per line")
+    parser.add_argument("--io-workers", type=int, default=8,
+                        help="Concurrent fetch/align/save stages (default 8)")
+    parser.add_argument("--cpu-workers", type=int, default=max(1, cpus // 4),
+                        help="Concurrent Demucs processes (default: one per 4 cores)")
+    args = parser.parse_args()
+
+    songs = read_song_list(args.song_list)
+    BulkIngest(args.io_workers, args.cpu_workers).run(songs)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,43 +3,301 @@ from demucs.apply import apply_model
 from demucs.audio import AudioFile
 import os
 import re
-import soundfile as sf
+import subprocess
 import tempfile
+import threading
+import multiprocessing
+import psutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+import torch
 from s3_handler import storage  # Import the storage handler
+from scripts.analysis_audio import write_analysis_derivative
+from scripts.renditions import encode_renditions
 
-def separate_vocals(audio_path, song_name, out_dir):
-    model = pretrained.get_model('htdemucs')
-    model.cpu()
-    model.eval()
+# ── Separation config ──────────────────────────────────────────────────────────
+# "stream" decodes and separates overlapping chunks, writing stems as it goes, so
+# memory stays flat regardless of song length. "full" is the original in-memory path.
+SEPARATION_MODE = os.getenv("SEPARATION_MODE", "stream").lower()
+# Peak memory the streaming path should stay under; sets the chunk length.
+SEPARATION_MEMORY_MB = int(os.getenv("SEPARATION_MEMORY_MB", "1536"))
+SEPARATION_OVERLAP_SECONDS = float(os.getenv("SEPARATION_OVERLAP_SECONDS", "2"))
+# Fixed chunk length instead of deriving it from the budget (0 = derive). Shorter
+# chunks give SEPARATION_WORKERS more to share out.
+SEPARATION_CHUNK_SECONDS = float(os.getenv("SEPARATION_CHUNK_SECONDS", "0"))
+# Processes separating chunks in parallel (1 = in this process). The memory
+# ceiling applies per worker, since each holds its own model.
+SEPARATION_WORKERS = int(os.getenv("SEPARATION_WORKERS", "1"))
+
+SR = 44100
+CHANNELS = 2
+# Rough resident cost of torch + htdemucs, and per second of chunk held
+# (input, four sources, apply_model's accumulators).
+_MODEL_OVERHEAD_MB = 700
+_MB_PER_CHUNK_SECOND = 6
+
+_model = None
+_model_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+
+
+def _get_model():
+    """htdemucs, loaded once per process."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = pretrained.get_model('htdemucs')
+            _model.cpu()
+            _model.eval()
+        return _model
+
+
+def chunk_seconds_for_budget(memory_mb: int = SEPARATION_MEMORY_MB) -> float:
+    if SEPARATION_CHUNK_SECONDS > 0:
+        return SEPARATION_CHUNK_SECONDS
+    return float(np.clip((memory_mb - _MODEL_OVERHEAD_MB) / _MB_PER_CHUNK_SECOND, 15, 300))
+
+
+class RssSampler:
+    """
+    Peak RSS (MB) of this process while the block runs, sampled on a thread.
+
+    ru_maxrss is a lifetime high-water mark, so in the long-lived API or
+    bulk_ingest process it would report the largest earlier separation.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+        self.peak_bytes = 0
+
+    def _sample(self):
+        self.peak_bytes = max(self.peak_bytes, self._process.memory_info().rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @property
+    def peak_mb(self) -> float:
+        self._sample()
+        return self.peak_bytes / (1024 * 1024)
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def separate_chunk(model, chunk: np.ndarray):
+    """Separate one (frames, 2) chunk into (vocals, accompaniment), both (frames, 2) float32."""
+    wav = torch.from_numpy(np.ascontiguousarray(chunk.T)).unsqueeze(0)
+    with torch.no_grad():
+        # shifts=0: no random time shift, so a chunk always separates the same way
+        sources = apply_model(model, wav, device='cpu', shifts=0, split=True, overlap=0.25)[0]
+    vocals_idx = model.sources.index("vocals")
+    vocals = sources[vocals_idx]
+    accompaniment = sources[[i for i in range(len(model.sources)) if i != vocals_idx]].sum(dim=0)
+    return vocals.numpy().T.astype(np.float32), accompaniment.numpy().T.astype(np.float32)
+
+
+def _init_separation_worker(threads: int):
+    torch.set_num_threads(threads)
+    _get_model()
+
+
+def _separate_in_worker(chunk: np.ndarray):
+    return separate_chunk(_get_model(), chunk)
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool of `workers` model-holding processes, kept for reuse across songs."""
+    global _pool, _pool_workers
+    with _model_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # spawn, not fork: torch does not survive forking a process that already has threads
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_separation_worker,
+                initargs=(threads,),
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _separate_windows(windows, workers: int):
+    """
+    (vocals, accompaniment) per window, in window order. With workers > 1 the
+    windows fan out over the process pool, at most `workers + 1` in flight, and
+    go through the same `separate_chunk` as the in-process path.
+    """
+    if workers <= 1:
+        model = _get_model()
+        for window in windows:
+            yield separate_chunk(model, window)
+        return
+
+    pool = _get_pool(workers)
+    pending = deque()
+    for window in windows:
+        pending.append(pool.submit(_separate_in_worker, window))
+        if len(pending) > workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def decode_stream(path: str, block_frames: int):
+    """Decode any ffmpeg-readable file to 44.1 kHz stereo float32 blocks of (block_frames, 2)."""
+    proc = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", path, "-f", "f32le", "-ac", str(CHANNELS), "-ar", str(SR), "-"],
+        stdout=subprocess.PIPE,
+    )
+    frame_bytes = CHANNELS * 4
+    try:
+        while True:
+            data = proc.stdout.read(block_frames * frame_bytes)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % frame_bytes]
+            yield np.frombuffer(data, dtype=np.float32).reshape(-1, CHANNELS)
+    except GeneratorExit:
+        proc.kill()
+        raise
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise Exception(f"ffmpeg could not decode {path}")
+
+
+def stream_windows(path: str, chunk_frames: int, overlap_frames: int):
+    """Yield consecutive windows of `chunk_frames` that overlap by `overlap_frames`; the last may be shorter."""
+    hop = chunk_frames - overlap_frames
+    buf = np.zeros((0, CHANNELS), dtype=np.float32)
+    emitted = False
+    for block in decode_stream(path, hop):
+        buf = np.concatenate([buf, block])
+        while len(buf) >= chunk_frames:
+            yield buf[:chunk_frames]
+            emitted = True
+            buf = buf[hop:]
+    # What's left beyond the overlap already covered by the previous window
+    if len(buf) > overlap_frames or (not emitted and len(buf)):
+        yield buf
+
+
+class OverlapWriter:
+    """
+    Writes separated windows to stem files, crossfading each window's head into
+    the previous window's tail. Only `overlap` frames per stem are held back.
+    """
+
+    def __init__(self, files: list, overlap_frames: int):
+        self.files = files
+        self.overlap = overlap_frames
+        self.tails = None
+
+    def push(self, stems: list):
+        if self.tails is not None:
+            n = len(self.tails[0])
+            fade = ((np.arange(n, dtype=np.float32) + 0.5) / n)[:, None]
+            stems = [
+                np.concatenate([tail * (1 - fade) + stem[:n] * fade, stem[n:]])
+                for tail, stem in zip(self.tails, stems)
+            ]
+        hold = min(self.overlap, len(stems[0]))
+        for f, stem in zip(self.files, stems):
+            f.write(stem[:len(stem) - hold])
+        self.tails = [stem[len(stem) - hold:] for stem in stems]
+
+    def close(self):
+        if self.tails is not None:
+            for f, tail in zip(self.files, self.tails):
+                f.write(tail)
+        self.tails = None
+
+
+def _temp_wav(out_dir: str) -> str:
+    # Locally, stage next to the destination so the final move is a rename
+    directory = None if storage.is_production else out_dir
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".wav.part", dir=directory)
+    os.close(fd)
+    return path
+
+
+def _write_vocals_derivative(vocals_wav: str, out_dir: str):
+    """16 kHz analysis copy from the written stem, read back block-wise as mono."""
+    mono = np.concatenate([
+        block.mean(axis=1) for block in sf.blocks(vocals_wav, blocksize=SR * 30, dtype="float32", always_2d=True)
+    ])
+    write_analysis_derivative(mono, SR, out_dir)
+
+
+def separate_to_files(audio_file: str, vocals_wav: str, accompaniment_wav: str,
+                      memory_mb: int = SEPARATION_MEMORY_MB, workers: int = SEPARATION_WORKERS) -> float:
+    """
+    Streaming separation of a local file into two local WAVs. The chunk plan
+    does not depend on `workers`, so any worker count writes the same output.
+    Returns this process's peak RSS (MB) during the separation.
+    """
+    chunk_frames = int(chunk_seconds_for_budget(memory_mb) * SR)
+    overlap_frames = int(SEPARATION_OVERLAP_SECONDS * SR)
+
+    print(f"Streaming separation in {chunk_frames / SR:.0f}s chunks "
+          f"({SEPARATION_OVERLAP_SECONDS:.0f}s overlap, {memory_mb} MB budget, {workers} worker(s))")
+    with RssSampler() as rss, \
+            sf.SoundFile(vocals_wav, "w", SR, CHANNELS, format="WAV", subtype="PCM_16") as vf, \
+            sf.SoundFile(accompaniment_wav, "w", SR, CHANNELS, format="WAV", subtype="PCM_16") as af:
+        writer = OverlapWriter([vf, af], overlap_frames)
+        for n, (vocals, accompaniment) in enumerate(
+                _separate_windows(stream_windows(audio_file, chunk_frames, overlap_frames), workers), start=1):
+            writer.push([vocals, accompaniment])
+            print(f"  chunk {n} done (peak RSS {rss.peak_mb:.0f} MB)")
+        writer.close()
+    return rss.peak_mb
+
+
+def _separate_streaming(audio_path, out_dir):
+    vocals_path = os.path.join(out_dir, "vocals.wav")
+    accompaniment_path = os.path.join(out_dir, "accompaniment.wav")
+    vocals_tmp, accompaniment_tmp = _temp_wav(out_dir), _temp_wav(out_dir)
+    try:
+        separate_to_files(storage.get_local_path(audio_path), vocals_tmp, accompaniment_tmp)
+        # Resample once here so analysis requests never have to
+        _write_vocals_derivative(vocals_tmp, out_dir)
+        storage.store_local_file(vocals_tmp, vocals_path, content_type="audio/wav")
+        storage.store_local_file(accompaniment_tmp, accompaniment_path, content_type="audio/wav")
+    finally:
+        for path in (vocals_tmp, accompaniment_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+    return vocals_path, accompaniment_path
+
+
+def _separate_full(audio_path, out_dir):
+    model = _get_model()
+
+    # In production audio_path is an S3 key; the storage cache gives us a local copy
+    wav = AudioFile(storage.get_local_path(audio_path)).read(samplerate=SR)
 
-    # Handle S3 vs local file reading
-    print(f"reading file: {audio_path}")
-    
-    if storage.is_production:
-        # In production, always treat as S3 file
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-            temp_path = temp_file.name
-            
-        try:
-            # Use the audio_path as the S3 key directly
-            print(f"Downloading from S3: {audio_path}")
-            audio_data = storage.read_file(audio_path, mode='rb')
-            with open(temp_path, 'wb') as f:
-                f.write(audio_data)
-            
-            # Now read with AudioFile
-            wav = AudioFile(temp_path).read(samplerate=44100)
-            
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-    else:
-        # Local file - read directly
-        wav = AudioFile(audio_path).read(samplerate=44100)
-    
-    sr = 44100
-    
     # Add batch dimension if missing
     if wav.dim() == 2:  # shape (channels, samples)
         wav = wav.unsqueeze(0)  # shape (1, channels, samples)
@@ -51,25 +309,49 @@ def separate_vocals(audio_path, song_name, out_dir):
     sources_list = model.sources  # ['drums', 'bass', 'other', 'vocals']
 
     print("Saving all sources...")
-    
+
     # Save vocals using storage handler
     vocals_path = os.path.join(out_dir, "vocals.wav")
     for i, source in enumerate(sources_list):
         if source == "vocals":
-            storage.write_audio_file(vocals_path, sources[i].cpu().numpy().T, sr)
+            vocals = sources[i].cpu().numpy().T
+            storage.write_audio_file(vocals_path, vocals, SR)
+            # Resample once here so analysis requests never have to
+            write_analysis_derivative(vocals, SR, out_dir)
             break
 
     # Combine other sources for accompaniment
     other_sources = [sources[i] for i, s in enumerate(sources_list) if s != "vocals"]
     accompaniment = sum(other_sources)
     accompaniment_path = os.path.join(out_dir, "accompaniment.wav")
-    
+
     # Save accompaniment using storage handler
-    storage.write_audio_file(accompaniment_path, accompaniment.cpu().numpy().T, sr)
+    storage.write_audio_file(accompaniment_path, accompaniment.cpu().numpy().T, SR)
+    return vocals_path, accompaniment_path
+
+
+def separate_vocals(audio_path, song_name, out_dir):
+    print(f"reading file: {audio_path}")
+    with RssSampler() as rss:
+        if SEPARATION_MODE == "full":
+            vocals_path, accompaniment_path = _separate_full(audio_path, out_dir)
+        else:
+            vocals_path, accompaniment_path = _separate_streaming(audio_path, out_dir)
+    peak = rss.peak_mb
+    print(f"Separation peak RSS: {peak:.0f} MB")
+    if SEPARATION_MODE != "full" and peak > SEPARATION_MEMORY_MB:
+        print(f"⚠️  Peak RSS exceeded SEPARATION_MEMORY_MB={SEPARATION_MEMORY_MB} — lower it to shrink chunks")
+
+    # Compressed playback copies for the /audio mount
+    for stem_path in (vocals_path, accompaniment_path):
+        try:
+            encode_renditions(stem_path, out_dir)
+        except Exception as e:
+            print(f"⚠️  Could not encode playback renditions for {stem_path}: {e}")
 
     return vocals_path, accompaniment_path
 
 if __name__ == "__main__":
     vocals, accompaniment = separate_vocals("songs/Lady Gaga, Bruno Mars - Die With A Smile (Lyrics)/zgaCZOQCpp8.mp3","Lady Gaga, Bruno Mars - Die With A Smile (Lyrics)","songs/Lady Gaga, Bruno Mars - Die With A Smile (Lyrics)")
     print("Vocals saved at:", vocals)
-    print("Accompaniment saved at:", accompaniment)
\ No newline at end of file
+    print("Accompaniment saved at:", accompaniment)
@@ -0,0 +1,98 @@
+"""
+fake_gentle.py
+──────────────
+Minimal stand-in for the Gentle forced aligner, for exercising the alignment
+client (scripts/align_gentle.py) without Docker.
+
+Accepts the same multipart POST /transcriptions?async=false (audio + transcript)
+and answers with Gentle-shaped JSON, spreading the transcript words evenly over
+the clip. `--realtime-factor` sleeps for that fraction of the clip length to
+mimic alignment cost, so section parallelism across instances is measurable.
+
+Run from the repo root (one process per fake instance):
+    python scripts/fake_gentle.py --port 8765 --realtime-factor 0.2
+    GENTLE_URLS=http://localhost:8765,http://localhost:8766 python ...
+"""
+
+import io
+import re
+import json
+import time
+import argparse
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import soundfile as sf
+
+
+def parse_multipart(content_type: str, body: bytes) -> dict:
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = part.get_payload(decode=True)
+    return fields
+
+
+def fake_alignment(transcript: str, duration: float) -> dict:
+    tokens = [(m.group(0), m.start(), m.end()) for m in re.finditer(r"[\w']+", transcript)]
+    step = duration / max(len(tokens), 1)
+    words = []
+    for i, (word, start_offset, end_offset) in enumerate(tokens):
+        words.append({
+            "alignedWord": word.lower(),
+            "case": "success",
+            "word": word,
+            "start": round(i * step, 3),
+            "end": round(i * step + step * 0.8, 3),
+            "startOffset": start_offset,
+            "endOffset": end_offset,
+        })
+    return {"transcript": transcript, "words": words}
+
+
+class FakeGentleHandler(BaseHTTPRequestHandler):
+    realtime_factor = 0.0
+
+    def do_POST(self):
+        if not self.path.startswith("/transcriptions"):
+            self.send_error(404)
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        fields = parse_multipart(self.headers["Content-Type"], body)
+        if "audio" not in fields:
+            self.send_error(400, "missing audio")
+            return
+
+        info = sf.info(io.BytesIO(fields["audio"]))
+        transcript = (fields.get("transcript") or b"").decode("utf-8")
+        print(f"📥 {len(fields['audio']) / 1024:.0f} KiB, {info.duration:.1f}s "
+              f"{info.samplerate} Hz x{info.channels}, {len(transcript.split())} words")
+        time.sleep(info.duration * self.realtime_factor)
+
+        payload = json.dumps(fake_alignment(transcript, info.duration)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gentle aligner for local testing.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--realtime-factor", type=float, default=0.0,
+                        help="Seconds of simulated work per second of audio")
+    args = parser.parse_args()
+
+    FakeGentleHandler.realtime_factor = args.realtime_factor
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), FakeGentleHandler)
+    print(f"Fake Gentle listening on :{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,30 @@ import re
 from bs4 import BeautifulSoup
 import os
 from dotenv import load_dotenv
+from kv_cache import KVCache
+from mongo import MongoHandler
 load_dotenv()
+
+# ── Lyrics cache ───────────────────────────────────────────────────────────────
+# (title, artist) -> Genius song id, and song id -> result, so a re-prep or the
+# same track under another YouTube title never re-searches or re-scrapes.
+# Misses are remembered too, but only for a while.
+LYRICS_NEGATIVE_TTL_SECONDS = int(os.getenv("LYRICS_NEGATIVE_TTL_SECONDS", "86400"))
+_query_cache = KVCache("genius_query")
+_song_cache = KVCache("genius_song")
+# scrape_lyrics() errors worth retrying (network) vs. ones that won't change soon
+_TRANSIENT_LYRICS_ERRORS = ("Failed to fetch lyrics", "Error parsing lyrics")
+_MISSING_LYRICS = ("Lyrics not found", "Could not extract lyrics")
+
+# One keep-alive pool for the API and the lyrics pages, shared by every lookup
+GENIUS_TIMEOUT = float(os.getenv("GENIUS_TIMEOUT", "15"))
+_session = requests.Session()
+
+
+def _query_key(song_title, artist):
+    return f"{MongoHandler.normalize_text(song_title)}|{MongoHandler.normalize_text(artist)}"
+
+
 class GeniusLyrics:
     def __init__(self, access_token):
         """
@@ -20,7 +43,8 @@ class GeniusLyrics:
     def search_song(self, query, limit=10):
         """
         Search for songs using Genius API
-        Returns list of song results
+        Returns list of song results ([] when nothing matched), or None when the
+        request or the API failed, so a transient error is never cached as a miss
         """
         url = f"{self.base_url}/search"
         params = {
@@ -29,7 +53,7 @@ class GeniusLyrics:
         }
         
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = _session.get(url, headers=self.headers, params=params, timeout=GENIUS_TIMEOUT)
             response.raise_for_status()
             data = response.json()
             
@@ -37,11 +61,11 @@ class GeniusLyrics:
                 return data['response']['hits']
             else:
                 print(f"API Error: {data['meta']['message']}")
-                return []
+                return None
                 
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {e}")
-            return []
+            return None
     
     def get_song_details(self, song_id):
         """
@@ -50,7 +74,7 @@ class GeniusLyrics:
         url = f"{self.base_url}/songs/{song_id}"
         
         try:
-            response = requests.get(url, headers=self.headers)
+            response = _session.get(url, headers=self.headers, timeout=GENIUS_TIMEOUT)
             response.raise_for_status()
             data = response.json()
             
@@ -70,7 +94,7 @@ class GeniusLyrics:
         Note: This is necessary because Genius API doesn't provide full lyrics
         """
         try:
-            response = requests.get(song_url, headers=self.headers)
+            response = _session.get(song_url, headers=self.headers, timeout=GENIUS_TIMEOUT)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -108,18 +132,47 @@ class GeniusLyrics:
     
     def get_lyrics(self, artist, song_title):
         """
-        Main method to get lyrics for a song
+        Main method to get lyrics for a song (served from the lyrics cache when known)
         """
+        query_key = _query_key(song_title, artist)
+        hit, song_id = _query_cache.lookup(query_key)
+        if hit and song_id is None:
+            return {"error": "No search results found (cached)"}
+        if hit:
+            hit, result = _song_cache.lookup(str(song_id))
+            if hit:
+                print(f"📦 Lyrics cache hit: {song_title}")
+                return result
+
+        result = self._fetch_lyrics_uncached(artist, song_title)
+        # Only a successful search with zero hits is a miss worth remembering
+        if result.get("error") == "No search results found":
+            _query_cache.set(query_key, None, ttl=LYRICS_NEGATIVE_TTL_SECONDS)
+        elif "error" not in result and not result["lyrics"].startswith(_TRANSIENT_LYRICS_ERRORS):
+            ttl = LYRICS_NEGATIVE_TTL_SECONDS if result["lyrics"].startswith(_MISSING_LYRICS) else None
+            _song_cache.set(str(result["song_id"]), result, ttl=ttl)
+            _query_cache.set(query_key, result["song_id"])
+        return result
+
+    def _fetch_lyrics_uncached(self, artist, song_title):
         # Search for the song
         artist = ""
         query = f"{artist} {song_title}"
         search_results = self.search_song(query)
         
+        if search_results is None:
+            return {"error": "Genius search failed"}
         if not search_results:
             return {"error": "No search results found"}
         
         # Get the first result (most relevant)
         best_match = search_results[0]['result']
+
+        # Same song already scraped under another title?
+        hit, cached = _song_cache.lookup(str(best_match['id']))
+        if hit:
+            print(f"📦 Lyrics cache hit (song {best_match['id']}): {song_title}")
+            return cached
         
         # Get song details
         song_details = self.get_song_details(best_match['id'])
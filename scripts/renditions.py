@@ -0,0 +1,71 @@
+import os
+import subprocess
+import tempfile
+from s3_handler import storage
+
+# ── Playback renditions ────────────────────────────────────────────────────────
+# Compressed copies of each stem for the /audio mount. The raw WAVs stay the
+# source of truth for analysis; these exist only to make playback cheap.
+# format -> (extension, ffmpeg codec args, {tier: bitrate})
+RENDITION_FORMATS = {
+    "opus": (".opus", ["-c:a", "libopus", "-vbr", "on"], {"low": "48k", "high": "96k"}),
+    "aac":  (".m4a",  ["-c:a", "aac", "-movflags", "+faststart"], {"low": "64k", "high": "128k"}),
+}
+RENDITION_DIR = "renditions"
+STEMS = ("vocals", "accompaniment")
+
+
+def rendition_name(stem: str, fmt: str, tier: str) -> str:
+    """Relative path of a rendition inside the song directory, e.g. renditions/vocals_high.opus"""
+    ext = RENDITION_FORMATS[fmt][0]
+    return f"{RENDITION_DIR}/{stem}_{tier}{ext}"
+
+
+def all_rendition_names():
+    return [
+        rendition_name(stem, fmt, tier)
+        for stem in STEMS
+        for fmt, (_, _, tiers) in RENDITION_FORMATS.items()
+        for tier in tiers
+    ]
+
+
+def encode_renditions(stem_path: str, out_dir: str) -> list:
+    """
+    Encode one stem (vocals.wav / accompaniment.wav) into every format/tier.
+    Returns the storage paths written.
+    """
+    stem = os.path.splitext(os.path.basename(stem_path))[0]
+    source = storage.get_local_path(stem_path)
+    written = []
+    for fmt, (ext, codec_args, tiers) in RENDITION_FORMATS.items():
+        for tier, bitrate in tiers.items():
+            out_path = os.path.join(out_dir, rendition_name(stem, fmt, tier))
+            with tempfile.NamedTemporaryFile(suffix=ext) as tmp:
+                subprocess.run(
+                    ["ffmpeg", "-y", "-v", "error", "-i", source, "-vn",
+                     *codec_args, "-b:a", bitrate, tmp.name],
+                    check=True,
+                )
+                with open(tmp.name, "rb") as f:
+                    storage.write_file(out_path, f.read(), mode="wb")
+            written.append(out_path)
+    return written
+
+
+def pick_rendition(available: set, formats: list, low_bandwidth: bool):
+    """
+    Choose (format, tier) for a client.
+
+    `formats` is the client's supported formats in preference order;
+    `available` holds the rendition names present for the song.
+    Returns None when nothing suitable exists (caller falls back to WAV).
+    """
+    tier_order = ["low", "high"] if low_bandwidth else ["high", "low"]
+    for fmt in formats:
+        if fmt not in RENDITION_FORMATS:
+            continue
+        for tier in tier_order:
+            if all(rendition_name(stem, fmt, tier) in available for stem in STEMS):
+                return fmt, tier
+    return None
@@ -1,34 +1,35 @@
 # song_fetcher.py
 
 import os
-import subprocess
-import json
+import time
+import tempfile
+import mimetypes
 import yt_dlp
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from scripts.agents import extract_title_artist
-import boto3
-import soundfile as sf
-import io
-from urllib.parse import quote
 from scripts.get_lyrics_from_genius import fetch_lyrics
 from s3_handler import storage  # Import the storage handler
+from background import submit_background
 load_dotenv() 
 
-def search_youtube(query: str):
-    """Search YouTube for the top result using yt-dlp."""
-    query = query + " lyric video"
-    command = [
-        "yt-dlp",
-        f"ytsearch1:{query}",
-        "--print-json",
-        "--skip-download"
-    ]
-    result = subprocess.run(command, capture_output=True, text=True)
-
-    if result.returncode != 0 or not result.stdout.strip():
-        return None
-
-    video_info = json.loads(result.stdout.strip())
+# Native audio stream, no transcode: separation decodes it with ffmpeg anyway
+YDL_OPTS = {
+    'format': 'bestaudio/best',
+    'outtmpl': '%(id)s.%(ext)s',
+    'quiet': True,
+    'noplaylist': True,
+    'no_warnings': True,
+}
+# In production downloads land here (not in songs/, which is the S3-backed song cache)
+DOWNLOAD_SPOOL_DIR = os.path.join(tempfile.gettempdir(), "idol_song_downloads")
+# Download and lyrics branches of concurrent fetches (two per song)
+_fetch_pool = ThreadPoolExecutor(max_workers=int(os.getenv("FETCH_WORKERS", "8")), thread_name_prefix="fetch")
+# Background archive uploads by storage key, so the separate stage can wait on them
+_archive_uploads = {}
+
+
+def _video_summary(video_info):
     return {
         "title": video_info["title"],
         "channel": video_info["channel"],
@@ -37,74 +38,141 @@ def search_youtube(query: str):
         "duration": video_info.get("duration")
     }
 
-def download_audio(video_url: str, output_dir):
-    """Download audio from YouTube and return the file path."""
-    # Ensure directory exists
-    storage.ensure_directory_exists(output_dir)
-    
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': f'{output_dir}/%(id)s.%(ext)s',
-        'quiet': True,
-        'noplaylist': True,
-        'no_warnings': True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-    }
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(video_url, download=True)
-        base = ydl.prepare_filename(info)
-        # Normalize to .mp3
-        audio_path = os.path.splitext(base)[0] + ".mp3"
-    
-    # If production mode, upload the downloaded file to S3
-    if storage.is_production and os.path.exists(audio_path):
-        with open(audio_path, 'rb') as f:
-            audio_content = f.read()
-        storage.write_file(audio_path, audio_content, 'wb')
-        # Remove local file after upload
-        os.remove(audio_path)
-    
-    return audio_path, info
+def search_youtube(query: str):
+    """Resolve the top YouTube result in-process; returns yt-dlp's full info dict (formats included) or None."""
+    query = query + " lyric video"
+    with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+        result = ydl.extract_info(f"ytsearch1:{query}", download=False)
+    entries = [e for e in (result or {}).get("entries") or [] if e]
+    return entries[0] if entries else None
+
+
+def download_audio(info: dict):
+    """
+    Download the native audio stream of an already-resolved video (no second
+    extraction, no transcode).
+
+    Returns (audio_path, local_path): `audio_path` is the storage key under
+    songs/<title>/, `local_path` an absolute path separation can read directly.
+    In production the file is archived to S3 in the background; see
+    `ensure_audio_archived`.
+    """
+    out_dir = f"songs/{info['title']}"
+    local_dir = DOWNLOAD_SPOOL_DIR if storage.is_production else out_dir
+    os.makedirs(local_dir, exist_ok=True)
+    with yt_dlp.YoutubeDL({**YDL_OPTS, "paths": {"home": local_dir}}) as ydl:
+        info = ydl.process_ie_result(info, download=True)
+        downloads = info.get("requested_downloads") or [{}]
+        local_path = os.path.abspath(downloads[0].get("filepath") or ydl.prepare_filename(info))
+
+    audio_path = f"{out_dir}/{os.path.basename(local_path)}"
+    if storage.is_production:
+        # The archive task gets its own hard link and removes it once uploaded,
+        # so separation can keep reading `local_path` meanwhile
+        archive_link = f"{local_path}.archive"
+        if os.path.exists(archive_link):
+            os.remove(archive_link)
+        os.link(local_path, archive_link)
+        _archive_uploads[audio_path] = submit_background(
+            storage.store_local_file, archive_link, audio_path, mimetypes.guess_type(audio_path)[0]
+        )
+    return audio_path, local_path
+
+
+def ensure_audio_archived(song_details):
+    """
+    Make sure the downloaded audio is in storage before its spooled copy is
+    dropped (production only). Waits for the background archive upload; if that
+    failed, or ran in another process, uploads the spooled copy now.
+    """
+    if not storage.is_production:
+        return
+    audio_path = song_details["audio_path"]
+    upload = _archive_uploads.pop(audio_path, None)
+    if upload is not None:
+        upload.result()
+    if storage.file_exists(audio_path):
+        return
+
+    local_path = song_details.get("local_audio_path")
+    if not (local_path and os.path.exists(local_path)):
+        raise Exception(f"Downloaded audio was never archived and the local copy is gone: {audio_path}")
+    print(f"⬆️  Archive upload missing — uploading {audio_path} now")
+    # store_local_file consumes its source, so upload a hard link (named apart from
+    # the background task's, which may still be running in the parent process)
+    archive_link = f"{local_path}.archive-{os.getpid()}"
+    if os.path.exists(archive_link):
+        os.remove(archive_link)
+    os.link(local_path, archive_link)
+    storage.store_local_file(archive_link, audio_path, mimetypes.guess_type(audio_path)[0])
+
+
+def local_audio_source(song_details):
+    """Local file to separate from: the fresh download if still on disk, else the stored copy."""
+    local_path = song_details.get("local_audio_path")
+    if local_path and os.path.exists(local_path):
+        return local_path
+    return song_details["audio_path"]
+
+
+def release_local_audio(song_details):
+    """Drop the spooled download once separation no longer needs it (production only)."""
+    local_path = song_details.get("local_audio_path")
+    if storage.is_production and local_path and local_path.startswith(DOWNLOAD_SPOOL_DIR):
+        try:
+            os.remove(local_path)
+        except FileNotFoundError:
+            pass
+
+def _timed(timings: dict, name: str, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[name] = round(time.perf_counter() - started, 3)
+
+
+def _fetch_lyrics_file(video_info: dict, timings: dict) -> str:
+    """Title/artist parse + Genius lookup, saved next to the song; needs only search metadata."""
+    title, artist = _timed(timings, "title_artist", extract_title_artist, video_info["title"], video_info["channel"])
+    lyrics = _timed(timings, "genius", fetch_lyrics, title, artist)
+    lyrics_file = f'songs/{video_info["title"]}/{video_info["title"]}.txt'
+
+    # Save lyrics using storage handler
+    storage.write_file(lyrics_file, lyrics)
+    return lyrics_file
+
 
 def fetch_song_by_name(song_query: str):
-    """Search for a song and download its audio."""
+    """
+    Search for a song, then download its audio while the title/artist parse and
+    lyrics lookup run alongside (they only need the search metadata).
+    """
+    timings = {}
     print(f"🔍 Searching for: {song_query}")
-    video_info = search_youtube(song_query)
-    if not video_info:
+    info = _timed(timings, "search", search_youtube, song_query)
+    if not info:
         return {"error": "No results found on YouTube."}
-  
-    title = video_info['title']
-    channel = video_info['channel']
-    url = video_info['url']
-    DOWNLOAD_DIR = f"songs/{title}"
-    
-    # Ensure directory exists
-    storage.ensure_directory_exists(DOWNLOAD_DIR)
-
-    print(f"🎬 Found: {title} by {channel}")
-    print(f"⬇️ Downloading audio...")
-    audio_path, _ = download_audio(url, DOWNLOAD_DIR)
-   
-    print(f"✅ Downloaded to: {storage.get_file_url(audio_path)}")
-
-    title, channel = extract_title_artist(title)
-    lyrics = fetch_lyrics(title, channel)
-    lyrics_file = f'{DOWNLOAD_DIR}/{video_info["title"]}.txt'
-    
-    # Save lyrics using storage handler
-    storage.write_file(lyrics_file, lyrics)
+    video_info = _video_summary(info)
+    print(f"🎬 Found: {video_info['title']} by {video_info['channel']}")
+
+    download = _fetch_pool.submit(_timed, timings, "download", download_audio, info)
+    lyrics = _fetch_pool.submit(_timed, timings, "lyrics", _fetch_lyrics_file, video_info, timings)
+    audio_path, local_path = download.result()
+    lyrics_file = lyrics.result()
+
+    print(f"✅ Downloaded to: {local_path}")
+    print("⏱️  Fetch timings: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
 
     return {
         "title": video_info["title"],
         "artist": video_info["channel"],
         "youtube_url": video_info["url"],
         "audio_path": audio_path,
-        "lyrics": lyrics_file
+        "local_audio_path": local_path,
+        "lyrics": lyrics_file,
+        "fetch_timings": timings,
     }
 
 # Run standalone for testing
@@ -0,0 +1,119 @@
+import re
+
+# ── Local YouTube title parser ─────────────────────────────────────────────────
+# Handles the common "Artist - Song (Official Video)" shapes without an LLM
+# call. `parse_youtube_title` says when it is unsure so the caller can fall
+# back to the LLM (see agents.extract_title_artist); anything it cannot read
+# unambiguously (pipes, several separators, text after a feat. credit, lyric
+# videos whose artist/song order is unknown) is reported as unsure.
+
+# Decorations that are never part of the song title
+_NOISE = (
+    r"official\s+(?:music\s+|lyric\s+|lyrics\s+)?(?:video|audio|visuali[sz]er|mv)"
+    r"|(?:lyric|lyrics)(?:\s+video)?|with\s+lyrics|audio(?:\s+only)?|video|visuali[sz]er|mv"
+    r"|hd|hq|4k|1080p|720p|explicit|clean|remaster(?:ed)?(?:\s+\d{4})?|\d{4}\s+remaster(?:ed)?"
+)
+# Any bracketed group mentioning one of them, e.g. "(Official Video)", "[Remastered in 4K]"
+_BRACKETED_NOISE_RE = re.compile(
+    rf"[\(\[【][^\(\)\[\]【】]*\b(?:{_NOISE}|official)\b[^\(\)\[\]【】]*[\)\]】]", re.IGNORECASE
+)
+# Unbracketed, only the unambiguous ones ("... - Video Games" is a real title)
+_TRAILING_NOISE = (
+    r"official\s+(?:music\s+|lyric\s+|lyrics\s+)?(?:video|audio|visuali[sz]er|mv)"
+    r"|(?:lyric|lyrics)(?:\s+video)?|with\s+lyrics|hd|hq|4k"
+)
+_TRAILING_NOISE_RE = re.compile(rf"(?:\s*[|/\-–—]\s*|\s+)(?:{_TRAILING_NOISE})\s*$", re.IGNORECASE)
+# Lyric-video uploaders write both "Artist - Song" and "Song - Artist"
+_LYRIC_VIDEO_RE = re.compile(r"\blyrics?\b", re.IGNORECASE)
+_FEAT_START_RE = re.compile(r"[\(\[]?\s*\b(?:feat\.?|ft\.?|featuring)\s+", re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r"\s+[\-–—]\s+|\s*\|\s*")
+_QUOTED_RE = re.compile(r'^(?P<artist>[^"“”]+?)\s*["“](?P<title>[^"”]+)["”]')
+_CHANNEL_SUFFIX_RE = re.compile(r"(?:\s*-\s*topic|vevo|official|music|tv)$", re.IGNORECASE)
+
+
+def _clean(text: str) -> str:
+    previous = None
+    while previous != text:
+        previous = text
+        text = _BRACKETED_NOISE_RE.sub(" ", text)
+        text = _TRAILING_NOISE_RE.sub("", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" -–—|:·")
+
+
+def _split_featured(text: str):
+    """
+    Remove feat./ft. credits from `text`. Returns (text, featured, leftover);
+    `leftover` is True when something other than noise followed a credit.
+
+    A bracketed credit ends at its closing bracket, an unbracketed one at the
+    next bracket or the end of the title.
+    """
+    featured, leftover = [], False
+    while True:
+        match = _FEAT_START_RE.search(text)
+        if not match:
+            return text, featured, leftover
+        rest = text[match.end():]
+        if match.group(0).lstrip()[:1] in "([":
+            close = re.search(r"[\)\]]", rest)
+            end = close.start() if close else len(rest)
+            who, after = rest[:end], rest[end + 1:]
+        else:
+            bracket = re.search(r"[\(\[【]", rest)
+            end = bracket.start() if bracket else len(rest)
+            who, after = rest[:end], rest[end:]
+
+        who = _clean(who)
+        parts = _SEPARATOR_RE.split(who, maxsplit=1)
+        if len(parts) == 2:
+            # "Artist ft. X - Song": keep the rest of the title, but the shape is unclear
+            who, tail = parts
+            after = f" - {tail} {after}"
+            leftover = True
+        if who.strip():
+            featured.append(who.strip())
+        text = f"{text[:match.start()]} {after}"
+
+
+def _channel_key(channel: str) -> str:
+    return re.sub(r"\W+", "", _CHANNEL_SUFFIX_RE.sub("", (channel or "").strip())).lower()
+
+
+def parse_youtube_title(youtube_title: str, channel: str = None):
+    """
+    Split a YouTube title into (title, artist, confident).
+
+    `confident` is False when the title doesn't have one clear
+    "artist - song" / 'artist "song"' shape; title/artist are then a best guess.
+    `channel` (the uploader) settles the order of lyric-video titles when it
+    matches one side, e.g. "Hello - Adele (Lyrics)" from "AdeleVEVO".
+    """
+    text, featured, leftover = _split_featured(youtube_title)
+    text = _clean(text)
+    confident = not leftover
+
+    quoted = _QUOTED_RE.match(text)
+    if quoted:
+        artist, title = _clean(quoted.group("artist")), _clean(quoted.group("title"))
+        confident = confident and bool(artist and title)
+    else:
+        parts = [p for p in (_clean(p) for p in _SEPARATOR_RE.split(text)) if p]
+        if len(parts) >= 2:
+            # Several separators ("Artist - Song - Live at X") or a pipe ("Song | Artist | Lyrics")
+            # leave the roles open
+            artist, title = parts[0], parts[1]
+            confident = confident and len(parts) == 2 and "|" not in text
+            channel_key = _channel_key(channel)
+            if confident and _LYRIC_VIDEO_RE.search(youtube_title):
+                if channel_key and channel_key == _channel_key(title):
+                    artist, title = title, artist
+                elif not channel_key or channel_key != _channel_key(artist):
+                    confident = False
+        else:
+            artist, title = "", text
+            confident = False
+
+    if featured:
+        artist = ", ".join([a for a in [artist] if a] + featured)
+    return title, artist, confident and len(title) <= 80
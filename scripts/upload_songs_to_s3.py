@@ -41,6 +41,9 @@ s3 = boto3.client(
 CONTENT_TYPES = {
     ".wav":  "audio/wav",
     ".mp3":  "audio/mpeg",
+    ".m4a":  "audio/mp4",
+    ".webm": "audio/webm",
+    ".opus": "audio/ogg",
     ".json": "application/json",
     ".txt":  "text/plain; charset=utf-8",
     ".srt":  "text/plain; charset=utf-8",
@@ -6,9 +6,8 @@ from scipy import signal
 from scipy.ndimage import gaussian_filter1d
 import json
 from scripts_user.compare_pitch_dtw import segment_pitch_contour, compare_with_dtw, extract_pitch_contour
-import os
-from s3_handler import storage
-import tempfile
+from scripts.analysis_audio import load_analysis_audio
+from metrics import timed
 
 
 _NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
@@ -42,23 +41,11 @@ class ComprehensiveVocalAnalyzer:
         self.sr = sr
         self.hop_length = hop_length
     
-    def load_audio_from_storage(self,audio_path, sr):
-            if storage.is_production and storage.file_exists(audio_path):
-                # For S3, download to temporary file first
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                    audio_data = storage.read_file(audio_path, mode='rb')
-                    temp_file.write(audio_data)
-                    temp_file.flush()
-                    
-                    # Load audio from temporary file
-                    y, loaded_sr = librosa.load(temp_file.name, sr=sr)
-                    
-                    # Clean up temporary file
-                    os.unlink(temp_file.name)
-                    return y, loaded_sr
-            else:
-                # For local storage
-                return librosa.load(audio_path, sr=sr)
+    def load_audio_from_storage(self, audio_path, sr):
+        """Load audio for analysis (memory-mapped 16 kHz derivative for song stems)."""
+        return load_analysis_audio(audio_path, sr=sr)
+
+    @timed("analyzer.segment_audio")
     def segment_audio(self, audio_path, start_time, end_time):
         """Segment audio file between timestamps"""
         y, _ = self.load_audio_from_storage(audio_path, sr=self.sr)
@@ -66,16 +53,6 @@ class ComprehensiveVocalAnalyzer:
         end_sample = int(end_time * self.sr)
         return y[start_sample:end_sample], self.sr
     
-    def to_serializable(self, obj):
-        """Convert numpy objects to JSON serializable format"""
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, (np.float32, np.float64)):
-            return float(obj)
-        if isinstance(obj, (np.int32, np.int64)):
-            return int(obj)
-        return obj
-    
     # ================ BREATH ANALYSIS ================
     def detect_breath_segments(self, y):
         """Detect potential breath intake locations"""
@@ -278,6 +255,7 @@ class ComprehensiveVocalAnalyzer:
         }
     
     # ================ COMPREHENSIVE FEATURE EXTRACTION ================
+    @timed("analyzer.extract_comprehensive_features")
     def extract_comprehensive_features(self, y):
         """Extract all features including original and enhanced ones"""
         features = {}
@@ -335,6 +313,7 @@ class ComprehensiveVocalAnalyzer:
         return features
     
     # ================ FRAME-LEVEL FEATURES FOR GRANULAR ANALYSIS ================
+    @timed("analyzer.extract_frame_level_features")
     def extract_frame_level_features(self, y):
         """Extract features at frame level for granular analysis"""
         frames = {}
@@ -372,6 +351,7 @@ class ComprehensiveVocalAnalyzer:
         return frames
     
     # ================ FEATURE COMPARISON ================
+    @timed("analyzer.compare_comprehensive_features")
     def compare_comprehensive_features(self, user_feat, ref_feat):
         """Compare feature sets with enhanced metrics"""
         comparison = {}
@@ -422,6 +402,7 @@ class ComprehensiveVocalAnalyzer:
         
         return word_timestamps
     
+    @timed("analyzer.analyze_word_level_performance")
     def analyze_word_level_performance(self, user_frames, ref_frames, word_timestamp, tolerance_cents=50):
         """Analyze performance for a specific word/timestamp"""
         
@@ -591,6 +572,7 @@ class ComprehensiveVocalAnalyzer:
         
         return analysis
     
+    @timed("analyzer.generate_granular_feedback")
     def generate_granular_feedback(self, word_analyses):
         """Generate human-readable granular feedback"""
         
@@ -688,8 +670,12 @@ class ComprehensiveVocalAnalyzer:
 
 
 def analyze_audio_match_enhanced(user_audio_path, reference_audio_path, match, ref_pitch, 
-                               coaching_level="intermediate", sr=16000, hop_length=512):
-    """Enhanced audio analysis with additional vocal features using ComprehensiveVocalAnalyzer"""
+                               coaching_level="intermediate", sr=16000, hop_length=512,
+                               user_pitch=None):
+    """
+    Enhanced audio analysis with additional vocal features using ComprehensiveVocalAnalyzer.
+    Pass `user_pitch` when the caller already extracted it to skip a second extraction.
+    """
     
     
     # Initialize the comprehensive analyzer
@@ -707,7 +693,8 @@ def analyze_audio_match_enhanced(user_audio_path, reference_audio_path, match, r
     feature_comparison = analyzer.compare_comprehensive_features(user_features, ref_features)
 
     # Pitch analysis - extract pitch contours and compare
-    user_pitch = extract_pitch_contour(user_audio_path, sr)
+    if user_pitch is None:
+        user_pitch = extract_pitch_contour(user_audio_path, sr)
     ref_pitch_segment = segment_pitch_contour(ref_pitch, sr, match["start_time"], match["end_time"], hop_length)
     dtw_result = compare_with_dtw(user_pitch, ref_pitch_segment)
 
@@ -720,9 +707,6 @@ def analyze_audio_match_enhanced(user_audio_path, reference_audio_path, match, r
     #     coaching_level
     # )
     
-    # Make serializable using the analyzer's method
-    comparison_serializable = {k: analyzer.to_serializable(v) for k, v in feature_comparison.items()}
-    
     # Extract frame-level features for potential granular analysis
     user_frames = analyzer.extract_frame_level_features(y_user)
     ref_frames = analyzer.extract_frame_level_features(y_ref_seg)
@@ -761,7 +745,7 @@ def analyze_audio_match_enhanced(user_audio_path, reference_audio_path, match, r
         "start_time": match["start_time"],
         "end_time": match["end_time"],
        
-        "comparison_metrics": comparison_serializable,
+        "comparison_metrics": feature_comparison,   # numpy values; serialization.dumps encodes them
         "coaching_level": coaching_level,
         "breath_analysis": {
             "breath_count": user_features.get("breath_count", 0),
@@ -3,26 +3,16 @@ import librosa
 from dtw import dtw
 from scipy.spatial.distance import euclidean
 from s3_handler import storage  # Import the global storage handler
-import tempfile
-import os
+from scripts.analysis_audio import load_analysis_audio
+from metrics import timed
+from serialization import dumps
 
+@timed("pitch.extract_pitch_contour")
 def extract_pitch_contour(audio_path, sr=16000):
     """Extract pitch contour from audio file, handling both local and S3 storage"""
-    if storage.is_production and storage.file_exists(audio_path):
-        # For S3, download to temporary file first
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            audio_data = storage.read_file(audio_path, mode='rb')
-            temp_file.write(audio_data)
-            temp_file.flush()
-            
-            # Load audio from temporary file
-            y, sr = librosa.load(temp_file.name, sr=sr)
-            
-            # Clean up temporary file
-            os.unlink(temp_file.name)
-    else:
-        # For local storage or when not in production
-        y, sr = librosa.load(audio_path, sr=sr)
+    # Song stems come from the precomputed 16 kHz derivative; other audio is
+    # decoded through the storage read-through cache.
+    y, sr = load_analysis_audio(audio_path, sr=sr)
     
     pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
     pitch_contour = []
@@ -34,6 +24,7 @@ def extract_pitch_contour(audio_path, sr=16000):
 
     return np.array(pitch_contour)
 
+@timed("pitch.compare_with_dtw")
 def compare_with_dtw(user_pitch, ref_pitch):
     user_pitch = user_pitch.reshape(-1,1)
     ref_pitch = ref_pitch.reshape(-1,1)
@@ -54,18 +45,8 @@ def segment_pitch_contour(full_contour, sr, start_time, end_time, hop_length=512
     return full_contour[start_frame:end_frame]
 
 def save_pitch_analysis(pitch_data, file_path):
-    """Save pitch analysis results to storage"""
-    import json
-    
-    # Convert numpy arrays to lists for JSON serialization
-    serializable_data = {}
-    for key, value in pitch_data.items():
-        if isinstance(value, np.ndarray):
-            serializable_data[key] = value.tolist()
-        else:
-            serializable_data[key] = value
-    
-    storage.write_file(file_path, json.dumps(serializable_data, indent=2))
+    """Save pitch analysis results to storage (numpy arrays are encoded natively)"""
+    storage.write_file(file_path, dumps(pitch_data, indent=True), mode='wb')
 
 def load_pitch_analysis(file_path):
     """Load pitch analysis results from storage"""
@@ -0,0 +1,104 @@
+import numpy as np
+
+# ── Frame-based YIN pitch tracking ─────────────────────────────────────────────
+# Used both for a song's reference contour and for live microphone audio, so
+# the two are directly comparable. Frames are addressed by their start time;
+# frame i starts at i * hop_seconds.
+
+FRAME_SECONDS = 0.064          # 1024 samples at 16 kHz
+HOP_SECONDS = 0.032            # 512 samples at 16 kHz, same hop as the analysis pipeline
+FMIN, FMAX = 65.0, 1050.0      # C2 … C6, the sung range
+YIN_THRESHOLD = 0.15
+SILENCE_RMS = 0.005
+_REFERENCE_BLOCK_FRAMES = 512  # frames per vectorised batch when tracking a whole song
+
+
+def yin_frames(frames: np.ndarray, sr: int, fmin: float = FMIN, fmax: float = FMAX,
+               threshold: float = YIN_THRESHOLD) -> np.ndarray:
+    """
+    YIN f0 (Hz) for each row of `frames` (n_frames, frame_length); 0 where unvoiced.
+
+    The difference function is computed for all frames at once through one
+    batched FFT cross-correlation, so cost grows with n log n per frame.
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    n, length = frames.shape
+    tau_max = min(int(np.ceil(sr / fmin)), length // 2)
+    tau_min = max(2, int(sr / fmax))
+    window = length - tau_max
+
+    # d(tau) = sum_j (x_j - x_{j+tau})^2 over j < window, as energy terms minus correlation
+    size = 1 << int(np.ceil(np.log2(length + window)))
+    spectrum = np.fft.rfft(frames, size, axis=1)
+    head = np.fft.rfft(frames[:, :window], size, axis=1)
+    corr = np.fft.irfft(spectrum * np.conj(head), size, axis=1)[:, :tau_max + 1]
+    squares = np.concatenate([np.zeros((n, 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    energy0 = squares[:, window:window + 1]
+    energy_tau = squares[:, window:window + tau_max + 1] - squares[:, :tau_max + 1]
+    diff = np.maximum(energy0 + energy_tau - 2 * corr, 0.0)
+
+    # Cumulative mean normalised difference
+    cmnd = np.ones_like(diff)
+    running = np.cumsum(diff[:, 1:], axis=1)
+    cmnd[:, 1:] = diff[:, 1:] * np.arange(1, tau_max + 1) / np.maximum(running, 1e-12)
+
+    search = cmnd[:, tau_min:tau_max]
+    below = search < threshold
+    voiced = below.any(axis=1) & (np.sqrt(np.mean(frames ** 2, axis=1)) >= SILENCE_RMS)
+    f0 = np.zeros(n)
+    for i in np.flatnonzero(voiced):
+        tau = tau_min + int(np.argmax(below[i]))
+        # Walk down to the bottom of the dip below the threshold
+        while tau + 1 < tau_max and cmnd[i, tau + 1] < cmnd[i, tau]:
+            tau += 1
+        # Parabolic interpolation around the minimum
+        a, b, c = cmnd[i, tau - 1], cmnd[i, tau], cmnd[i, tau + 1]
+        denominator = a - 2 * b + c
+        shift = 0.5 * (a - c) / denominator if abs(denominator) > 1e-12 else 0.0
+        f0[i] = sr / (tau + float(np.clip(shift, -1, 1)))
+    return f0
+
+
+def frame_params(sr: int):
+    """(frame_length, hop_length) in samples at `sr`."""
+    return int(round(FRAME_SECONDS * sr)), int(round(HOP_SECONDS * sr))
+
+
+def reference_contour(y: np.ndarray, sr: int) -> np.ndarray:
+    """f0 per hop for a whole (mono) song; 0 where unvoiced."""
+    frame_length, hop_length = frame_params(sr)
+    if len(y) < frame_length:
+        return np.zeros(0)
+    frames = np.lib.stride_tricks.sliding_window_view(np.asarray(y, dtype=np.float32), frame_length)[::hop_length]
+    return np.concatenate([
+        yin_frames(frames[i:i + _REFERENCE_BLOCK_FRAMES], sr)
+        for i in range(0, len(frames), _REFERENCE_BLOCK_FRAMES)
+    ])
+
+
+class StreamingPitchTracker:
+    """
+    Incremental YIN over PCM pushed in arbitrary chunk sizes.
+
+    `push(samples)` returns (frame_start_seconds, f0) for every frame completed
+    by the new samples; times are relative to the first sample pushed.
+    """
+
+    def __init__(self, sr: int):
+        self.sr = sr
+        self.frame_length, self.hop_length = frame_params(sr)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._next_frame = 0              # index of the next frame to emit
+
+    def push(self, samples: np.ndarray):
+        self._buffer = np.concatenate([self._buffer, np.asarray(samples, dtype=np.float32)])
+        if len(self._buffer) < self.frame_length:
+            return []
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer, self.frame_length)[::self.hop_length]
+        f0 = yin_frames(frames, self.sr)
+        times = (self._next_frame + np.arange(len(frames))) * self.hop_length / self.sr
+
+        # Keep the samples the next frame still needs
+        self._next_frame += len(frames)
+        self._buffer = self._buffer[len(frames) * self.hop_length:]
+        return list(zip(times.tolist(), f0.tolist()))
@@ -1,30 +1,37 @@
-from faster_whisper import WhisperModel
-import json
-import os 
+import os
+import threading
 from s3_handler import storage
+from background import submit_background
+from metrics import timed
+from serialization import dumps
 
-def transcribe_with_whisper(filename, output_path):
-    """Transcribe audio file and save to specified path using storage handler"""
-    model = WhisperModel("tiny", device="cpu")
-
-    # For S3, we need to download the file temporarily for whisper processing
-    if storage.is_production:
-        # Create a temporary local file for whisper processing
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            temp_path = temp_file.name
-            # Download from S3 to temp file
-            audio_content = storage.read_file(filename, mode='rb')
-            temp_file.write(audio_content)
-        
-        # Process with whisper
-        segments, info = model.transcribe(temp_path, word_timestamps=True)
-        
-        # Clean up temp file
-        os.unlink(temp_path)
-    else:
-        # Direct processing for local files
-        segments, info = model.transcribe(filename, word_timestamps=True)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_whisper_model():
+    """The shared faster-whisper model, loaded once per process (warmup.py loads it at startup)."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from faster_whisper import WhisperModel
+            _model = WhisperModel(WHISPER_MODEL, device="cpu")
+        return _model
+
+
+@timed("whisper.transcribe")
+def transcribe_with_whisper(filename, output_path=None):
+    """
+    Transcribe audio file and return {"alignment": [{word, start, end}, ...]}.
+    If `output_path` is given the transcription is also written to storage in
+    the background (debug sink); callers should use the return value.
+    """
+    model = get_whisper_model()
+
+    # Whisper needs a local file; in production this comes from the storage cache
+    segments, info = model.transcribe(storage.get_local_path(filename), word_timestamps=True)
 
     output = []
     for segment in segments:
@@ -35,8 +42,8 @@ def transcribe_with_whisper(filename, output_path):
                 "end": word.end
             })
 
-    # Save transcription using storage handler
-    transcription_data = json.dumps({"alignment": output}, indent=2)
-    storage.write_file(output_path, transcription_data)
-    
-    return output_path
+    transcription = {"alignment": output}
+    if output_path:
+        submit_background(storage.write_file, output_path, dumps(transcription, indent=True), 'wb')
+
+    return transcription
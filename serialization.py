@@ -0,0 +1,34 @@
+import orjson
+
+# ── Shared JSON encoding ───────────────────────────────────────────────────────
+# One encoder for everything the analysis pipeline emits: the /user/analyze
+# response, the voice_analysis string the frontend stores with the chat (compact
+# JSON, escaped once more inside the response), stored results (results_sink.py)
+# and debug writes. orjson encodes numpy arrays and
+# scalars natively, so results are never walked with tolist()/float() first.
+# NaN and ±Inf are written as null (the stdlib writes invalid JSON for them).
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Already-encoded JSON embedded as-is in a larger document (no re-encoding)
+Fragment = orjson.Fragment
+
+
+def _default(obj):
+    # Arrays orjson doesn't take directly: non-contiguous views, float16/object dtypes
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj, indent: bool = False) -> bytes:
+    """Encode `obj` (may contain numpy values) as UTF-8 JSON bytes."""
+    option = _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def loads(data):
+    """Decode JSON from bytes or str."""
+    return orjson.loads(data)
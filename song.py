@@ -1,65 +1,59 @@
-import json
 import os
-import shutil
-import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from urllib.parse import quote
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from mongo import MongoHandler, get_all_songs, get_song, insert_song
 from s3_handler import storage
+from song_cache import SongCacheIndex
+from jobs import enqueue_song, job_status, job_store, SUCCEEDED
+from profiler import profile_requested, profile_path
+from scripts.renditions import all_rendition_names, pick_rendition, rendition_name
 
 load_dotenv()
 
 router = APIRouter()
 
 # ── Local song cache config ────────────────────────────────────────────────────
+# Byte budget, LRU order, pins and counters live in SQLite (see song_cache.py),
+# shared by every worker process on the instance.
 SONGS_DIR = "songs"
-MAX_CACHED_SONGS = 3
-CACHE_MANIFEST_PATH = "cache_manifest.json"   # lives at repo root, NOT inside songs/
-
-
-def _load_manifest() -> dict:
-    if os.path.exists(CACHE_MANIFEST_PATH):
-        try:
-            with open(CACHE_MANIFEST_PATH, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError) as e:
-            print(f"⚠️  Corrupt cache manifest — resetting: {e}")
-    return {}
-
-
-def _save_manifest(manifest: dict):
-    with open(CACHE_MANIFEST_PATH, "w") as f:
-        json.dump(manifest, f, indent=2)
+PARTIAL_MARKER = ".partial"   # present while a song's download is incomplete
+song_cache = SongCacheIndex(SONGS_DIR)
 
 
 def _song_is_cached(song_name: str) -> bool:
-    """True only if both core audio files are present locally."""
+    """True only if both core audio files are present locally and no download is in progress."""
     song_dir = os.path.join(SONGS_DIR, song_name)
     return (
+        not os.path.exists(os.path.join(song_dir, PARTIAL_MARKER)) and
         os.path.exists(os.path.join(song_dir, "vocals.wav")) and
         os.path.exists(os.path.join(song_dir, "accompaniment.wav"))
     )
 
 
-def _evict_lru_if_needed(manifest: dict, current_song: str) -> dict:
-    """If cache already holds MAX_CACHED_SONGS OTHER songs, evict the least-recently-used one."""
-    others = {k: v for k, v in manifest.items() if k != current_song}
-    if len(others) >= MAX_CACHED_SONGS:
-        lru = min(others, key=lambda k: others[k].get("last_accessed", 0))
-        print(f"🗑️  Cache full — evicting LRU song: {lru}")
-        song_dir = os.path.join(SONGS_DIR, lru)
-        if os.path.exists(song_dir):
-            shutil.rmtree(song_dir)
-        del manifest[lru]
-    return manifest
+def _fetch_asset(s3_key: str, local_path: str):
+    print(f"⬇️  Downloading s3://{s3_key} …")
+    storage.download_file(s3_key, local_path)
+    print(f"✅  Saved: {os.path.basename(local_path)}")
 
 
 def _download_song_from_s3(song_name: str, song_data: dict):
-    """Download all relevant song files from S3 into the local songs directory."""
+    """
+    Download all relevant song files from S3 into the local songs directory.
+
+    Assets are fetched concurrently and each one is streamed to a temp file that
+    is renamed into place. A partial marker stays in the song directory until
+    every core asset has arrived, so a crash never leaves a song that
+    `_song_is_cached` treats as complete.
+    """
     song_dir = os.path.join(SONGS_DIR, song_name)
     os.makedirs(song_dir, exist_ok=True)
+    marker_path = os.path.join(song_dir, PARTIAL_MARKER)
+    open(marker_path, "w").close()
 
     # Core audio files — prefer the paths stored in MongoDB, fall back to convention.
     vocals_key = song_data.get("vocals_path") or f"songs/{song_name}/vocals.wav"
@@ -82,37 +76,56 @@ def _download_song_from_s3(song_name: str, song_data: dict):
         key = song_data["timestamp_lyrics"]
         files_to_fetch[os.path.basename(key)] = key
 
-    for local_name, s3_key in files_to_fetch.items():
-        local_path = os.path.join(song_dir, local_name)
-        if os.path.exists(local_path):
-            continue                          # already downloaded
-        try:
-            print(f"⬇️  Downloading s3://{s3_key} …")
-            data = storage.read_file(s3_key, mode="rb")
-            with open(local_path, "wb") as f:
-                f.write(data if isinstance(data, bytes) else data.encode())
-            print(f"✅  Saved: {local_name}")
-        except Exception as e:
-            print(f"⚠️  Could not download {s3_key}: {e}")
+    # Compressed playback renditions live next to the vocal stem (older songs may lack them)
+    stem_dir = os.path.dirname(vocals_key)
+    for name in all_rendition_names():
+        files_to_fetch[name] = f"{stem_dir}/{name}"
+
+    pending = {
+        local_name: s3_key for local_name, s3_key in files_to_fetch.items()
+        if not os.path.exists(os.path.join(song_dir, local_name))   # already downloaded
+    }
+    failed = []
+    if pending:
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            futures = {
+                local_name: pool.submit(_fetch_asset, s3_key, os.path.join(song_dir, local_name))
+                for local_name, s3_key in pending.items()
+            }
+            for local_name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"⚠️  Could not download {pending[local_name]}: {e}")
+                    failed.append(local_name)
+
+    if {"vocals.wav", "accompaniment.wav"} & set(failed):
+        # Leave the marker: the next request retries the missing assets only.
+        print(f"⚠️  Core audio missing for {song_name} — download left incomplete")
+        return
+    os.remove(marker_path)
 
 
 def _ensure_song_cached(song_name: str, song_data: dict):
     """
     Guarantee that song files are in the local cache.
-    Downloads from S3 if missing, evicts LRU if cache is full.
-    Always updates the last-accessed timestamp.
+    Downloads from S3 if missing, then evicts LRU songs to fit the byte budget.
+    Callers must hold a pin on the song so it cannot be evicted underneath them.
     """
-    manifest = _load_manifest()
-
-    if not _song_is_cached(song_name):
+    if _song_is_cached(song_name):
+        print(f"✅ Song already in local cache: {song_name}")
+        song_cache.record_access(song_name, hit=True)
+        return
+
+    # Only one worker downloads a given song; the others wait and then see a hit.
+    with song_cache.download_lock(song_name):
+        if _song_is_cached(song_name):
+            song_cache.record_access(song_name, hit=True)
+            return
         print(f"📥 Song not cached locally — fetching from S3: {song_name}")
-        manifest = _evict_lru_if_needed(manifest, song_name)
+        song_cache.record_access(song_name, hit=False)
         _download_song_from_s3(song_name, song_data)
-    else:
-        print(f"✅ Song already in local cache: {song_name}")
-
-    manifest[song_name] = {"last_accessed": time.time()}
-    _save_manifest(manifest)
+        song_cache.record_download(song_name)
 
 
 def _read_song_files_from_local(song_name: str) -> tuple[str, str]:
@@ -135,6 +148,24 @@ def _read_song_files_from_local(song_name: str) -> tuple[str, str]:
     return lyrics, timestamp_lyrics
 
 
+def _client_formats(req_formats: Optional[List[str]], accept: str) -> List[str]:
+    """Formats the client can play, in preference order: explicit list first, then Accept header."""
+    if req_formats:
+        return [f.lower() for f in req_formats]
+    formats = []
+    accept = accept.lower()
+    if "audio/ogg" in accept or "audio/opus" in accept or "codecs=opus" in accept:
+        formats.append("opus")
+    if "audio/mp4" in accept or "audio/aac" in accept:
+        formats.append("aac")
+    return formats
+
+
+def _available_renditions(song_name: str) -> set:
+    song_dir = os.path.join(SONGS_DIR, song_name)
+    return {name for name in all_rendition_names() if os.path.exists(os.path.join(song_dir, name))}
+
+
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @router.get("/list")
@@ -151,9 +182,21 @@ class SongRequest(BaseModel):
     song_name: str
 
 
+class GetSongRequest(SongRequest):
+    # Playback formats the client supports, most preferred first ("opus", "aac").
+    # Falls back to the Accept header; WAV is served when neither matches.
+    formats: Optional[List[str]] = None
+    low_bandwidth: bool = False
+
+
 @router.post("/prepare")
-def prepare_song(req: SongRequest):
-    """Prepare a song — check if it exists in DB; if not, process it via coaching()."""
+def prepare_song(req: SongRequest, request: Request):
+    """
+    Prepare a song — return it if it is already in the DB, otherwise queue a
+    background preparation job (deduplicated per song) and return 202 with its
+    job id. Poll GET /songs/jobs/{job_id} for stage-level progress.
+    With the profiler flag + admin token the job is profiled (see profiler.py).
+    """
     song_name = req.song_name.strip().lower()
 
     try:
@@ -161,39 +204,46 @@ def prepare_song(req: SongRequest):
             song = handler.get_song_by_normalized_title(handler.normalize_text(song_name))
             if song:
                 return {"message": "Song already prepared", "song_data": song}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
-            print("Song not in DB — running coaching()")
-            from coaching import coaching
-
-            try:
-                song_data = coaching(song_name)
-                song_data["normalized_title"] = handler.normalize_text(song_data["title"])
-
-                success = handler.insert_song(song_data)
-                if not success:
-                    raise HTTPException(status_code=500, detail="Failed to save song to database")
+    print("Song not in DB — queueing preparation job")
+    profile = profile_requested(request)
+    try:
+        job = enqueue_song(song_name, profile=profile)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error queueing song preparation: {e}")
+    if job["status"] == SUCCEEDED:
+        # A job for this song finished since the lookup above
+        return {"message": "Song already prepared", "song_data": job["state"].get("song_data")}
 
-                song_data.pop("_id", None)
-                return {"message": "Song prepared successfully", "song_data": song_data}
+    content = {"message": "Song preparation queued", **job_status(job)}
+    if profile:
+        content["profile_path"] = profile_path(job["id"])
+    return JSONResponse(status_code=202, content=content)
 
-            except Exception as e:
-                print(e)
-                raise HTTPException(status_code=500, detail=f"Error preparing song: {e}")
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+@router.get("/jobs/{job_id}")
+def get_prepare_job(job_id: str):
+    """Status of a song preparation job: stage, progress, error and, once done, song_data."""
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job_status(job)
 
 
 @router.post("/get_song")
-def getSong(req: SongRequest):
+def getSong(req: GetSongRequest, request: Request):
     """
     Return lyrics, alignment data, and audio URLs for a song.
 
+    Audio URLs point at a compressed Opus/AAC rendition when the client
+    advertises support (body `formats` or Accept header) and the song has one;
+    `low_bandwidth` or a `Save-Data: on` header selects the lower bitrate.
+
     In production mode:
-      - Downloads the song from S3 into a local cache (max 3 songs, LRU eviction)
-        if it is not already cached.
+      - Downloads the song from S3 into a local cache (byte budget, LRU eviction,
+        in-use songs pinned) if it is not already cached.
       - Serves audio via the /audio static-file route on this backend.
 
     In local mode:
@@ -211,27 +261,46 @@ def getSong(req: SongRequest):
         # req.song_name may be a partial/fuzzy match; song["title"] is the ground truth.
         canonical_name = song.get("title", req.song_name)
 
-        if storage.is_production:
-            # Ensure the song's files are present in the local cache.
-            # Non-fatal: if S3 download fails we still try to serve whatever is local.
-            try:
-                _ensure_song_cached(canonical_name, song)
-            except Exception as e:
-                print(f"⚠️  Cache/S3 operation failed (will try local anyway): {e}")
+        with song_cache.pinned(canonical_name):
+            if storage.is_production:
+                # Ensure the song's files are present in the local cache.
+                # Non-fatal: if S3 download fails we still try to serve whatever is local.
+                try:
+                    _ensure_song_cached(canonical_name, song)
+                except Exception as e:
+                    print(f"⚠️  Cache/S3 operation failed (will try local anyway): {e}")
 
-        # Read lyrics / alignment from local disk (same for both modes)
-        lyrics, timestamp_lyrics = _read_song_files_from_local(canonical_name)
+            # Read lyrics / alignment from local disk (same for both modes)
+            lyrics, timestamp_lyrics = _read_song_files_from_local(canonical_name)
+            available = _available_renditions(canonical_name)
 
         # Build audio URLs — served via the /audio static-file mount in main.py
         backend_url = os.getenv("BACKEND_URL", "http://localhost:8000")
         song_url = quote(canonical_name)          # handles spaces and special chars
-        f1 = f"{backend_url}/audio/{song_url}/vocals.wav"
-        f2 = f"{backend_url}/audio/{song_url}/accompaniment.wav"
+        low_bandwidth = req.low_bandwidth or request.headers.get("save-data", "").lower() == "on"
+        choice = pick_rendition(
+            available,
+            _client_formats(req.formats, request.headers.get("accept", "")),
+            low_bandwidth,
+        )
+        if choice:
+            fmt, tier = choice
+            f1 = f"{backend_url}/audio/{song_url}/{rendition_name('vocals', fmt, tier)}"
+            f2 = f"{backend_url}/audio/{song_url}/{rendition_name('accompaniment', fmt, tier)}"
+            audio_format = fmt
+        else:
+            f1 = f"{backend_url}/audio/{song_url}/vocals.wav"
+            f2 = f"{backend_url}/audio/{song_url}/accompaniment.wav"
+            audio_format = "wav"
 
         return {
             "lyrics": lyrics,
             "timestamp_lyrics": timestamp_lyrics,
             "audio_urls": [f1, f2],
+            "audio_format": audio_format,
+            "renditions": {
+                name: f"{backend_url}/audio/{song_url}/{quote(name)}" for name in sorted(available)
+            },
         }
 
     except HTTPException:
@@ -240,11 +309,18 @@ def getSong(req: SongRequest):
         raise HTTPException(status_code=500, detail=f"Error getting song files: {e}")
 
 
+@router.get("/cache_stats")
+def cache_stats():
+    """Local song cache hit/miss/eviction counters and byte usage."""
+    return song_cache.stats()
+
+
 if __name__ == "__main__":
-    # One-time utility: seed MongoDB from the local JSON backup
+    # One-time utility: seed MongoDB from the song ledger (includes the legacy JSON backup)
+    from song_ledger import iter_ledger
     try:
         with MongoHandler() as handler:
-            success = handler.load_songs_from_json("songs/songs_db.json")
+            success = handler.load_songs(iter_ledger(), "song ledger")
             print("Songs loaded!" if success else "Failed to load songs.")
     except Exception as e:
         print(f"Error loading songs: {e}")
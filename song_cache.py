@@ -0,0 +1,202 @@
+import os
+import time
+import fcntl
+import shutil
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+SONG_CACHE_DB = os.getenv("SONG_CACHE_DB", "song_cache.db")   # repo root, NOT inside songs/
+SONG_CACHE_MAX_BYTES = int(os.getenv("SONG_CACHE_MAX_MB", "1024")) * 1024 * 1024
+# A pin older than this is assumed to belong to a crashed request and is ignored.
+PIN_TTL_SECONDS = int(os.getenv("SONG_CACHE_PIN_TTL_SECONDS", "900"))
+LOCK_DIR = os.path.join(os.path.dirname(os.path.abspath(SONG_CACHE_DB)), ".song_locks")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    name          TEXT PRIMARY KEY,
+    size_bytes    INTEGER NOT NULL DEFAULT 0,
+    last_accessed REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pins (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    name      TEXT NOT NULL,
+    pid       INTEGER NOT NULL,
+    pinned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pins_name ON pins(name);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def dir_size(path: str) -> int:
+    """Total size in bytes of all files below `path`."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for fname in files:
+            try:
+                total += os.path.getsize(os.path.join(root, fname))
+            except OSError:
+                pass
+    return total
+
+
+class SongCacheIndex:
+    """
+    Byte-budgeted LRU index of the local song cache, shared by all workers.
+
+    State lives in SQLite (WAL mode); every mutation runs in a `BEGIN IMMEDIATE`
+    transaction, which serialises writers across processes, so eviction can
+    never race with a concurrent pin. Pinned songs are never evicted.
+    """
+
+    def __init__(self, songs_dir: str, db_path: str = SONG_CACHE_DB,
+                 max_bytes: int = SONG_CACHE_MAX_BYTES):
+        self.songs_dir = songs_dir
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, counter: str, by: int = 1):
+        conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (counter, by),
+        )
+
+    # ── Pinning ────────────────────────────────────────────────────────────────
+    def pin(self, song_name: str) -> int:
+        """Protect a song from eviction; returns a pin id for `unpin`."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO pins(name, pid, pinned_at) VALUES (?, ?, ?)",
+                (song_name, os.getpid(), time.time()),
+            )
+            return cur.lastrowid
+
+    def unpin(self, pin_id: int):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM pins WHERE id = ?", (pin_id,))
+
+    @contextmanager
+    def pinned(self, song_name: str):
+        pin_id = self.pin(song_name)
+        try:
+            yield
+        finally:
+            self.unpin(pin_id)
+
+    @contextmanager
+    def download_lock(self, song_name: str):
+        """Cross-process exclusive lock held while one worker fills a song's cache dir."""
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        digest = hashlib.sha1(song_name.encode("utf-8")).hexdigest()
+        with open(os.path.join(LOCK_DIR, f"{digest}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ── Accounting ─────────────────────────────────────────────────────────────
+    def record_access(self, song_name: str, hit: bool):
+        """Update LRU position and hit/miss counters. Adopts songs already on disk."""
+        with self._transaction() as conn:
+            self._bump(conn, "hits" if hit else "misses")
+            row = conn.execute("SELECT 1 FROM songs WHERE name = ?", (song_name,)).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE songs SET last_accessed = ? WHERE name = ?",
+                    (time.time(), song_name),
+                )
+            elif hit:
+                size = dir_size(os.path.join(self.songs_dir, song_name))
+                conn.execute(
+                    "INSERT INTO songs(name, size_bytes, last_accessed) VALUES (?, ?, ?)",
+                    (song_name, size, time.time()),
+                )
+
+    def record_download(self, song_name: str):
+        """Register a freshly downloaded song and evict LRU songs to fit the budget."""
+        size = dir_size(os.path.join(self.songs_dir, song_name))
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO songs(name, size_bytes, last_accessed) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET size_bytes = excluded.size_bytes, "
+                "last_accessed = excluded.last_accessed",
+                (song_name, size, time.time()),
+            )
+            self._evict_to_budget(conn)
+
+    def _evict_to_budget(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM songs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        live_after = time.time() - PIN_TTL_SECONDS
+        conn.execute("DELETE FROM pins WHERE pinned_at < ?", (live_after,))
+        candidates = conn.execute(
+            "SELECT name, size_bytes FROM songs "
+            "WHERE name NOT IN (SELECT name FROM pins) "
+            "ORDER BY last_accessed ASC"
+        ).fetchall()
+        for name, size in candidates:
+            if total <= self.max_bytes:
+                break
+            print(f"🗑️  Song cache over budget — evicting LRU song: {name}")
+            shutil.rmtree(os.path.join(self.songs_dir, name), ignore_errors=True)
+            conn.execute("DELETE FROM songs WHERE name = ?", (name,))
+            self._bump(conn, "evictions")
+            total -= size
+        if total > self.max_bytes:
+            print(f"⚠️  Song cache still over budget ({total} bytes) — remaining songs are pinned")
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        try:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM songs"
+            ).fetchone()
+            pinned = conn.execute(
+                "SELECT COUNT(DISTINCT name) FROM pins WHERE pinned_at >= ?",
+                (time.time() - PIN_TTL_SECONDS,),
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "cached_songs": count,
+            "cached_bytes": total,
+            "max_bytes": self.max_bytes,
+            "pinned_songs": pinned,
+        }
@@ -0,0 +1,147 @@
+"""
+song_ledger.py
+──────────────
+Append-only, line-delimited backup of every prepared song (one JSON object per
+line), replacing the read-modify-write of songs/songs_db.json.
+
+  • Local:      appends to songs/ledger/songs_db.jsonl under an exclusive flock
+                on songs_db.jsonl.lock (a file compaction never replaces).
+  • Production: S3 has no append, so each entry is its own small shard object
+                under songs/ledger/shards/<date>/. Compaction folds shards into
+                a single songs/ledger/compacted-<ts>.jsonl object.
+
+Appends are O(1) (one write / one PUT) and never race with each other.
+`iter_ledger()` streams entries oldest-first, including the legacy songs_db.json.
+
+Compact periodically (e.g. from cron):
+    python song_ledger.py compact
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from mongo import MongoHandler
+from s3_handler import storage
+
+LEDGER_PREFIX = "songs/ledger"
+LOCAL_LEDGER_PATH = f"{LEDGER_PREFIX}/songs_db.jsonl"
+# Locking the ledger itself would race with compaction: an appender blocked on
+# the old file's lock would write to the inode os.replace() just unlinked.
+LOCAL_LEDGER_LOCK_PATH = f"{LOCAL_LEDGER_PATH}.lock"
+SHARD_PREFIX = f"{LEDGER_PREFIX}/shards/"
+COMPACTED_PREFIX = f"{LEDGER_PREFIX}/compacted-"
+LEGACY_DB_PATH = "songs/songs_db.json"
+
+
+def _encode(entry: dict) -> str:
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+@contextmanager
+def _ledger_lock():
+    """Exclusive lock for the local ledger, shared by appends and compaction."""
+    os.makedirs(os.path.dirname(LOCAL_LEDGER_LOCK_PATH), exist_ok=True)
+    with open(LOCAL_LEDGER_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def append_song(entry: dict):
+    """Append one song entry to the ledger."""
+    line = _encode(entry)
+    if storage.is_production:
+        now = datetime.now(timezone.utc)
+        key = f"{SHARD_PREFIX}{now:%Y-%m-%d}/{now:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}.jsonl"
+        storage.write_file(key, line)
+    else:
+        # Opened only once the lock is held, so it is never a file compaction has replaced
+        with _ledger_lock(), open(LOCAL_LEDGER_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+
+
+def _iter_lines(text: str):
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _ledger_files():
+    """Ledger files oldest-first: newest compaction, then shards written after it."""
+    if not storage.is_production:
+        return [LOCAL_LEDGER_PATH] if os.path.exists(LOCAL_LEDGER_PATH) else []
+    compacted = storage.list_files(COMPACTED_PREFIX)
+    shards = storage.list_files(SHARD_PREFIX)
+    return compacted[-1:] + shards
+
+
+def iter_ledger(include_legacy: bool = True):
+    """Stream every ledger entry, oldest first. Duplicates are possible; dedupe on title."""
+    if include_legacy and storage.file_exists(LEGACY_DB_PATH):
+        yield from json.loads(storage.read_file(LEGACY_DB_PATH))
+    for path in _ledger_files():
+        if storage.is_production:
+            yield from _iter_lines(storage.read_file(path))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def _dedupe(entries):
+    seen = set()
+    for entry in entries:
+        key = MongoHandler.normalize_text(entry.get("title", ""))
+        if key in seen:
+            continue
+        seen.add(key)
+        yield entry
+
+
+def compact_ledger() -> int:
+    """Rewrite the ledger as one deduplicated file (folding in the legacy JSON). Returns entry count."""
+    if storage.is_production:
+        old_files = _ledger_files()
+        all_compacted = storage.list_files(COMPACTED_PREFIX)
+        body = "".join(_encode(e) for e in _dedupe(iter_ledger()))
+        key = f"{COMPACTED_PREFIX}{time.strftime('%Y%m%dT%H%M%S')}.jsonl"
+        storage.write_file(key, body)
+        # Only delete what was merged; shards appended meanwhile survive.
+        for path in set(old_files) | set(all_compacted):
+            if path != key:
+                storage.delete_file(path)
+        count = body.count("\n")
+    else:
+        if not os.path.exists(LOCAL_LEDGER_PATH) and not os.path.exists(LEGACY_DB_PATH):
+            return 0
+        with _ledger_lock():
+            tmp_path = f"{LOCAL_LEDGER_PATH}.tmp"
+            count = 0
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for entry in _dedupe(iter_ledger()):
+                    out.write(_encode(entry))
+                    count += 1
+            os.replace(tmp_path, LOCAL_LEDGER_PATH)
+
+    if storage.file_exists(LEGACY_DB_PATH):
+        storage.delete_file(LEGACY_DB_PATH)
+    print(f"✅ Ledger compacted: {count} song(s)")
+    return count
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["compact"]:
+        compact_ledger()
+    else:
+        for song in iter_ledger():
+            print(song.get("title"))
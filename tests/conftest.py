@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# ── make repo root importable ──────────────────────────────────────────────────
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+for _module in ("librosa", "soundfile", "requests", "psutil", "dotenv"):
+    pytest.importorskip(_module)
+
+from scripts.align_gentle import _section_windows, _stitch, split_lyric_sections
+from scripts.analysis_audio import ANALYSIS_SR
+
+# Four stanzas of 4, 4, 8 and 4 words
+LYRICS = ("one two three four\n\nfive six seven eight\n\n"
+          "nine ten eleven twelve\nthirteen fourteen fifteen sixteen\n\nseventeen eighteen nineteen twenty")
+
+
+def _word(word, start, end, case="success"):
+    return {"word": word, "start": start, "end": end, "case": case}
+
+
+def test_single_section_returns_the_transcript_untouched():
+    assert split_lyric_sections(LYRICS, 1) == [LYRICS]
+    assert split_lyric_sections("no blank lines here", 4) == ["no blank lines here"]
+
+
+def test_sections_are_word_balanced_whole_stanzas():
+    sections = split_lyric_sections(LYRICS, 2)
+    # A section closes at the first stanza that reaches the 10-word target
+    assert [len(s.split()) for s in sections] == [16, 4]
+    assert "\n\n".join(sections) == LYRICS
+
+
+def test_never_more_sections_than_asked():
+    assert len(split_lyric_sections(LYRICS, 3)) == 3
+    assert len(split_lyric_sections(LYRICS, 10)) <= 4
+
+
+def test_windows_split_voiced_time_by_word_count():
+    # 10 s of silence, then 20 s of voice: two equal sections meet 10 s into the voice
+    t = np.arange(20 * ANALYSIS_SR) / ANALYSIS_SR
+    y = np.concatenate([np.zeros(10 * ANALYSIS_SR), 0.5 * np.sin(2 * np.pi * 220 * t)])
+    windows = _section_windows(y, ["a b c d", "e f g h"], pad=0.0)
+    assert windows[0][0] == 0.0 and windows[-1][1] == pytest.approx(30.0)
+    assert windows[0][1] == pytest.approx(20.0, abs=0.2)
+    assert windows[1][0] == windows[0][1]
+
+
+def test_windows_are_padded_within_the_song():
+    y = 0.5 * np.ones(30 * ANALYSIS_SR)
+    (start0, end0), (start1, end1) = _section_windows(y, ["a b", "c d"], pad=5.0)
+    assert (start0, end1) == (0.0, pytest.approx(30.0))
+    assert end0 == pytest.approx(20.0, abs=0.2) and start1 == pytest.approx(10.0, abs=0.2)
+
+
+def test_stitch_keeps_order_and_drops_realigned_overlap():
+    first = {"words": [_word("one", 1.0, 1.5), _word("two", 9.0, 10.0)]}
+    second = {"words": [
+        _word("two", 8.0, 8.5),                              # padding re-aligned the previous section's word
+        _word("three", 10.2, 10.8),
+        {"word": "four", "case": "not-found-in-audio"},
+    ]}
+    words = _stitch([first, second])["words"]
+    assert [w["word"] for w in words] == ["one", "two", "two", "three", "four"]
+    assert [w["case"] for w in words] == ["success", "success", "not-found-in-audio",
+                                          "success", "not-found-in-audio"]
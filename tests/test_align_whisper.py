@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("numpy")
+for _module in ("librosa", "soundfile", "requests", "psutil", "dotenv"):
+    pytest.importorskip(_module)
+
+from scripts.align_whisper import align_lyrics_to_words, dp_align, lyric_tokens
+
+LYRICS = "and i will always love you".split()
+
+
+def _heard(words, start=0.0, step=0.5):
+    return [{"word": w, "start": start + i * step, "end": start + (i + 1) * step} for i, w in enumerate(words)]
+
+
+def test_identical_words_align_on_the_diagonal():
+    assert dp_align(LYRICS, LYRICS) == [(i, i) for i in range(len(LYRICS))]
+
+
+def test_inserted_words_are_skipped():
+    heard = "and i uh will always yeah love you".split()
+    assert dp_align(LYRICS, heard) == [(0, 0), (1, 1), (2, 3), (3, 4), (4, 6), (5, 7)]
+
+
+def test_deleted_words_are_left_unmatched():
+    heard = "and i will love you".split()
+    assert dp_align(LYRICS, heard) == [(0, 0), (1, 1), (2, 2), (4, 3), (5, 4)]
+
+
+def test_misheard_word_still_matches():
+    heard = "and i will alway love you".split()
+    assert (3, 3) in dp_align(LYRICS, heard)
+
+
+def test_chatter_before_and_after_is_free():
+    heard = "yeah yeah and i will always love you oh".split()
+    assert dp_align(LYRICS, heard) == [(i, i + 2) for i in range(len(LYRICS))]
+
+
+def test_empty_inputs():
+    assert dp_align([], LYRICS) == []
+    assert dp_align(LYRICS, []) == []
+
+
+def test_matched_words_take_the_heard_timing():
+    aligned = align_lyrics_to_words(LYRICS, _heard(["yeah"] + LYRICS))
+    assert [w["word"] for w in aligned] == LYRICS
+    assert (aligned[0]["start"], aligned[-1]["end"]) == (0.5, 3.5)
+
+
+def test_unmatched_words_are_interpolated_between_anchors():
+    heard = _heard("and i will".split()) + _heard("love you".split(), start=2.5)
+    aligned = align_lyrics_to_words(LYRICS, heard)
+    assert [w["word"] for w in aligned] == LYRICS
+    # "always" was never heard: it fills the gap between "will" and "love"
+    assert (aligned[3]["start"], aligned[3]["end"]) == (1.5, 2.5)
+
+
+def test_long_unmatched_gaps_stay_untimed():
+    heard = _heard("and i will".split()) + _heard("love you".split(), start=30.0)
+    aligned = align_lyrics_to_words(LYRICS, heard)
+    assert "always" not in [w["word"] for w in aligned]
+
+
+def test_lyric_tokens_drop_section_headers():
+    assert lyric_tokens("[Chorus]\nAnd I'll always\n\n[Verse 2: Whitney]\nlove you") == \
+        ["And", "I'll", "always", "love", "you"]
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("dotenv")
+
+from benchmarks.bench_import import HEAVY_MODULES, _run_once
+
+# Same default as benchmarks/bench_import.py; the fastest of three fresh
+# interpreters is checked so one slow run on a busy machine doesn't fail it.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+@pytest.fixture(scope="module")
+def import_runs(tmp_path_factory):
+    workdir = str(tmp_path_factory.mktemp("import_main"))
+    return [_run_once(workdir) for _ in range(3)]
+
+
+def test_import_main_skips_heavy_modules(import_runs):
+    _, modules, _ = import_runs[-1]
+    assert [m for m in HEAVY_MODULES if m in modules] == []
+
+
+def test_import_main_within_budget(import_runs):
+    fastest_ms = min(seconds for seconds, _, _ in import_runs) * 1000
+    assert fastest_ms <= IMPORT_BUDGET_MS, f"import main took {fastest_ms:.0f} ms"
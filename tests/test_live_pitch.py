@@ -0,0 +1,67 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from scripts_user.live_pitch import (HOP_SECONDS, StreamingPitchTracker, frame_params,
+                                     reference_contour, yin_frames)
+
+SR = 16000
+
+
+def _tone(hz, seconds, sr=SR, amplitude=0.3):
+    t = np.arange(int(seconds * sr)) / sr
+    return (amplitude * np.sin(2 * np.pi * hz * t)).astype(np.float32)
+
+
+def _melody(sr=SR):
+    """Half a second each of A3, silence, E4 and C5."""
+    return np.concatenate([_tone(220, 0.5, sr), np.zeros(sr // 2, dtype=np.float32),
+                           _tone(329.63, 0.5, sr), _tone(523.25, 0.5, sr)])
+
+
+@pytest.mark.parametrize("hz", [82.41, 220.0, 440.0, 987.77])
+def test_yin_finds_the_pitch_of_a_sine(hz):
+    frame_length, hop_length = frame_params(SR)
+    frames = np.lib.stride_tricks.sliding_window_view(_tone(hz, 0.5), frame_length)[::hop_length]
+    f0 = yin_frames(frames, SR)
+    cents = 1200 * np.log2(f0 / hz)
+    assert np.all(np.abs(cents) < 5)
+
+
+def test_silence_and_noise_floor_are_unvoiced():
+    frame_length, _ = frame_params(SR)
+    frames = np.zeros((3, frame_length))
+    frames[1] = 0.001 * np.random.default_rng(0).standard_normal(frame_length)
+    assert yin_frames(frames, SR).tolist() == [0.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize("seconds,hz", [(0.2, 220.0), (0.7, 0.0), (1.2, 329.63), (1.7, 523.25)])
+def test_reference_contour_follows_the_melody(seconds, hz):
+    contour = reference_contour(_melody(), SR)
+    assert contour[int(seconds / HOP_SECONDS)] == pytest.approx(hz, rel=0.01)
+
+
+def test_reference_contour_of_a_clip_shorter_than_a_frame_is_empty():
+    assert len(reference_contour(np.zeros(100), SR)) == 0
+
+
+@pytest.mark.parametrize("chunk", [1, 160, 512, 640, 1024, 7919, 10 ** 6])
+def test_streaming_matches_reference_contour(chunk):
+    y = _melody()
+    tracker = StreamingPitchTracker(SR)
+    frames = []
+    for start in range(0, len(y), chunk):
+        frames.extend(tracker.push(y[start:start + chunk]))
+
+    reference = reference_contour(y, SR)
+    assert len(frames) == len(reference)
+    times, f0 = zip(*frames)
+    np.testing.assert_allclose(times, np.arange(len(reference)) * HOP_SECONDS)
+    np.testing.assert_allclose(f0, reference, rtol=1e-6)
+
+
+def test_streaming_at_another_sample_rate():
+    sr = 48000
+    tracker = StreamingPitchTracker(sr)
+    frames = tracker.push(_tone(440, 0.5, sr))
+    assert frames and all(hz == pytest.approx(440, rel=0.005) for _, hz in frames)
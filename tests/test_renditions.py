@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("psutil")
+
+from scripts.renditions import all_rendition_names, pick_rendition, rendition_name
+
+
+def _both_stems(fmt, tier):
+    return {rendition_name("vocals", fmt, tier), rendition_name("accompaniment", fmt, tier)}
+
+
+def test_rendition_name():
+    assert rendition_name("vocals", "opus", "high") == "renditions/vocals_high.opus"
+    assert rendition_name("accompaniment", "aac", "low") == "renditions/accompaniment_low.m4a"
+
+
+def test_prefers_high_tier_unless_low_bandwidth():
+    available = set(all_rendition_names())
+    assert pick_rendition(available, ["opus", "aac"], low_bandwidth=False) == ("opus", "high")
+    assert pick_rendition(available, ["opus", "aac"], low_bandwidth=True) == ("opus", "low")
+
+
+def test_follows_client_format_order():
+    available = set(all_rendition_names())
+    assert pick_rendition(available, ["aac", "opus"], low_bandwidth=False) == ("aac", "high")
+
+
+def test_falls_back_to_other_tier_then_format():
+    assert pick_rendition(_both_stems("opus", "low"), ["opus"], low_bandwidth=False) == ("opus", "low")
+    assert pick_rendition(_both_stems("aac", "high"), ["opus", "aac"], low_bandwidth=True) == ("aac", "high")
+
+
+def test_needs_both_stems():
+    available = {rendition_name("vocals", "opus", "high")}
+    assert pick_rendition(available, ["opus"], low_bandwidth=False) is None
+
+
+def test_unknown_or_missing_formats_fall_back_to_wav():
+    available = set(all_rendition_names())
+    assert pick_rendition(available, ["flac"], low_bandwidth=False) is None
+    assert pick_rendition(set(), ["opus", "aac"], low_bandwidth=False) is None
@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+for _module in ("demucs", "torch", "librosa", "soundfile", "psutil", "dotenv"):
+    pytest.importorskip(_module)
+
+from scripts import extract_from_audio
+from scripts.extract_from_audio import OverlapWriter, chunk_seconds_for_budget, stream_windows
+
+
+class _Collector:
+    """Stands in for a SoundFile: keeps whatever is written."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(np.array(data))
+
+    @property
+    def data(self):
+        return np.concatenate(self.parts) if self.parts else np.zeros((0, 2), dtype=np.float32)
+
+
+@pytest.fixture
+def song(monkeypatch):
+    """A 10 000-frame stereo signal served by a fake ffmpeg decode."""
+    audio = np.random.default_rng(0).standard_normal((10_000, 2)).astype(np.float32)
+
+    def fake_decode(path, block_frames):
+        for start in range(0, len(audio), block_frames):
+            yield audio[start:start + block_frames]
+
+    monkeypatch.setattr(extract_from_audio, "decode_stream", fake_decode)
+    return audio
+
+
+def _separate(chunk_frames, overlap_frames):
+    """Run the chunk plan with a per-sample 'separator' and return both stems."""
+    files = [_Collector(), _Collector()]
+    writer = OverlapWriter(files, overlap_frames)
+    for window in stream_windows("song.wav", chunk_frames, overlap_frames):
+        writer.push([window * 0.25, window * 0.75])
+    writer.close()
+    return [f.data for f in files]
+
+
+@pytest.mark.parametrize("chunk_frames,overlap_frames", [(20_000, 500), (3_000, 500), (1_000, 250), (777, 100)])
+def test_crossfade_matches_unchunked_output(song, chunk_frames, overlap_frames):
+    vocals, accompaniment = _separate(chunk_frames, overlap_frames)
+    np.testing.assert_allclose(vocals, song * 0.25, atol=1e-6)
+    np.testing.assert_allclose(accompaniment, song * 0.75, atol=1e-6)
+
+
+def test_windows_overlap_and_cover_the_song(song):
+    chunk_frames, overlap_frames = 3_000, 500
+    windows = list(stream_windows("song.wav", chunk_frames, overlap_frames))
+    hop = chunk_frames - overlap_frames
+    for i, window in enumerate(windows):
+        np.testing.assert_array_equal(window, song[i * hop:i * hop + chunk_frames])
+    assert all(len(w) == chunk_frames for w in windows[:-1])
+    assert (len(windows) - 1) * hop + len(windows[-1]) == len(song)
+
+
+def test_short_song_is_one_window(song):
+    windows = list(stream_windows("song.wav", 20_000, 500))
+    assert len(windows) == 1
+    np.testing.assert_array_equal(windows[0], song)
+
+
+def test_chunk_length_follows_memory_budget(monkeypatch):
+    monkeypatch.setattr(extract_from_audio, "SEPARATION_CHUNK_SECONDS", 0)
+    assert chunk_seconds_for_budget(100) == 15
+    assert chunk_seconds_for_budget(1_000_000) == 300
+    assert chunk_seconds_for_budget(1300) == pytest.approx(100)
+    monkeypatch.setattr(extract_from_audio, "SEPARATION_CHUNK_SECONDS", 42)
+    assert chunk_seconds_for_budget(100) == 42
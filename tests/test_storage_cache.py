@@ -0,0 +1,58 @@
+import io
+import os
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("psutil")
+
+from s3_handler import LocalObjectCache
+
+
+def _store(cache, key, size, etag="e1"):
+    return cache.store(key, etag, io.BytesIO(b"x" * size))
+
+
+def test_entries_are_shared_between_workers(tmp_path):
+    a = LocalObjectCache(str(tmp_path), 1000, 0, in_use_seconds=0)
+    b = LocalObjectCache(str(tmp_path), 1000, 0, in_use_seconds=0)
+    path = _store(a, "songs/x/vocals.wav", 10)
+    entry = b.lookup("songs/x/vocals.wav")
+    assert entry["path"] == path and entry["size"] == 10
+
+
+def test_budget_is_global_across_workers(tmp_path):
+    a = LocalObjectCache(str(tmp_path), 100, 0, in_use_seconds=0)
+    b = LocalObjectCache(str(tmp_path), 100, 0, in_use_seconds=0)
+    first = _store(a, "one", 60)
+    _store(b, "two", 60)
+    assert not os.path.exists(first)
+    assert a.lookup("one") is None
+    assert b.lookup("two") is not None
+
+
+def test_entries_in_use_are_not_evicted(tmp_path):
+    a = LocalObjectCache(str(tmp_path), 100, 0, in_use_seconds=300)
+    first = _store(a, "one", 60)
+    _store(a, "two", 60)
+    assert os.path.exists(first)
+
+
+def test_new_worker_keeps_recent_unindexed_files(tmp_path):
+    in_flight = tmp_path / "abc.e1.123.456.tmp"
+    in_flight.write_bytes(b"partial")
+    LocalObjectCache(str(tmp_path), 100, 0, in_use_seconds=300)
+    assert in_flight.exists()
+    LocalObjectCache(str(tmp_path), 100, 0, in_use_seconds=0)
+    assert not in_flight.exists()
+
+
+def test_new_version_replaces_old_file(tmp_path):
+    cache = LocalObjectCache(str(tmp_path), 1000, 0, in_use_seconds=0)
+    old = _store(cache, "k", 10, etag="v1")
+    new = _store(cache, "k", 20, etag="v2")
+    assert not os.path.exists(old)
+    entry = cache.lookup("k")
+    assert (entry["etag"], entry["path"], entry["size"]) == ("v2", new, 20)
+    cache.invalidate("k")
+    assert cache.lookup("k") is None and not os.path.exists(new)
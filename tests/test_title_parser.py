@@ -0,0 +1,48 @@
+import pytest
+
+from scripts.title_parser import parse_youtube_title
+
+
+@pytest.mark.parametrize("youtube_title, channel, expected", [
+    ("Adele - Hello (Official Music Video)", None, ("Hello", "Adele")),
+    ("Lana Del Rey - Video Games", None, ("Video Games", "Lana Del Rey")),
+    ("a-ha - Take On Me (Official Video) [Remastered in 4K]", "a-ha", ("Take On Me", "a-ha")),
+    ("Ed Sheeran - Perfect (feat. Beyoncé) [Official Audio]", None, ("Perfect", "Ed Sheeran, Beyoncé")),
+    ("Rihanna - Umbrella (Orange Version) (Official Music Video) ft. JAY-Z", "RihannaVEVO",
+     ("Umbrella (Orange Version)", "Rihanna, JAY-Z")),
+    ("Hello - Adele (Lyrics)", "AdeleVEVO", ("Hello", "Adele")),
+    ('Taylor Swift "Love Story"', None, ("Love Story", "Taylor Swift")),
+])
+def test_confident_parses(youtube_title, channel, expected):
+    title, artist, confident = parse_youtube_title(youtube_title, channel)
+    assert (title, artist) == expected
+    assert confident
+
+
+@pytest.mark.parametrize("youtube_title", [
+    # Pipes and several separators leave the roles open
+    "Somebody That I Used To Know | Gotye | Lyrics Video",
+    "Coldplay - Yellow - Live at Glastonbury",
+    # Lyric-video uploaders use both orders; nothing says which this is
+    "Hello - Adele (Lyrics)",
+    # Text after an unbracketed feat. credit
+    "Calvin Harris feat. Rihanna - This Is What You Came For (Official Video)",
+    "No separator at all",
+])
+def test_ambiguous_titles_are_not_confident(youtube_title):
+    assert not parse_youtube_title(youtube_title)[2]
+
+
+def test_feat_credit_runs_to_the_end_and_drops_noise():
+    title, artist, _ = parse_youtube_title("JUSTIN BIEBER - Baby feat. Ludacris Lyrics")
+    assert (title, artist) == ("Baby", "JUSTIN BIEBER, Ludacris")
+
+
+def test_feat_credit_keeps_hyphenated_names():
+    _, artist, _ = parse_youtube_title("Rihanna - Umbrella ft. JAY-Z")
+    assert artist == "Rihanna, JAY-Z"
+
+
+def test_bracketed_noise_is_stripped_but_versions_are_kept():
+    title, _, _ = parse_youtube_title("Taylor Swift - Love Story (Taylor's Version) [Official Lyric Video]")
+    assert title == "Love Story (Taylor's Version)"
@@ -1,80 +1,110 @@
-from fastapi import APIRouter, UploadFile, Form, HTTPException
+from fastapi import APIRouter, UploadFile, Form, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import shutil
 import json
 import uuid
+import tempfile
+import time
 from typing import Optional
 from mongo import MongoHandler, get_song
 import os
-from process_user_audio import process_user_audio
 from scripts.agents import chatbot_agent
 from s3_handler import storage
+from song import song_cache
+from background import submit_background
+import metrics
+from profiler import capture, profile_requested
+from serialization import dumps
 
 router = APIRouter()
 
-def cleanup_temp_files(user_audio_path, user_transcription_path):
-    """Clean up temporary files from storage"""
+# Uploads are spooled to local disk once and every pipeline stage reads that
+# file directly. Archiving the raw take to storage is opt-in and asynchronous.
+UPLOAD_SPOOL_DIR = os.path.join(tempfile.gettempdir(), "idol_user_vocals")
+ARCHIVE_USER_TAKES = os.getenv("ARCHIVE_USER_TAKES", "false").lower() == "true"
+
+
+def spool_upload(file_id, filename, content):
+    """Write the uploaded take to local disk and return its absolute path."""
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    local_path = os.path.join(UPLOAD_SPOOL_DIR, f"{file_id}_{os.path.basename(filename or 'take.wav')}")
+    with open(local_path, "wb") as f:
+        f.write(content)
+    return local_path
+
+
+def _find_song(song_name):
+    with MongoHandler() as handler:
+        # Search by exact title match first, then try partial match
+        song = handler.get_song_by_title(song_name, exact_match=True)
+        if not song:
+            # Try partial match if exact match fails
+            song = handler.get_song_by_title(song_name, exact_match=False)
+    return song
+
+
+def _run_analysis(user_audio_path, timestamp_lyrics, vocals_path, file_id, song_title, profile):
+    """
+    The CPU-bound pipeline, run on a worker thread so the event loop (and the
+    live pitch WebSockets sharing it) keeps serving. Timings and the profiler
+    are set up here so they follow the thread doing the work.
+    Returns (analysis, Server-Timing header, profile path or None).
+    """
+    # The analysis stack (librosa, scipy, Whisper …) is imported by the
+    # startup warm-up (warmup.py), not at import time; this is a lookup.
+    from process_user_audio import process_user_audio
+
+    started = time.perf_counter()
+    # The song is pinned so the local song cache cannot evict its files while
+    # the pipeline is reading them.
+    with metrics.request_timings() as timings, \
+            capture(file_id, profile, name=f"analyze {song_title}") as profile_path, \
+            song_cache.pinned(song_title):
+        analysis = process_user_audio(
+            user_audio_path,
+            timestamp_lyrics,
+            vocals_path,
+            file_id,
+        )
+    server_timing = metrics.server_timing_header(timings, total=time.perf_counter() - started)
+    return analysis, server_timing, profile_path
+
+
+def cleanup_temp_files(user_audio_path):
+    """Remove the spooled upload from local disk"""
     try:
-        if user_audio_path and storage.file_exists(user_audio_path):
-            if storage.is_production:
-                # Delete from S3
-                storage.s3_client.delete_object(
-                    Bucket=storage.bucket_name,
-                    Key=user_audio_path
-                )
-                print(f"✅ Deleted from S3: {user_audio_path}")
-            else:
-                # Delete local file
-                os.remove(user_audio_path)
-                print(f"✅ Deleted locally: {user_audio_path}")
-                
-        if user_transcription_path and storage.file_exists(user_transcription_path):
-            if storage.is_production:
-                # Delete from S3
-                storage.s3_client.delete_object(
-                    Bucket=storage.bucket_name,
-                    Key=user_transcription_path
-                )
-                print(f"✅ Deleted transcription from S3: {user_transcription_path}")
-            else:
-                # Delete local file
-                os.remove(user_transcription_path)
-                print(f"✅ Deleted transcription locally: {user_transcription_path}")
-                
+        if user_audio_path and os.path.exists(user_audio_path):
+            os.remove(user_audio_path)
     except Exception as e:
-        print(f"⚠️ Warning: Failed to clean up some files: {e}")
+        print(f"⚠️ Warning: Failed to clean up spooled upload: {e}")
 
 @router.post("/analyze")
 async def analyze_user_audio(
+    request: Request,
     audio_file: UploadFile,
     song_name: str = Form(...)
 ):
-    """Analyze user audio against a reference song"""
+    """Analyze user audio against a reference song; per-stage timings are in the Server-Timing header"""
     print(f"Received: {song_name}, {audio_file.filename}")
     
-    # Initialize paths for cleanup
+    # Initialize path for cleanup
     user_audio_path = None
-    user_transcription_path = None
     
     try:
-        # Save uploaded file using storage handler
         file_id = str(uuid.uuid4())
-        user_audio_path = f"user_vocals/{file_id}_{audio_file.filename}"
-        
-        # Read the uploaded file content
         audio_content = await audio_file.read()
-        
-        # Write to storage (S3 in prod, local in dev)
-        storage.write_file(user_audio_path, audio_content, mode='wb')
+
+        # Spool once to local disk; no storage round trips on the request path
+        user_audio_path = spool_upload(file_id, audio_file.filename, audio_content)
+
+        if ARCHIVE_USER_TAKES:
+            archive_key = f"user_vocals/{file_id}_{os.path.basename(audio_file.filename or 'take.wav')}"
+            submit_background(storage.write_file, archive_key, audio_content, 'wb')
 
         # Get song metadata from MongoDB using the handler
-        with MongoHandler() as handler:
-            # Search by exact title match first, then try partial match
-            song = handler.get_song_by_title(song_name, exact_match=True)
-            if not song:
-                # Try partial match if exact match fails
-                song = handler.get_song_by_title(song_name, exact_match=False)
+        song = await run_in_threadpool(_find_song, song_name)
         
         print(f"Found song: {song}")
         
@@ -100,15 +130,23 @@ async def analyze_user_audio(
                 detail=f"Song '{song.get('title', song_name)}' is missing vocals_path.",
             )
 
-        # Process the audio analysis
+        # Process the audio analysis off the event loop
         try:
-            analysis = process_user_audio(
+            analysis, server_timing, profile = await run_in_threadpool(
+                _run_analysis,
                 user_audio_path,
                 timestamp_lyrics,
                 vocals_path,
                 file_id,
+                song.get("title", song_name),
+                profile_requested(request),
             )
-            return analysis
+            headers = {"Server-Timing": server_timing}
+            if profile:
+                headers["X-Profile-Path"] = profile
+            # Encoded here (voice_analysis is a pre-encoded string, so it only gets
+            # string-escaped); returning a Response skips FastAPI's own jsonable_encoder pass
+            return Response(content=dumps(analysis), media_type="application/json", headers=headers)
             
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error processing audio: {e}")
@@ -121,8 +159,8 @@ async def analyze_user_audio(
         raise HTTPException(status_code=500, detail=f"Unexpected error during analysis: {e}")
     
     finally:
-        # Clean up temporary files
-        cleanup_temp_files(user_audio_path, user_transcription_path)
+        # Clean up the spooled upload
+        cleanup_temp_files(user_audio_path)
 
 
 class AnalyzeTextRequest(BaseModel):
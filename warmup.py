@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from metrics import span
+
+load_dotenv()
+
+# ── Startup warm-up ────────────────────────────────────────────────────────────
+# Importing `main` stays cheap: the analysis stack (librosa, scipy, dtw,
+# faster-whisper) and the API clients load on first use. At startup the
+# lifespan hook runs the steps below on a background thread, so the first
+# request doesn't pay for them; GET /ready reports 503 until they are done.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+_lock = threading.Lock()
+_state = {"status": "pending", "steps": {}, "error": None}
+
+
+def _import_pipeline():
+    import process_user_audio  # noqa: F401  (librosa, scipy, dtw, fuzzywuzzy, faster-whisper)
+
+
+def _load_whisper():
+    from scripts_user.transcribe_with_whisper import get_whisper_model
+    get_whisper_model()
+
+
+def _compile_analysis():
+    """Run the analyzer once on a short tone so numba/librosa JIT caches are built."""
+    import numpy as np
+    from scripts_user.audio_analysis import ComprehensiveVocalAnalyzer
+    from scripts_user.compare_pitch_dtw import compare_with_dtw
+
+    sr = 16000
+    t = np.arange(2 * sr) / sr
+    y = (0.3 * np.sin(2 * np.pi * 220 * t * (1 + 0.005 * np.sin(2 * np.pi * 5 * t)))).astype(np.float32)
+    analyzer = ComprehensiveVocalAnalyzer(sr=sr)
+    analyzer.extract_comprehensive_features(y)
+    analyzer.extract_frame_level_features(y)
+    compare_with_dtw(np.linspace(200, 240, 40), np.linspace(205, 235, 50))
+
+
+def _build_clients():
+    from scripts.agents import _groq
+    from s3_handler import storage
+    _groq()
+    storage.s3_client    # no-op locally
+
+
+WARMUP_STEPS = [
+    ("import_pipeline", _import_pipeline),
+    ("whisper_model", _load_whisper),
+    ("analysis_jit", _compile_analysis),
+    ("clients", _build_clients),
+]
+
+
+def run_warmup():
+    """Run every warm-up step in order; a failing step leaves the worker not ready."""
+    with _lock:
+        _state.update(status="running", error=None)
+    started = time.perf_counter()
+    for name, fn in WARMUP_STEPS:
+        step_started = time.perf_counter()
+        try:
+            with span(f"warmup.{name}"):
+                fn()
+        except Exception as e:
+            print(f"❌ Warm-up step '{name}' failed: {e}")
+            with _lock:
+                _state["steps"][name] = {"seconds": round(time.perf_counter() - step_started, 3), "error": str(e)}
+                _state.update(status="failed", error=f"{name}: {e}")
+            return
+        with _lock:
+            _state["steps"][name] = {"seconds": round(time.perf_counter() - step_started, 3)}
+    with _lock:
+        _state["status"] = "ready"
+    print(f"✅ Warm-up finished in {time.perf_counter() - started:.1f}s")
+
+
+def start_warmup():
+    """Lifespan hook: warm up on a background thread (or mark ready at once if disabled)."""
+    if not WARMUP_ON_STARTUP:
+        with _lock:
+            _state["status"] = "ready"
+        return
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+
+def readiness() -> dict:
+    with _lock:
+        return {"ready": _state["status"] == "ready", **_state, "steps": dict(_state["steps"])}